@@ -0,0 +1 @@
+# Load and throughput benchmarks for the bot, run with python -m bot.benchmarks.<name>.
@@ -0,0 +1,275 @@
+"""Throughput benchmark for the real handlers router.
+
+Feeds synthetic update streams through a Dispatcher built like the one in
+``bot.main`` and reports updates/sec with p50/p99 handler latency::
+
+    python -m bot.benchmarks.dispatcher --updates 2000 --db-latency-ms 2
+    python -m bot.benchmarks.dispatcher --check        # compare with baselines.json
+    python -m bot.benchmarks.dispatcher --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from bot.benchmarks.standins import (
+    BENCH_ADMIN_CHAT_ID,
+    BENCH_ADMIN_ID,
+    BenchDatabase,
+    build_bench_context,
+    fake_rcon,
+)
+from bot.context import AppContext
+from bot.main import build_dispatcher
+from bot.services.ratelimit import MemoryRateLimitStore
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+
+# The handlers router can only be attached to one Dispatcher per process, so
+# every scenario shares this one; the context is passed with each update.
+_dispatcher: Optional[Dispatcher] = None
+
+
+def bench_dispatcher(context: AppContext) -> Dispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = build_dispatcher(context, MemoryRateLimitStore())
+    return _dispatcher
+
+
+@dataclass
+class BenchResult:
+    scenario: str
+    updates: int
+    errors: int
+    unhandled: int
+    updates_per_sec: float
+    p50_ms: float
+    p99_ms: float
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _message(bot: Bot, update_id: int, user_id: int, chat_id: int, chat_type: str, text: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(datetime.now(timezone.utc).timestamp()),
+                "chat": {"id": chat_id, "type": chat_type},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+                "text": text,
+            },
+        },
+        context={"bot": bot},
+    )
+
+
+def _callback(bot: Bot, update_id: int, user_id: int, data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": "Admin"},
+                "chat_instance": "bench",
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(datetime.now(timezone.utc).timestamp()),
+                    "chat": {"id": BENCH_ADMIN_CHAT_ID, "type": "supergroup"},
+                    "text": "New whitelist request",
+                },
+            },
+        },
+        context={"bot": bot},
+    )
+
+
+def request_flow(bot: Bot, database: BenchDatabase, count: int) -> List[List[Update]]:
+    """Each user sends a username and then a comment; the two must run in order."""
+    streams = []
+    for index in range(count // 2):
+        user_id = 10_000 + index
+        streams.append(
+            [
+                _message(bot, index * 2 + 1, user_id, user_id, "private", f"Player{index}"),
+                _message(bot, index * 2 + 2, user_id, user_id, "private", "friend of the server"),
+            ]
+        )
+    return streams
+
+
+def approvals(bot: Bot, database: BenchDatabase, count: int) -> List[List[Update]]:
+    streams = []
+    for index in range(count):
+        request_id = database.add(20_000 + index, f"Approve{index}")
+        action = "approve" if index % 4 else "deny"
+        streams.append([_callback(bot, index + 1, BENCH_ADMIN_ID, f"{action}:{request_id}")])
+    return streams
+
+
+def whois_storm(bot: Bot, database: BenchDatabase, count: int) -> List[List[Update]]:
+    popular = [f"Popular{index}" for index in range(20)]
+    for index, name in enumerate(popular):
+        database.add(30_000 + index, name, status="approved")
+    return [
+        [_message(bot, index + 1, 40_000 + index, -200, "supergroup", f"/whois {popular[index % len(popular)]}")]
+        for index in range(count)
+    ]
+
+
+SCENARIOS: Dict[str, Callable[[Bot, BenchDatabase, int], List[List[Update]]]] = {
+    "request_flow": request_flow,
+    "approvals": approvals,
+    "whois_storm": whois_storm,
+}
+
+
+async def run_scenario(
+    name: str,
+    updates: int,
+    concurrency: int = 32,
+    db_latency: float = 0.0,
+    telegram_latency: float = 0.0,
+    rcon_latency: float = 0.0,
+) -> BenchResult:
+    database = BenchDatabase()
+    context = build_bench_context(database, db_latency=db_latency, telegram_latency=telegram_latency)
+    dp = bench_dispatcher(context)
+    streams = SCENARIOS[name](context.bot, database, updates)
+    latencies: List[float] = []
+    failures = {"errors": 0, "unhandled": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(stream: List[Update]) -> None:
+        async with semaphore:
+            for update in stream:
+                await feed_one(dp, context, update, latencies, failures)
+
+    with fake_rcon(rcon_latency):
+        started = time.perf_counter()
+        await asyncio.gather(*(feed(stream) for stream in streams))
+        elapsed = time.perf_counter() - started
+
+    total = len(latencies)
+    return BenchResult(
+        scenario=name,
+        updates=total,
+        errors=failures["errors"],
+        unhandled=failures["unhandled"],
+        updates_per_sec=round(total / elapsed, 1) if elapsed else 0.0,
+        p50_ms=round(percentile(latencies, 0.5) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+    )
+
+
+async def feed_one(
+    dp: Dispatcher,
+    context: AppContext,
+    update: Update,
+    latencies: List[float],
+    failures: Dict[str, int],
+) -> None:
+    started = time.perf_counter()
+    try:
+        response = await dp.feed_update(context.bot, update, context=context)
+        if response is UNHANDLED:
+            failures["unhandled"] += 1
+    except Exception:
+        failures["errors"] += 1
+    finally:
+        latencies.append(time.perf_counter() - started)
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def compare_to_baseline(result: BenchResult, baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every way ``result`` is worse than ``baseline`` by more than ``tolerance``."""
+    problems = []
+    if result.errors:
+        problems.append(f"{result.scenario}: {result.errors} updates raised")
+    floor = baseline["updates_per_sec"] * (1 - tolerance)
+    if result.updates_per_sec < floor:
+        problems.append(f"{result.scenario}: {result.updates_per_sec} updates/sec is below {floor:.1f}")
+    ceiling = baseline["p99_ms"] * (1 + tolerance)
+    if result.p99_ms > ceiling:
+        problems.append(f"{result.scenario}: p99 {result.p99_ms} ms is above {ceiling:.3f} ms")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rcon-latency-ms", type=float, default=0.0)
+    parser.add_argument("--check", action="store_true", help="fail when slower than the stored baselines")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        result = asyncio.run(
+            run_scenario(
+                name,
+                args.updates,
+                concurrency=args.concurrency,
+                db_latency=args.db_latency_ms / 1000,
+                telegram_latency=args.telegram_latency_ms / 1000,
+                rcon_latency=args.rcon_latency_ms / 1000,
+            )
+        )
+        results.append(result)
+        print(
+            f"{name:<14} {result.updates:>6} updates  {result.updates_per_sec:>9.1f}/s  "
+            f"p50 {result.p50_ms:>8.3f} ms  p99 {result.p99_ms:>8.3f} ms  "
+            f"errors {result.errors}  unhandled {result.unhandled}"
+        )
+
+    if args.save_baseline:
+        baselines = load_baselines()
+        baselines.update({result.scenario: asdict(result) for result in results})
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baselines to {BASELINES_PATH}")
+
+    if args.check:
+        baselines = load_baselines()
+        problems = []
+        for result in results:
+            if result.scenario in baselines:
+                problems.extend(compare_to_baseline(result, baselines[result.scenario], args.tolerance))
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Replay recorded traffic (RECORD_UPDATES_FILE) through the real handlers.
+
+Each sender's updates are fed in their recorded order; ``--speed`` scales
+the recorded pacing (1 = original, 10 = ten times faster, 0 = as fast as
+``--concurrency`` allows). Bot API, database and RCON are the same
+stand-ins the dispatcher benchmark uses::
+
+    python -m bot.benchmarks.replay updates.jsonl --speed 0
+    python -m bot.benchmarks.replay updates.jsonl --speed 5 --db-latency-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from bot.benchmarks.dispatcher import BenchResult, bench_dispatcher, feed_one, percentile
+from bot.benchmarks.standins import (
+    BENCH_ADMIN_CHAT_ID,
+    BENCH_ADMIN_ID,
+    BenchDatabase,
+    build_bench_context,
+    fake_rcon,
+)
+
+DECISION_DATA = re.compile(r"^(?:approve|deny):(\d+)$")
+
+
+def load_records(path: Path) -> List[Dict[str, Any]]:
+    records = []
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+def _user(record: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = BENCH_ADMIN_ID if record.get("admin") else record.get("user", 0)
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    if record.get("username"):
+        user["username"] = record["username"]
+    return user
+
+
+def _chat(record: Dict[str, Any]) -> Dict[str, Any]:
+    if record.get("admin_chat"):
+        return {"id": BENCH_ADMIN_CHAT_ID, "type": "supergroup"}
+    chat_type = record.get("chat_type", "private")
+    chat_id = record.get("chat", record.get("user", 0))
+    return {"id": chat_id, "type": chat_type}
+
+
+def to_update(bot: Bot, record: Dict[str, Any], update_id: int) -> Update:
+    now = int(datetime.now(timezone.utc).timestamp())
+    message: Dict[str, Any] = {"message_id": update_id, "date": now, "chat": _chat(record)}
+    if record["kind"] == "callback_query":
+        message["text"] = "New whitelist request"
+        payload = {
+            "callback_query": {
+                "id": str(update_id),
+                "from": _user(record),
+                "chat_instance": "replay",
+                "data": record.get("data"),
+                "message": message,
+            }
+        }
+    else:
+        message["from"] = _user(record)
+        if record.get("text") is not None:
+            message["text"] = record["text"]
+        if "reply_to_user" in record:
+            replied = record["reply_to_user"]
+            message["reply_to_message"] = {
+                "message_id": update_id,
+                "date": now,
+                "chat": message["chat"],
+                "from": {"id": replied, "is_bot": False, "first_name": f"User{replied}"},
+                "text": "",
+            }
+        payload = {"message": message}
+    return Update.model_validate({"update_id": update_id, **payload}, context={"bot": bot})
+
+
+def seed_decisions(database: BenchDatabase, records: List[Dict[str, Any]]) -> None:
+    """Create a pending request for every approve/deny button pressed in the recording."""
+    for record in records:
+        match = DECISION_DATA.match(record.get("data") or "")
+        if match and int(match.group(1)) not in database.requests:
+            request_id = int(match.group(1))
+            database.add(50_000 + request_id, f"Replay{request_id}", request_id=request_id)
+
+
+def group_streams(records: List[Dict[str, Any]]) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """Split records per (chat, sender) so each conversation keeps its order."""
+    streams: Dict[Tuple[Any, Any], List[Tuple[int, Dict[str, Any]]]] = {}
+    for update_id, record in enumerate(records, start=1):
+        key = (record.get("chat"), record.get("user", "admin" if record.get("admin") else None))
+        streams.setdefault(key, []).append((update_id, record))
+    return list(streams.values())
+
+
+async def replay(
+    records: List[Dict[str, Any]],
+    speed: float = 0.0,
+    concurrency: int = 32,
+    db_latency: float = 0.0,
+    telegram_latency: float = 0.0,
+    rcon_latency: float = 0.0,
+    name: str = "replay",
+) -> BenchResult:
+    database = BenchDatabase()
+    seed_decisions(database, records)
+    context = build_bench_context(database, db_latency=db_latency, telegram_latency=telegram_latency)
+    dp = bench_dispatcher(context)
+    latencies: List[float] = []
+    failures = {"errors": 0, "unhandled": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    origin = records[0]["t"] if records else 0.0
+
+    async def play(stream: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for update_id, record in stream:
+            if speed > 0:
+                delay = started + (record["t"] - origin) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            update = to_update(context.bot, record, update_id)
+            async with semaphore:
+                await feed_one(dp, context, update, latencies, failures)
+
+    with fake_rcon(rcon_latency):
+        started = loop.time()
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(play(stream) for stream in group_streams(records)))
+        elapsed = time.perf_counter() - wall_started
+
+    total = len(latencies)
+    return BenchResult(
+        scenario=name,
+        updates=total,
+        errors=failures["errors"],
+        unhandled=failures["unhandled"],
+        updates_per_sec=round(total / elapsed, 1) if elapsed else 0.0,
+        p50_ms=round(percentile(latencies, 0.5) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="JSONL written by RECORD_UPDATES_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="pacing multiplier; 0 replays at full speed")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rcon-latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    records = load_records(args.path)
+    result = asyncio.run(
+        replay(
+            records,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            db_latency=args.db_latency_ms / 1000,
+            telegram_latency=args.telegram_latency_ms / 1000,
+            rcon_latency=args.rcon_latency_ms / 1000,
+            name=args.path.name,
+        )
+    )
+    error_rate = result.errors / result.updates if result.updates else 0.0
+    print(
+        f"{result.scenario}: {result.updates} updates  {result.updates_per_sec:.1f}/s  "
+        f"p50 {result.p50_ms:.3f} ms  p99 {result.p99_ms:.3f} ms  "
+        f"errors {result.errors} ({error_rate:.2%})  unhandled {result.unhandled}"
+    )
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
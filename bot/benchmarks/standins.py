@@ -0,0 +1,245 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Iterable, Iterator, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import GetChat, GetMe, SendMessage, TelegramMethod
+from aiogram.types import Chat, Message, User
+
+from bot import rcon
+from bot.config import AppConfig, RconConfig, ThrottleConfig
+from bot.context import AppContext
+from bot.texts import Locale
+
+BENCH_BOT_TOKEN = "42:benchmark"
+BENCH_ADMIN_ID = 1
+BENCH_ADMIN_CHAT_ID = -100
+
+
+class LatencySession(BaseSession):
+    """Bot API stand-in: answers every method locally after ``latency`` seconds."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._message_id = 0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if isinstance(method, GetMe):
+            return User(id=42, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, GetChat):
+            raise TelegramBadRequest(method=method, message="Bad Request: chat not found")
+        if isinstance(method, SendMessage):
+            self._message_id += 1
+            chat_id = method.chat_id if isinstance(method.chat_id, int) else 0
+            return Message(
+                message_id=self._message_id,
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=chat_id, type="private" if chat_id > 0 else "supergroup"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        # No handler downloads files, so every download is a single empty chunk.
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        yield b""
+
+    async def close(self) -> None:
+        return None
+
+
+@dataclass
+class BenchDatabase:
+    """The whitelist_requests rows the handlers touch, kept in memory."""
+
+    requests: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    next_id: int = 1
+
+    def add(self, user_id: int, username: str, status: str = "pending", request_id: Optional[int] = None) -> int:
+        if request_id is None:
+            request_id = self.next_id
+        self.next_id = max(self.next_id, request_id + 1)
+        now = datetime.now(timezone.utc)
+        self.requests[request_id] = {
+            "id": request_id,
+            "user_id": user_id,
+            "chat_id": user_id,
+            "username": username,
+            "status": status,
+            "comment": None,
+            "created_at": now,
+            "decided_at": now if status != "pending" else None,
+            "decided_by": None,
+            "admin_message_id": None,
+        }
+        return request_id
+
+
+class BenchConn:
+    """Answers the queries in bot.db from a BenchDatabase after an injected delay.
+
+    Queries are recognised by fragments of their SQL, so this only needs to
+    know about the statements the benchmarked handlers actually run.
+    """
+
+    def __init__(self, database: BenchDatabase, latency: float) -> None:
+        self.database = database
+        self.latency = latency
+
+    async def fetchrow(self, query: str, *params: Any) -> Any:
+        await self._delay()
+        requests = self.database.requests
+        if "INSERT INTO whitelist_requests" in query:
+            user_id, _, username, comment = params[:4]
+            for record in requests.values():
+                if (
+                    record["status"] == "pending"
+                    and record["user_id"] == user_id
+                    and record["username"].lower() == username.lower()
+                ):
+                    return {"id": record["id"], "created": False}
+            request_id = self.database.add(user_id, username)
+            requests[request_id]["comment"] = comment
+            return {"id": request_id, "created": True}
+        if "WHERE id = $1" in query:
+            return requests.get(params[0])
+        if "WHERE username = $1 AND status = 'approved'" in query:
+            for record in requests.values():
+                if record["username"] == params[0] and record["status"] == "approved":
+                    return {"user_id": record["user_id"]}
+            return None
+        return None
+
+    async def fetch(self, query: str, *params: Any) -> List[Any]:
+        await self._delay()
+        requests = self.database.requests.values()
+        if "WHERE user_id = $1 AND status = 'approved'" in query:
+            return [r for r in requests if r["user_id"] == params[0] and r["status"] == "approved"]
+        if "WHERE user_id = $1" in query:
+            return [r for r in requests if r["user_id"] == params[0]]
+        if "WHERE status = 'approved'" in query:
+            approved = [r for r in requests if r["status"] == "approved"]
+            approved.sort(key=lambda r: (r["user_id"], -r["decided_at"].timestamp()))
+            return approved
+        return []
+
+    async def fetchval(self, query: str, *params: Any) -> Any:
+        await self._delay()
+        if "SET status = $2, decided_at = NOW()" in query:
+            record = self.database.requests.get(params[0])
+            if record is None or record["status"] != "pending":
+                return None
+            record.update(status=params[1], decided_by=params[2], decided_at=datetime.now(timezone.utc))
+            return record["id"]
+        # Advisory locks: a single benchmark process never contends with itself.
+        return "pg_try_advisory_lock" in query
+
+    async def execute(self, query: str, *params: Any) -> None:
+        await self._delay()
+        record = self.database.requests.get(params[0]) if params else None
+        if record is None:
+            return
+        if "SET status = $2, decided_at = NOW()" in query:
+            record.update(status=params[1], decided_by=params[2], decided_at=datetime.now(timezone.utc))
+        elif "SET admin_message_id" in query:
+            record["admin_message_id"] = params[1]
+        elif "DELETE FROM whitelist_requests" in query:
+            del self.database.requests[params[0]]
+
+    def transaction(self) -> "BenchConn":
+        return self
+
+    async def __aenter__(self) -> "BenchConn":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class BenchPool:
+    def __init__(self, database: BenchDatabase, latency: float = 0.0) -> None:
+        self.database = database
+        self.latency = latency
+
+    def acquire(self) -> BenchConn:
+        return BenchConn(self.database, self.latency)
+
+
+class _FakeRconClient:
+    def __init__(self, latency: float, whitelist: Dict[str, None]) -> None:
+        self.latency = latency
+        self.whitelist = whitelist
+
+    def __enter__(self) -> "_FakeRconClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def command(self, cmd: str) -> str:
+        # Deliberately blocking, like the real MCRcon client.
+        if self.latency:
+            time.sleep(self.latency)
+        if cmd == "whitelist list":
+            return f"There are {len(self.whitelist)} whitelisted players: {', '.join(self.whitelist)}"
+        action, _, name = cmd.partition(" ")[2].partition(" ")
+        if action == "add":
+            self.whitelist[name] = None
+        elif action == "remove":
+            self.whitelist.pop(name, None)
+        return "ok"
+
+
+@contextmanager
+def fake_rcon(latency: float = 0.0, whitelist: Iterable[str] = ()) -> Iterator[Dict[str, None]]:
+    """Point bot.rcon at an in-process server whitelist for the duration of the block.
+
+    The whitelist is an insertion-ordered dict so that removals stay cheap
+    with hundreds of thousands of names.
+    """
+    names = dict.fromkeys(whitelist)
+    original = rcon.MCRcon
+    rcon.MCRcon = lambda *args, **kwargs: _FakeRconClient(latency, names)
+    try:
+        yield names
+    finally:
+        rcon.MCRcon = original
+
+
+def build_bench_context(database: BenchDatabase, db_latency: float = 0.0, telegram_latency: float = 0.0) -> AppContext:
+    bot = Bot(token=BENCH_BOT_TOKEN, session=LatencySession(telegram_latency))
+    config = AppConfig(
+        bot_token=BENCH_BOT_TOKEN,
+        admin_chat_id=BENCH_ADMIN_CHAT_ID,
+        admin_ids=[BENCH_ADMIN_ID],
+        migrations_dir=Path("."),
+        rcon=RconConfig("bench", 0, ""),
+        db_dsn="",
+        locale=Locale("en"),
+        throttle=ThrottleConfig(request_limit=0, command_limit=0),
+    )
+    return AppContext(bot=bot, pool=BenchPool(database, db_latency), config=config)
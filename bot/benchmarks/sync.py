@@ -0,0 +1,244 @@
+"""Scaling benchmark for ``sync_whitelist`` and ``cleanup_secondary_accounts``.
+
+Seeds ``--rows`` whitelist_requests rows with a realistic mix of statuses
+and alt accounts, pairs them with a simulated server whitelist and times
+one full sync by phase (fetch, RCON list, diff, revoke) plus peak memory::
+
+    BENCH_DATABASE_URL=postgresql://... python -m bot.benchmarks.sync --rows 100000
+    python -m bot.benchmarks.sync --backend memory --rows 10000
+
+The Postgres backend runs the real migrations in a scratch schema
+(``--schema``, dropped afterwards unless ``--keep``), so point it at a
+disposable database rather than production.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from bot.benchmarks.standins import BenchDatabase, BenchPool, build_bench_context, fake_rcon
+from bot.db import apply_migrations
+from bot.services.whitelist import sync_whitelist
+from bot.tracing import span, trace
+
+MIGRATIONS_DIR = Path(os.environ.get("MIGRATIONS_DIR", Path(__file__).resolve().parents[2] / "schema"))
+
+COLUMNS = ("user_id", "chat_id", "username", "status", "created_at", "decided_at", "decided_by")
+
+# Share of users whose latest request ended in each status.
+STATUS_WEIGHTS = {"approved": 0.6, "denied": 0.2, "pending": 0.1, "expired": 0.1}
+
+
+@dataclass
+class SeedData:
+    rows: List[Tuple[Any, ...]]
+    server_whitelist: List[str]
+    approved: int
+    alts: int
+    unknown: int
+
+
+@dataclass
+class SyncResult:
+    backend: str
+    rows: int
+    approved: int
+    server_names: int
+    removed: int
+    total_ms: float
+    phases_ms: Dict[str, float] = field(default_factory=dict)
+    peak_memory_mb: Optional[float] = None
+
+
+def generate_rows(rows: int, alt_rate: float = 0.05, unknown_rate: float = 0.02, seed: int = 1) -> SeedData:
+    """Build ``rows`` requests spread over users the way production data looks.
+
+    Every user has a latest request drawn from STATUS_WEIGHTS, some approved
+    users also hold one to three older approved alts (what the cleanup pass
+    revokes), and about a third carry older denied/expired history. The
+    server whitelist holds every approved name plus ``unknown_rate`` names
+    the database has never seen.
+    """
+    rng = random.Random(seed)
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    now = datetime.now(timezone.utc)
+    records: List[Tuple[Any, ...]] = []
+    whitelist: List[str] = []
+    alts = 0
+    user_id = 100_000
+
+    def add(username: str, status: str, age_days: float) -> None:
+        created = now - timedelta(days=age_days)
+        decided = None if status == "pending" else created + timedelta(hours=1)
+        records.append((user_id, user_id, username, status, created, decided, None if decided is None else 1))
+        if status == "approved":
+            whitelist.append(username)
+
+    while len(records) < rows:
+        user_id += 1
+        age = rng.uniform(1, 700)
+        if rng.random() < 0.3:
+            for index in range(rng.randint(1, 2)):
+                add(f"h{user_id}_{index}", rng.choice(("denied", "expired")), age + 30 * (index + 1))
+        status = rng.choices(statuses, weights)[0]
+        add(f"p{user_id}", status, age)
+        if status == "approved" and rng.random() < alt_rate:
+            for index in range(rng.randint(1, 3)):
+                add(f"a{user_id}_{index}", "approved", age + 10 * (index + 1))
+                alts += 1
+
+    records = records[:rows]
+    approved = sum(1 for record in records if record[3] == "approved")
+    whitelist = whitelist[:approved]
+    unknown = int(len(whitelist) * unknown_rate)
+    whitelist.extend(f"stranger{index}" for index in range(unknown))
+    rng.shuffle(whitelist)
+    return SeedData(records, whitelist, approved=approved, alts=alts, unknown=unknown)
+
+
+def seed_memory(data: SeedData) -> BenchPool:
+    database = BenchDatabase()
+    for user_id, _, username, status, created, decided, decided_by in data.rows:
+        request_id = database.add(user_id, username, status=status)
+        database.requests[request_id].update(created_at=created, decided_at=decided, decided_by=decided_by)
+    return BenchPool(database)
+
+
+async def seed_postgres(dsn: str, schema: str, data: SeedData) -> asyncpg.Pool:
+    pool = await asyncpg.create_pool(dsn=dsn, server_settings={"search_path": schema})
+    async with pool.acquire() as conn:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE; CREATE SCHEMA "{schema}"')
+    await apply_migrations(pool, MIGRATIONS_DIR)
+    async with pool.acquire() as conn:
+        # Seeding should not fire a NOTIFY per approved row; the sync itself
+        # runs with triggers on, as in production.
+        await conn.execute("ALTER TABLE whitelist_requests DISABLE TRIGGER USER")
+        await conn.copy_records_to_table("whitelist_requests", records=data.rows, columns=COLUMNS)
+        await conn.execute("ALTER TABLE whitelist_requests ENABLE TRIGGER USER")
+        await conn.execute("ANALYZE whitelist_requests")
+    return pool
+
+
+async def drop_schema(pool: asyncpg.Pool, schema: str) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+
+
+async def run_sync(
+    pool: Any,
+    server_whitelist: List[str],
+    backend: str,
+    rows: int,
+    approved: int,
+    rcon_latency: float = 0.0,
+    use_index: bool = False,
+    measure_memory: bool = True,
+) -> SyncResult:
+    context = build_bench_context(BenchDatabase())
+    context.pool = pool
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        with fake_rcon(rcon_latency, server_whitelist), trace("sync") as root:
+            started = time.perf_counter()
+            if use_index:
+                with span("sync.index_load"):
+                    await context.approved.load(pool)
+            removed = await sync_whitelist(context)
+            total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+
+    phases: Dict[str, float] = {}
+    for child in root.spans:
+        if child.name.startswith("sync."):
+            phase = child.name.split(".", 1)[1]
+            phases[phase] = round(phases.get(phase, 0.0) + child.duration_ms, 3)
+    return SyncResult(
+        backend=backend,
+        rows=rows,
+        approved=approved,
+        server_names=len(server_whitelist),
+        removed=len(removed),
+        total_ms=round(total * 1000, 3),
+        phases_ms=phases,
+        peak_memory_mb=round(peak / 1_048_576, 2) if peak is not None else None,
+    )
+
+
+async def run(args: argparse.Namespace) -> SyncResult:
+    data = generate_rows(args.rows, alt_rate=args.alt_rate, unknown_rate=args.unknown_rate, seed=args.seed)
+    logging.info(
+        "Seeded %d rows: %d approved (%d alts), %d unknown server names",
+        len(data.rows),
+        data.approved,
+        data.alts,
+        data.unknown,
+    )
+    options = dict(
+        rcon_latency=args.rcon_latency_ms / 1000,
+        use_index=args.use_index,
+        measure_memory=not args.no_tracemalloc,
+    )
+    if args.backend == "memory":
+        pool = seed_memory(data)
+        return await run_sync(pool, data.server_whitelist, "memory", len(data.rows), data.approved, **options)
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn for the postgres backend")
+    pool = await seed_postgres(args.dsn, args.schema, data)
+    try:
+        return await run_sync(pool, data.server_whitelist, "postgres", len(data.rows), data.approved, **options)
+    finally:
+        if not args.keep:
+            await drop_schema(pool, args.schema)
+        await pool.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("postgres", "memory"), default="postgres")
+    parser.add_argument("--dsn", default=os.environ.get("BENCH_DATABASE_URL", ""))
+    parser.add_argument("--schema", default="bench_sync")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded schema in place")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--alt-rate", type=float, default=0.05, help="share of approved users with alts")
+    parser.add_argument("--unknown-rate", type=float, default=0.02, help="server names missing from the DB")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rcon-latency-ms", type=float, default=0.0)
+    parser.add_argument("--use-index", action="store_true", help="load the in-memory approved index first")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip peak memory tracking (it slows the sync)")
+    parser.add_argument("--output", type=Path, help="append the result as a JSON line")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+
+    phases = "  ".join(f"{name} {ms:.1f} ms" for name, ms in sorted(result.phases_ms.items()))
+    memory = f"  peak {result.peak_memory_mb} MiB" if result.peak_memory_mb is not None else ""
+    print(f"{result.backend} {result.rows} rows: {result.total_ms:.1f} ms  removed {result.removed}{memory}")
+    print(f"  {phases}")
+    if args.output:
+        with args.output.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(asdict(result)) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,14 @@
+import json
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import List
 
 from bot.texts import Locale
 
+DEFAULT_TENANT = "default"
+
 
 @dataclass
 class RconConfig:
@@ -14,6 +17,49 @@ class RconConfig:
     password: str
 
 
+@dataclass
+class ThrottleConfig:
+    request_limit: int = 5
+    request_window: int = 60
+    command_limit: int = 10
+    command_window: int = 60
+    backend: str = "memory"
+    max_keys: int = 10_000
+
+
+@dataclass
+class LoggingConfig:
+    level: str = "INFO"
+    levels: str = ""
+    json: bool = False
+    sql_sample_rate: float = 0.0
+
+
+@dataclass
+class TracingConfig:
+    file: str = ""
+    slow_ms: float = 0.0
+    max_bytes: int = 10_000_000
+    backup_count: int = 5
+
+
+@dataclass
+class RecordingConfig:
+    file: str = ""
+    salt: str = ""
+    max_bytes: int = 10_000_000
+    backup_count: int = 5
+
+
+@dataclass
+class WebhookConfig:
+    url: str = ""
+    path: str = "/telegram"
+    host: str = "0.0.0.0"
+    port: int = 8080
+    secret: str = ""
+
+
 @dataclass
 class AppConfig:
     bot_token: str
@@ -23,6 +69,26 @@ class AppConfig:
     rcon: RconConfig
     db_dsn: str
     locale: Locale
+    throttle: ThrottleConfig = field(default_factory=ThrottleConfig)
+    pending_ttl_hours: float = 0
+    metrics_host: str = "0.0.0.0"
+    metrics_port: int = 0
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    tracing: TracingConfig = field(default_factory=TracingConfig)
+    loop_block_threshold_ms: float = 500.0
+    recording: RecordingConfig = field(default_factory=RecordingConfig)
+    shutdown_timeout: float = 20.0
+    db_pool_min_size: int = 10
+    db_pool_max_size: int = 10
+    db_replica_dsn: str = ""
+    db_replica_max_lag: float = 5.0
+    tenant: str = DEFAULT_TENANT
+    tenants_file: str = ""
+    webhook: WebhookConfig = field(default_factory=WebhookConfig)
+    job_concurrency: int = 2
+    uuid_resolver_url: str = ""
+    uuid_cache_ttl_hours: float = 24.0
+    whitelist_file: str = ""
 
 
 def parse_admin_ids(value: str) -> List[int]:
@@ -60,22 +126,128 @@ def load_config() -> AppConfig:
         port=int(os.environ.get("RCON_PORT", "25575")),
         password=os.environ.get("RCON_PASSWORD", ""),
     )
+    throttle_config = ThrottleConfig(
+        request_limit=int(os.environ.get("THROTTLE_REQUEST_LIMIT", "5")),
+        request_window=int(os.environ.get("THROTTLE_REQUEST_WINDOW", "60")),
+        command_limit=int(os.environ.get("THROTTLE_COMMAND_LIMIT", "10")),
+        command_window=int(os.environ.get("THROTTLE_COMMAND_WINDOW", "60")),
+        backend=os.environ.get("THROTTLE_BACKEND", "memory").lower(),
+        max_keys=int(os.environ.get("THROTTLE_MAX_KEYS", "10000")),
+    )
+    logging_config = LoggingConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        levels=os.environ.get("LOG_LEVELS", ""),
+        json=os.environ.get("LOG_FORMAT", "text").lower() == "json",
+        sql_sample_rate=float(os.environ.get("SQL_TRACE_SAMPLE_RATE", "0")),
+    )
+    tracing_config = TracingConfig(
+        file=os.environ.get("TRACE_FILE", ""),
+        slow_ms=float(os.environ.get("TRACE_SLOW_MS", "0")),
+        max_bytes=int(os.environ.get("TRACE_MAX_BYTES", "10000000")),
+        backup_count=int(os.environ.get("TRACE_BACKUP_COUNT", "5")),
+    )
+    recording_config = RecordingConfig(
+        file=os.environ.get("RECORD_UPDATES_FILE", ""),
+        salt=os.environ.get("RECORD_UPDATES_SALT", ""),
+        max_bytes=int(os.environ.get("RECORD_UPDATES_MAX_BYTES", "10000000")),
+        backup_count=int(os.environ.get("RECORD_UPDATES_BACKUP_COUNT", "5")),
+    )
+    webhook_config = WebhookConfig(
+        url=os.environ.get("WEBHOOK_URL", "").rstrip("/"),
+        path="/" + os.environ.get("WEBHOOK_PATH", "/telegram").strip("/"),
+        host=os.environ.get("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.environ.get("WEBHOOK_PORT", "8080")),
+        secret=os.environ.get("WEBHOOK_SECRET", ""),
+    )
     migrations_dir = Path(os.environ.get("MIGRATIONS_DIR", "/app/schema"))
+    tenants_file = os.environ.get("TENANTS_FILE", "")
 
-    if not bot_token:
-        raise RuntimeError("BOT_TOKEN is required")
-    if not admin_chat_id_raw:
-        raise RuntimeError("ADMIN_CHAT_ID is required")
+    # With a tenants file every community brings its own token and admin chat.
+    if not tenants_file:
+        if not bot_token:
+            raise RuntimeError("BOT_TOKEN is required")
+        if not admin_chat_id_raw:
+            raise RuntimeError("ADMIN_CHAT_ID is required")
 
-    admin_chat_id = int(admin_chat_id_raw)
+    admin_chat_id = int(admin_chat_id_raw or 0)
     admin_ids = parse_admin_ids(admin_ids_raw)
 
     return AppConfig(
-        bot_token=bot_token,
+        bot_token=bot_token or "",
         admin_chat_id=admin_chat_id,
         admin_ids=admin_ids,
         migrations_dir=migrations_dir,
         rcon=rcon_config,
         db_dsn=db_dsn,
         locale=Locale(locale_name),
+        throttle=throttle_config,
+        pending_ttl_hours=float(os.environ.get("PENDING_TTL_HOURS", "0")),
+        metrics_host=os.environ.get("METRICS_HOST", "0.0.0.0"),
+        metrics_port=int(os.environ.get("METRICS_PORT", "0")),
+        logging=logging_config,
+        tracing=tracing_config,
+        loop_block_threshold_ms=float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "500")),
+        recording=recording_config,
+        shutdown_timeout=float(os.environ.get("SHUTDOWN_TIMEOUT", "20")),
+        db_pool_min_size=int(os.environ.get("DB_POOL_MIN_SIZE", "10")),
+        db_pool_max_size=int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+        db_replica_dsn=os.environ.get("DATABASE_REPLICA_URL", ""),
+        db_replica_max_lag=float(os.environ.get("DB_REPLICA_MAX_LAG", "5")),
+        tenants_file=tenants_file,
+        webhook=webhook_config,
+        job_concurrency=int(os.environ.get("JOB_CONCURRENCY", "2")),
+        uuid_resolver_url=os.environ.get("UUID_RESOLVER_URL", ""),
+        uuid_cache_ttl_hours=float(os.environ.get("UUID_CACHE_TTL_HOURS", "24")),
+        whitelist_file=os.environ.get("WHITELIST_FILE", ""),
     )
+
+
+def load_tenant_configs(config: AppConfig) -> List[AppConfig]:
+    """One AppConfig per community listed in ``config.tenants_file``.
+
+    The file is a JSON list of objects with ``key``, ``bot_token``,
+    ``admin_chat_id`` and optional ``admin_ids``, ``locale``, ``rcon``
+    (``host``, ``port``, ``password``) and ``whitelist_file``; everything
+    else is shared with ``config``. Without a tenants file ``config`` is the only tenant.
+    """
+    if not config.tenants_file:
+        return [config]
+
+    entries = json.loads(Path(config.tenants_file).read_text(encoding="utf-8"))
+    tenants: List[AppConfig] = []
+    keys: set[str] = set()
+    tokens: set[str] = set()
+    for entry in entries:
+        key = str(entry.get("key", "")).strip()
+        if not key:
+            raise RuntimeError("Every tenant needs a key")
+        if key in keys:
+            raise RuntimeError(f"Tenant {key} is listed twice")
+        if not entry.get("bot_token") or not entry.get("admin_chat_id"):
+            raise RuntimeError(f"Tenant {key} needs bot_token and admin_chat_id")
+        if entry["bot_token"] in tokens:
+            raise RuntimeError(f"Tenant {key} reuses another tenant's bot token")
+        keys.add(key)
+        tokens.add(entry["bot_token"])
+
+        rcon = entry.get("rcon") or {}
+        admin_ids = entry.get("admin_ids", [])
+        tenants.append(
+            replace(
+                config,
+                tenant=key,
+                bot_token=entry["bot_token"],
+                admin_chat_id=int(entry["admin_chat_id"]),
+                admin_ids=parse_admin_ids(admin_ids) if isinstance(admin_ids, str) else [int(i) for i in admin_ids],
+                locale=Locale(str(entry.get("locale", "en")).lower()),
+                rcon=RconConfig(
+                    host=rcon.get("host", config.rcon.host),
+                    port=int(rcon.get("port", config.rcon.port)),
+                    password=rcon.get("password", config.rcon.password),
+                ),
+                whitelist_file=str(entry.get("whitelist_file", "")),
+            )
+        )
+    if not tenants:
+        raise RuntimeError(f"{config.tenants_file} lists no tenants")
+    return tenants
@@ -1,9 +1,17 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 import asyncpg
 from aiogram import Bot
 
 from bot.config import AppConfig
+from bot.services.approved import ApprovedIndex
+from bot.services.audit import AuditLog
+from bot.services.directory import UsernameDirectory
+from bot.services.expiry import ExpiryScheduler
+from bot.services.jobs import JobRunner
+from bot.services.uuids import UuidCache
+from bot.services.whois_cache import WhoisCache
 
 
 @dataclass
@@ -11,3 +19,15 @@ class AppContext:
     bot: Bot
     pool: asyncpg.Pool
     config: AppConfig
+    approved: ApprovedIndex = field(default_factory=ApprovedIndex)
+    usernames: UsernameDirectory = field(default_factory=UsernameDirectory)
+    whois_cache: WhoisCache = field(default_factory=WhoisCache)
+    audit: AuditLog = field(default_factory=AuditLog)
+    expiry: Optional[ExpiryScheduler] = None
+    jobs: Optional[JobRunner] = None
+    uuids: Optional[UuidCache] = None
+
+    def __post_init__(self) -> None:
+        # Changes broadcast by other replicas reach this tenant's cache through its index.
+        if self.approved.whois_cache is None:
+            self.approved.whois_cache = self.whois_cache
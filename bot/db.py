@@ -1,138 +1,890 @@
+import asyncio
+import hashlib
+import json
 import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from uuid import UUID
 
 import asyncpg
 
+from bot.config import DEFAULT_TENANT
+from bot.instrumentation import instrument_db
+
 logger = logging.getLogger(__name__)
 
+_sql_sample_rate = 0.0
+
+
+def set_sql_sample_rate(rate: float) -> None:
+    """Log roughly this fraction of queries at DEBUG; 0 disables SQL tracing entirely."""
+    global _sql_sample_rate
+    _sql_sample_rate = min(max(rate, 0.0), 1.0)
+
+
+def _trace_sql() -> bool:
+    if not _sql_sample_rate or not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return _sql_sample_rate >= 1.0 or random.random() < _sql_sample_rate
+
+
+class _SingleConnection:
+    """Lets the pool-taking query functions run on one specific connection."""
+
+    def __init__(self, conn: asyncpg.Connection) -> None:
+        self._conn = conn
+
+    def acquire(self) -> "_SingleConnection":
+        return self
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+# Replay position of a streaming replica in seconds behind the primary; 0 when
+# it has replayed everything it received, or when pointed at a primary.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+
+class PoolRouter:
+    """The primary pool plus a read replica for the read-only lookups.
+
+    Anything calling ``acquire()`` gets the primary, so the router stands in
+    for a pool everywhere. The read functions below ask ``reader()``, which
+    hands out the replica only while its measured lag is within ``max_lag``
+    seconds and no request was written through this router in that window,
+    so a user never reads back an older state than they just caused.
+    """
+
+    def __init__(
+        self,
+        primary: asyncpg.Pool,
+        replica: asyncpg.Pool,
+        max_lag: float = 5.0,
+        check_interval: float = 5.0,
+    ) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self._written_at = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def acquire(self) -> Any:
+        return self.primary.acquire()
+
+    def reader(self) -> asyncpg.Pool:
+        if self.lag is None or self.lag > self.max_lag:
+            return self.primary
+        if time.monotonic() - self._written_at < self.max_lag:
+            return self.primary
+        return self.replica
+
+    def note_write(self) -> None:
+        self._written_at = time.monotonic()
+
+    async def start(self) -> None:
+        await self.check()
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def check(self) -> None:
+        try:
+            async with self.replica.acquire() as conn:
+                lag = await conn.fetchval(REPLICA_LAG_QUERY)
+        except Exception:
+            logger.exception("Replica lag check failed, reading from the primary")
+            lag = None
+        stale = lag is None or lag > self.max_lag
+        was_stale = self.lag is None or self.lag > self.max_lag
+        if stale and not was_stale:
+            logger.warning("Replica is %s s behind, reading from the primary", lag)
+        elif was_stale and not stale:
+            logger.info("Replica caught up (%.1f s behind), reading from it again", lag)
+        self.lag = lag
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+
+AnyPool = Union[asyncpg.Pool, PoolRouter]
+
+
+def _reader(pool: AnyPool) -> Any:
+    return pool.reader() if isinstance(pool, PoolRouter) else pool
+
+
+def _note_write(pool: AnyPool) -> None:
+    if isinstance(pool, PoolRouter):
+        pool.note_write()
+
+
+def primary_pool(pool: AnyPool) -> asyncpg.Pool:
+    """The primary behind ``pool``, for reads that must see the latest writes."""
+    return pool.primary if isinstance(pool, PoolRouter) else pool
+
 
 async def apply_migrations(pool: asyncpg.Pool, migrations_dir: Path) -> None:
+    """Run the files in ``migrations_dir`` that schema_migrations has not recorded yet.
+
+    Each file runs once, in name order, in the same transaction as its
+    ledger row, so shipped migrations never run again on top of later ones.
+    Replicas starting together wait on an advisory lock and run them one
+    at a time; the later ones find everything recorded.
+    """
     if not migrations_dir.exists():
         logger.warning("Migrations directory %s does not exist, skipping", migrations_dir)
         return
 
-    for path in sorted(migrations_dir.glob("*.sql")):
-        sql = path.read_text()
-        logger.info("Applying migration %s", path.name)
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                await conn.execute(sql)
+    key = lock_key("migrations")
+    async with pool.acquire() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", key)
+        try:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            applied = {record["name"] for record in await conn.fetch("SELECT name FROM schema_migrations")}
+            for path in sorted(migrations_dir.glob("*.sql")):
+                if path.name in applied:
+                    continue
+                logger.info("Applying migration %s", path.name)
+                async with conn.transaction():
+                    await conn.execute(path.read_text())
+                    await conn.execute("INSERT INTO schema_migrations (name) VALUES ($1)", path.name)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", key)
 
 
+@instrument_db
 async def create_request(
     pool: asyncpg.Pool,
     user_id: int,
     chat_id: int,
     username: str,
     comment: Optional[str],
-) -> int:
+    tenant: str = DEFAULT_TENANT,
+) -> Tuple[int, bool]:
+    """Create a pending request, or return the user's existing pending one for the same name.
+
+    Returns ``(request_id, created)``.
+    """
     query = """
-        INSERT INTO whitelist_requests (user_id, chat_id, username, comment)
-        VALUES ($1, $2, $3, $4)
-        RETURNING id
+        INSERT INTO whitelist_requests (user_id, chat_id, username, comment, tenant)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (tenant, user_id, lower(username)) WHERE status = 'pending'
+        DO UPDATE SET chat_id = EXCLUDED.chat_id
+        RETURNING id, (xmax = 0) AS created
     """
-    logger.debug("SQL create_request: %s | params=%s", query.strip(), (user_id, chat_id, username, comment))
+    params = (user_id, chat_id, username, comment, tenant)
+    if _trace_sql():
+        logger.debug("SQL create_request: %s | params=%s", query.strip(), params)
+    _note_write(pool)
     async with pool.acquire() as conn:
-        record = await conn.fetchrow(query, user_id, chat_id, username, comment)
-        return int(record["id"])
+        record = await conn.fetchrow(query, *params)
+        return int(record["id"]), bool(record["created"])
 
 
-async def fetch_request(pool: asyncpg.Pool, request_id: int) -> Optional[asyncpg.Record]:
-    query = "SELECT * FROM whitelist_requests WHERE id = $1"
-    logger.debug("SQL fetch_request: %s | params=%s", query, (request_id,))
+@instrument_db
+async def fetch_request(
+    pool: asyncpg.Pool, request_id: int, tenant: str = DEFAULT_TENANT
+) -> Optional[asyncpg.Record]:
+    query = "SELECT * FROM whitelist_requests WHERE id = $1 AND tenant = $2"
+    if _trace_sql():
+        logger.debug("SQL fetch_request: %s | params=%s", query, (request_id, tenant))
     async with pool.acquire() as conn:
-        return await conn.fetchrow(query, request_id)
+        return await conn.fetchrow(query, request_id, tenant)
 
 
-async def mark_request(pool: asyncpg.Pool, request_id: int, status: str, decided_by: int) -> None:
+@instrument_db
+async def mark_request(pool: asyncpg.Pool, request_id: int, status: str, decided_by: int) -> bool:
+    """Decide a pending request; False when it was already decided (by another admin, say)."""
     query = """
         UPDATE whitelist_requests
         SET status = $2, decided_at = NOW(), decided_by = $3
-        WHERE id = $1
+        WHERE id = $1 AND status = 'pending'
+        RETURNING id
     """
-    logger.debug("SQL mark_request: %s | params=%s", query.strip(), (request_id, status, decided_by))
+    if _trace_sql():
+        logger.debug("SQL mark_request: %s | params=%s", query.strip(), (request_id, status, decided_by))
+    _note_write(pool)
     async with pool.acquire() as conn:
-        await conn.execute(query, request_id, status, decided_by)
+        return await conn.fetchval(query, request_id, status, decided_by) is not None
 
 
-async def fetch_usernames(pool: asyncpg.Pool, user_id: int) -> List[asyncpg.Record]:
+@instrument_db
+async def set_admin_message_id(pool: asyncpg.Pool, request_id: int, message_id: int) -> None:
+    query = "UPDATE whitelist_requests SET admin_message_id = $2 WHERE id = $1"
+    if _trace_sql():
+        logger.debug("SQL set_admin_message_id: %s | params=%s", query, (request_id, message_id))
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        await conn.execute(query, request_id, message_id)
+
+
+@instrument_db
+async def fetch_pending_requests(pool: asyncpg.Pool, tenant: str = DEFAULT_TENANT) -> List[asyncpg.Record]:
     query = """
-        SELECT username, decided_at, status
+        SELECT id, created_at
         FROM whitelist_requests
-        WHERE user_id = $1
-        ORDER BY decided_at DESC NULLS LAST, created_at DESC
+        WHERE status = 'pending' AND tenant = $1
     """
-    logger.debug("SQL fetch_usernames: %s | params=%s", query.strip(), (user_id,))
+    if _trace_sql():
+        logger.debug("SQL fetch_pending_requests: %s | params=%s", query.strip(), (tenant,))
     async with pool.acquire() as conn:
-        return await conn.fetch(query, user_id)
+        return await conn.fetch(query, tenant)
 
 
-async def fetch_user_by_mc_username(pool: asyncpg.Pool, mc_username: str) -> Optional[int]:
+@instrument_db
+async def expire_requests(pool: asyncpg.Pool, request_ids: List[int]) -> List[asyncpg.Record]:
+    query = """
+        UPDATE whitelist_requests
+        SET status = 'expired', decided_at = NOW()
+        WHERE id = ANY($1::int[]) AND status = 'pending'
+        RETURNING id, user_id, chat_id, username, admin_message_id
+    """
+    if _trace_sql():
+        logger.debug("SQL expire_requests: %s | params=%s", query.strip(), (request_ids,))
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        return await conn.fetch(query, request_ids)
+
+
+# Sort key for a user's history: newest decision first, undecided rows last.
+HISTORY_ORDER = "COALESCE(decided_at, '-infinity'::timestamptz)"
+
+
+@instrument_db
+async def fetch_usernames_page(
+    pool: asyncpg.Pool,
+    user_id: int,
+    limit: int,
+    cursor: Optional[Tuple[Optional[datetime], int]] = None,
+    newer: bool = False,
+    tenant: str = DEFAULT_TENANT,
+) -> List[asyncpg.Record]:
+    """Up to ``limit`` of a user's requests, keyset-paginated by ``(decided_at, id)``.
+
+    ``cursor`` is the ``(decided_at, id)`` of the edge row of the current
+    page: rows after it come back, or rows before it with ``newer``. Either
+    way they are ordered newest first.
+    """
+    if cursor is None:
+        condition = ""
+        params: Tuple[Any, ...] = (user_id, tenant, limit)
+    else:
+        comparison = ">" if newer else "<"
+        condition = (
+            f"AND ({HISTORY_ORDER}, id) {comparison} "
+            "(COALESCE($4::timestamptz, '-infinity'::timestamptz), $5)"
+        )
+        params = (user_id, tenant, limit, cursor[0], cursor[1])
+    direction = "ASC" if newer and cursor is not None else "DESC"
+    query = f"""
+        SELECT id, username, decided_at, status
+        FROM whitelist_requests
+        WHERE user_id = $1 AND tenant = $2 {condition}
+        ORDER BY {HISTORY_ORDER} {direction}, id {direction}
+        LIMIT $3
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_usernames_page: %s | params=%s", query.strip(), params)
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, *params)
+    return list(reversed(records)) if direction == "ASC" else list(records)
+
+
+@instrument_db
+async def fetch_recent_usernames(
+    pool: asyncpg.Pool, user_ids: List[int], per_user: int, tenant: str = DEFAULT_TENANT
+) -> List[asyncpg.Record]:
+    """The latest ``per_user`` requests of each user, with their total as ``total``."""
+    query = f"""
+        SELECT user_id, username, decided_at, status, total
+        FROM (
+            SELECT user_id, username, decided_at, status,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY {HISTORY_ORDER} DESC, id DESC) AS rank,
+                   COUNT(*) OVER (PARTITION BY user_id) AS total
+            FROM whitelist_requests
+            WHERE user_id = ANY($1::bigint[]) AND tenant = $2
+        ) AS ranked
+        WHERE rank <= $3
+        ORDER BY user_id, rank
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_recent_usernames: %s | params=%s", query.strip(), (user_ids, tenant, per_user))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, user_ids, tenant, per_user)
+
+
+@instrument_db
+async def fetch_users_by_mc_usernames(
+    pool: asyncpg.Pool, mc_usernames: List[str], tenant: str = DEFAULT_TENANT
+) -> Dict[str, int]:
+    """Approved owner of each of ``mc_usernames``; names nobody owns are left out."""
+    query = """
+        SELECT DISTINCT ON (username) username, user_id
+        FROM whitelist_requests
+        WHERE username = ANY($1::text[]) AND status = 'approved' AND tenant = $2
+        ORDER BY username, decided_at DESC NULLS LAST, created_at DESC
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_users_by_mc_usernames: %s | params=%s", query.strip(), (mc_usernames, tenant))
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, mc_usernames, tenant)
+    return {record["username"]: int(record["user_id"]) for record in records}
+
+
+@instrument_db
+async def fetch_user_by_mc_username(
+    pool: asyncpg.Pool, mc_username: str, tenant: str = DEFAULT_TENANT
+) -> Optional[int]:
     query = """
         SELECT user_id
         FROM whitelist_requests
-        WHERE username = $1 AND status = 'approved'
+        WHERE username = $1 AND status = 'approved' AND tenant = $2
         ORDER BY decided_at DESC NULLS LAST, created_at DESC
         LIMIT 1
     """
-    logger.debug("SQL fetch_user_by_mc_username: %s | params=%s", query.strip(), (mc_username,))
-    async with pool.acquire() as conn:
-        record = await conn.fetchrow(query, mc_username)
+    if _trace_sql():
+        logger.debug("SQL fetch_user_by_mc_username: %s | params=%s", query.strip(), (mc_username, tenant))
+    async with _reader(pool).acquire() as conn:
+        record = await conn.fetchrow(query, mc_username, tenant)
         if not record:
             return None
         return int(record["user_id"])
 
 
-async def fetch_approved_usernames(pool: asyncpg.Pool) -> List[str]:
+@instrument_db
+async def fetch_users_by_uuids(
+    pool: asyncpg.Pool, uuids: List[UUID], tenant: str = DEFAULT_TENANT
+) -> Dict[UUID, int]:
+    """Approved owner of each player UUID, whatever name the request was made under."""
     query = """
-        SELECT username
+        SELECT DISTINCT ON (uuid) uuid, user_id
         FROM whitelist_requests
-        WHERE status = 'approved'
+        WHERE uuid = ANY($1::uuid[]) AND status = 'approved' AND tenant = $2
+        ORDER BY uuid, decided_at DESC NULLS LAST, created_at DESC
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_users_by_uuids: %s | params=%s", query.strip(), (uuids, tenant))
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, uuids, tenant)
+    return {record["uuid"]: int(record["user_id"]) for record in records}
+
+
+@instrument_db
+async def fetch_requests_for_players(
+    pool: asyncpg.Pool, usernames: List[str], uuids: List[UUID], tenant: str = DEFAULT_TENANT
+) -> List[asyncpg.Record]:
+    """Approved and pending requests for any of ``usernames`` (in any case) or player ``uuids``."""
+    query = """
+        SELECT id, user_id, username, uuid, status
+        FROM whitelist_requests
+        WHERE tenant = $3 AND status IN ('approved', 'pending')
+          AND (lower(username) = ANY($1::text[]) OR uuid = ANY($2::uuid[]))
+    """
+    name_keys = [username.lower() for username in usernames]
+    if _trace_sql():
+        logger.debug("SQL fetch_requests_for_players: %s | params=%s", query.strip(), (name_keys, uuids, tenant))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, name_keys, uuids, tenant)
+
+
+@instrument_db
+async def set_request_uuids(pool: asyncpg.Pool, request_ids: List[int], uuids: List[UUID]) -> None:
+    query = """
+        UPDATE whitelist_requests AS request
+        SET uuid = resolved.uuid
+        FROM unnest($1::int[], $2::uuid[]) AS resolved(id, uuid)
+        WHERE request.id = resolved.id
     """
-    logger.debug("SQL fetch_approved_usernames: %s", query.strip())
+    if _trace_sql():
+        logger.debug("SQL set_request_uuids: %s | params=%s", query.strip(), (request_ids, uuids))
+    _note_write(pool)
     async with pool.acquire() as conn:
-        records = await conn.fetch(query)
+        await conn.execute(query, request_ids, uuids)
+
+
+@instrument_db
+async def rename_request(pool: asyncpg.Pool, request_id: int, username: str) -> None:
+    query = "UPDATE whitelist_requests SET username = $2 WHERE id = $1"
+    if _trace_sql():
+        logger.debug("SQL rename_request: %s | params=%s", query, (request_id, username))
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        await conn.execute(query, request_id, username)
+
+
+@instrument_db
+async def fetch_approved_usernames(pool: asyncpg.Pool, tenant: str = DEFAULT_TENANT) -> List[str]:
+    query = """
+        SELECT username
+        FROM whitelist_requests
+        WHERE status = 'approved' AND tenant = $1
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_approved_usernames: %s | params=%s", query.strip(), (tenant,))
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, tenant)
         return [record["username"] for record in records]
 
 
-async def fetch_approved_requests_by_user(pool: asyncpg.Pool, user_id: int) -> List[asyncpg.Record]:
+@instrument_db
+async def fetch_approved_requests_by_user(
+    pool: asyncpg.Pool, user_id: int, tenant: str = DEFAULT_TENANT
+) -> List[asyncpg.Record]:
     query = """
         SELECT id, user_id, username, decided_at, created_at
         FROM whitelist_requests
-        WHERE user_id = $1 AND status = 'approved'
+        WHERE user_id = $1 AND status = 'approved' AND tenant = $2
         ORDER BY decided_at DESC NULLS LAST, created_at DESC
     """
-    logger.debug("SQL fetch_approved_requests_by_user: %s | params=%s", query.strip(), (user_id,))
-    async with pool.acquire() as conn:
-        return await conn.fetch(query, user_id)
+    if _trace_sql():
+        logger.debug("SQL fetch_approved_requests_by_user: %s | params=%s", query.strip(), (user_id, tenant))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, user_id, tenant)
 
 
-async def fetch_approved_requests(pool: asyncpg.Pool) -> List[asyncpg.Record]:
+@instrument_db
+async def fetch_approved_requests(pool: asyncpg.Pool, tenant: str = DEFAULT_TENANT) -> List[asyncpg.Record]:
     query = """
-        SELECT id, user_id, username, decided_at, created_at
+        SELECT id, user_id, username, uuid, decided_at, created_at
         FROM whitelist_requests
-        WHERE status = 'approved'
+        WHERE status = 'approved' AND tenant = $1
         ORDER BY user_id, decided_at DESC NULLS LAST, created_at DESC
     """
-    logger.debug("SQL fetch_approved_requests: %s", query.strip())
-    async with pool.acquire() as conn:
-        return await conn.fetch(query)
+    if _trace_sql():
+        logger.debug("SQL fetch_approved_requests: %s | params=%s", query.strip(), (tenant,))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, tenant)
 
 
+@instrument_db
 async def mark_request_status(pool: asyncpg.Pool, request_id: int, status: str, decided_by: int) -> None:
     query = """
         UPDATE whitelist_requests
         SET status = $2, decided_by = $3
         WHERE id = $1
     """
-    logger.debug("SQL mark_request_status: %s | params=%s", query.strip(), (request_id, status, decided_by))
+    if _trace_sql():
+        logger.debug("SQL mark_request_status: %s | params=%s", query.strip(), (request_id, status, decided_by))
+    _note_write(pool)
     async with pool.acquire() as conn:
         await conn.execute(query, request_id, status, decided_by)
 
 
+@instrument_db
 async def delete_request(pool: asyncpg.Pool, request_id: int) -> None:
     query = "DELETE FROM whitelist_requests WHERE id = $1"
-    logger.debug("SQL delete_request: %s | params=%s", query, (request_id,))
+    if _trace_sql():
+        logger.debug("SQL delete_request: %s | params=%s", query, (request_id,))
+    _note_write(pool)
     async with pool.acquire() as conn:
         await conn.execute(query, request_id)
+
+
+@instrument_db
+async def upsert_telegram_usernames(pool: asyncpg.Pool, usernames: List[str], user_ids: List[int]) -> None:
+    query = """
+        INSERT INTO telegram_usernames (username, user_id, seen_at)
+        SELECT username, user_id, NOW()
+        FROM unnest($1::text[], $2::bigint[]) AS seen(username, user_id)
+        ON CONFLICT (username) DO UPDATE
+        SET user_id = EXCLUDED.user_id, seen_at = EXCLUDED.seen_at
+    """
+    if _trace_sql():
+        logger.debug("SQL upsert_telegram_usernames: %s | params=%s", query.strip(), (usernames, user_ids))
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        await conn.execute(query, usernames, user_ids)
+
+
+@instrument_db
+async def fetch_player_profiles(
+    pool: asyncpg.Pool, name_keys: List[str], max_age_seconds: float
+) -> List[asyncpg.Record]:
+    """Cached profiles younger than ``max_age_seconds``; ``uuid`` is NULL for names nobody owns."""
+    query = """
+        SELECT name_key, uuid, name
+        FROM player_profiles
+        WHERE name_key = ANY($1::text[]) AND resolved_at > NOW() - make_interval(secs => $2)
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_player_profiles: %s | params=%s", query.strip(), (name_keys, max_age_seconds))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, name_keys, max_age_seconds)
+
+
+@instrument_db
+async def store_player_profiles(
+    pool: asyncpg.Pool, name_keys: List[str], uuids: List[Optional[UUID]], names: List[Optional[str]]
+) -> None:
+    """Upsert lookup results and forget other names cached for the same UUIDs (renamed players)."""
+    upsert = """
+        INSERT INTO player_profiles (name_key, uuid, name, resolved_at)
+        SELECT name_key, uuid, name, NOW()
+        FROM unnest($1::text[], $2::uuid[], $3::text[]) AS resolved(name_key, uuid, name)
+        ON CONFLICT (name_key) DO UPDATE
+        SET uuid = EXCLUDED.uuid, name = EXCLUDED.name, resolved_at = EXCLUDED.resolved_at
+    """
+    forget = """
+        DELETE FROM player_profiles
+        WHERE uuid = ANY($2::uuid[]) AND NOT (name_key = ANY($1::text[]))
+    """
+    if _trace_sql():
+        logger.debug("SQL store_player_profiles: %s | params=%s", upsert.strip(), (name_keys, uuids, names))
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(upsert, name_keys, uuids, names)
+            await conn.execute(forget, name_keys, [uuid for uuid in uuids if uuid is not None])
+
+
+AUDIT_COLUMNS = (
+    "tenant", "occurred_at", "actor_id", "action", "username", "user_id", "request_id", "source", "outcome", "detail"
+)
+
+
+@instrument_db
+async def insert_audit_events(pool: asyncpg.Pool, records: List[Tuple[Any, ...]]) -> None:
+    """COPY ``records`` (tuples in ``AUDIT_COLUMNS`` order) into audit_events."""
+    if _trace_sql():
+        logger.debug("SQL insert_audit_events: COPY %d rows", len(records))
+    async with pool.acquire() as conn:
+        await conn.copy_records_to_table("audit_events", records=records, columns=AUDIT_COLUMNS)
+
+
+@instrument_db
+async def fetch_telegram_user_id(pool: asyncpg.Pool, username: str) -> Optional[int]:
+    query = "SELECT user_id FROM telegram_usernames WHERE username = $1"
+    if _trace_sql():
+        logger.debug("SQL fetch_telegram_user_id: %s | params=%s", query, (username,))
+    async with pool.acquire() as conn:
+        record = await conn.fetchrow(query, username)
+        if not record:
+            return None
+        return int(record["user_id"])
+
+
+@instrument_db
+async def hit_rate_limit(pool: asyncpg.Pool, key: str, window_seconds: int) -> int:
+    query = """
+        INSERT INTO rate_limits (key, window_start, hits)
+        VALUES ($1, to_timestamp(floor(extract(epoch FROM NOW()) / $2::integer) * $2::integer), 1)
+        ON CONFLICT (key, window_start) DO UPDATE
+        SET hits = rate_limits.hits + 1
+        RETURNING hits
+    """
+    if _trace_sql():
+        logger.debug("SQL hit_rate_limit: %s | params=%s", query.strip(), (key, window_seconds))
+    async with pool.acquire() as conn:
+        record = await conn.fetchrow(query, key, window_seconds)
+        return int(record["hits"])
+
+
+@instrument_db
+async def delete_expired_rate_limits(pool: asyncpg.Pool, max_window_seconds: int) -> None:
+    query = "DELETE FROM rate_limits WHERE window_start < NOW() - make_interval(secs => $1)"
+    if _trace_sql():
+        logger.debug("SQL delete_expired_rate_limits: %s | params=%s", query, (max_window_seconds,))
+    async with pool.acquire() as conn:
+        await conn.execute(query, max_window_seconds)
+
+
+@instrument_db
+async def claim_update(pool: asyncpg.Pool, bot_id: int, update_id: int) -> bool:
+    """Mark an update as taken by this replica; False if another one already has it."""
+    query = """
+        INSERT INTO processed_updates (bot_id, update_id)
+        VALUES ($1, $2)
+        ON CONFLICT DO NOTHING
+        RETURNING update_id
+    """
+    if _trace_sql():
+        logger.debug("SQL claim_update: %s | params=%s", query.strip(), (bot_id, update_id))
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(query, bot_id, update_id) is not None
+
+
+@instrument_db
+async def delete_processed_updates(pool: asyncpg.Pool, max_age_seconds: int) -> None:
+    query = "DELETE FROM processed_updates WHERE claimed_at < NOW() - make_interval(secs => $1)"
+    if _trace_sql():
+        logger.debug("SQL delete_processed_updates: %s | params=%s", query, (max_age_seconds,))
+    async with pool.acquire() as conn:
+        await conn.execute(query, max_age_seconds)
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for ``name``."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+@asynccontextmanager
+async def advisory_lock(pool: asyncpg.Pool, name: str) -> AsyncIterator[bool]:
+    """Hold the session advisory lock ``name`` for the block if nobody else does.
+
+    Yields whether the lock was taken; the block runs either way and should
+    back off when it was not.
+    """
+    key = lock_key(name)
+    async with pool.acquire() as conn:
+        acquired = bool(await conn.fetchval("SELECT pg_try_advisory_lock($1)", key))
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute("SELECT pg_advisory_unlock($1)", key)
+
+
+@instrument_db
+async def create_job(
+    pool: asyncpg.Pool,
+    kind: str,
+    params: Dict[str, Any],
+    requested_by: Optional[int],
+    chat_id: Optional[int],
+    tenant: str = DEFAULT_TENANT,
+) -> Optional[int]:
+    """Queue a job; None when one of the same kind is already queued or running."""
+    query = """
+        INSERT INTO jobs (kind, params, requested_by, chat_id, tenant)
+        VALUES ($1, $2::jsonb, $3, $4, $5)
+        ON CONFLICT (tenant, kind) WHERE status IN ('pending', 'running')
+        DO NOTHING
+        RETURNING id
+    """
+    params_tuple = (kind, json.dumps(params), requested_by, chat_id, tenant)
+    if _trace_sql():
+        logger.debug("SQL create_job: %s | params=%s", query.strip(), params_tuple)
+    _note_write(pool)
+    async with pool.acquire() as conn:
+        record = await conn.fetchrow(query, *params_tuple)
+    return record["id"] if record else None
+
+
+@instrument_db
+async def claim_job(pool: asyncpg.Pool, tenants: List[str], stale_seconds: float) -> Optional[asyncpg.Record]:
+    """Take the oldest queued job, or a running one whose worker stopped heartbeating."""
+    query = """
+        UPDATE jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            started_at = COALESCE(started_at, NOW()),
+            heartbeat_at = NOW()
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE tenant = ANY($1::text[])
+              AND (
+                status = 'pending'
+                OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => $2))
+              )
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING *
+    """
+    if _trace_sql():
+        logger.debug("SQL claim_job: %s | params=%s", query.strip(), (tenants, stale_seconds))
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(query, tenants, stale_seconds)
+
+
+# A job's worker is identified by the attempt it claimed: a stale job claimed
+# again bumps attempts, and the earlier worker's writes stop matching.
+
+
+@instrument_db
+async def save_job_progress(pool: asyncpg.Pool, job_id: int, attempts: int, progress: Dict[str, Any]) -> None:
+    query = """
+        UPDATE jobs SET progress = $3::jsonb, heartbeat_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+    """
+    if _trace_sql():
+        logger.debug("SQL save_job_progress: %s | params=%s", query.strip(), (job_id, attempts, progress))
+    async with pool.acquire() as conn:
+        await conn.execute(query, job_id, attempts, json.dumps(progress))
+
+
+@instrument_db
+async def touch_jobs(pool: asyncpg.Pool, job_ids: List[int], attempts: List[int]) -> None:
+    query = """
+        UPDATE jobs SET heartbeat_at = NOW()
+        FROM unnest($1::bigint[], $2::int[]) AS claim(id, attempts)
+        WHERE jobs.id = claim.id AND jobs.attempts = claim.attempts AND jobs.status = 'running'
+    """
+    if _trace_sql():
+        logger.debug("SQL touch_jobs: %s | params=%s", query.strip(), (job_ids, attempts))
+    async with pool.acquire() as conn:
+        await conn.execute(query, job_ids, attempts)
+
+
+@instrument_db
+async def finish_job(
+    pool: asyncpg.Pool,
+    job_id: int,
+    attempts: int,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """Record the outcome of a run; False if another worker has claimed the job since."""
+    query = """
+        UPDATE jobs
+        SET status = $3, result = $4::jsonb, error = $5, finished_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        RETURNING id
+    """
+    params = (job_id, attempts, status, json.dumps(result) if result is not None else None, error)
+    if _trace_sql():
+        logger.debug("SQL finish_job: %s | params=%s", query.strip(), params)
+    async with pool.acquire() as conn:
+        return await conn.fetchval(query, *params) is not None
+
+
+@instrument_db
+async def requeue_job(pool: asyncpg.Pool, job_id: int, attempts: int) -> None:
+    """Hand a job interrupted by shutdown back to the queue, keeping its checkpoint."""
+    query = """
+        UPDATE jobs SET status = 'pending', heartbeat_at = NULL
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+    """
+    if _trace_sql():
+        logger.debug("SQL requeue_job: %s | params=%s", query.strip(), (job_id, attempts))
+    async with pool.acquire() as conn:
+        await conn.execute(query, job_id, attempts)
+
+
+@instrument_db
+async def release_job(pool: asyncpg.Pool, job_id: int, attempts: int) -> None:
+    """Give a claim back to the worker that held the job before, without using up an attempt.
+
+    The job stays running with a fresh heartbeat, so if that worker is gone
+    after all it is claimed again once the heartbeat goes stale.
+    """
+    query = """
+        UPDATE jobs SET attempts = attempts - 1, heartbeat_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+    """
+    if _trace_sql():
+        logger.debug("SQL release_job: %s | params=%s", query.strip(), (job_id, attempts))
+    async with pool.acquire() as conn:
+        await conn.execute(query, job_id, attempts)
+
+
+@instrument_db
+async def fetch_job(pool: asyncpg.Pool, job_id: int, tenant: str = DEFAULT_TENANT) -> Optional[asyncpg.Record]:
+    query = "SELECT * FROM jobs WHERE id = $1 AND tenant = $2"
+    if _trace_sql():
+        logger.debug("SQL fetch_job: %s | params=%s", query, (job_id, tenant))
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(query, job_id, tenant)
+
+
+@instrument_db
+async def fetch_recent_jobs(pool: asyncpg.Pool, limit: int, tenant: str = DEFAULT_TENANT) -> List[asyncpg.Record]:
+    query = """
+        SELECT id, kind, status, created_at, finished_at
+        FROM jobs
+        WHERE tenant = $2
+        ORDER BY id DESC
+        LIMIT $1
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_recent_jobs: %s | params=%s", query.strip(), (limit, tenant))
+    async with pool.acquire() as conn:
+        return await conn.fetch(query, limit, tenant)
+
+
+@instrument_db
+async def fetch_status_counts(pool: asyncpg.Pool, tenant: str = DEFAULT_TENANT) -> Dict[str, int]:
+    query = "SELECT status, count FROM request_status_counts WHERE tenant = $1"
+    if _trace_sql():
+        logger.debug("SQL fetch_status_counts: %s | params=%s", query, (tenant,))
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, tenant)
+    return {record["status"]: int(record["count"]) for record in records}
+
+
+@instrument_db
+async def fetch_daily_counts(pool: asyncpg.Pool, days: int, tenant: str = DEFAULT_TENANT) -> Dict[str, int]:
+    """Created requests and decisions per status over the last ``days`` UTC days, today included."""
+    query = """
+        SELECT event, SUM(count)::bigint AS count
+        FROM request_daily_counts
+        WHERE tenant = $2 AND day > (NOW() AT TIME ZONE 'UTC')::date - $1::int
+        GROUP BY event
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_daily_counts: %s | params=%s", query.strip(), (days, tenant))
+    async with _reader(pool).acquire() as conn:
+        records = await conn.fetch(query, days, tenant)
+    return {record["event"]: int(record["count"]) for record in records}
+
+
+@instrument_db
+async def fetch_approval_latency(pool: asyncpg.Pool, tenant: str = DEFAULT_TENANT) -> List[asyncpg.Record]:
+    query = """
+        SELECT decided_by, bucket, count, total_seconds
+        FROM approval_latency_buckets
+        WHERE tenant = $1 AND count > 0
+        ORDER BY decided_by, bucket
+    """
+    if _trace_sql():
+        logger.debug("SQL fetch_approval_latency: %s | params=%s", query.strip(), (tenant,))
+    async with _reader(pool).acquire() as conn:
+        return await conn.fetch(query, tenant)
+
+
+async def prepare_hot_statements(conn: asyncpg.Connection) -> None:
+    """Run the per-update lookups once with keys that match nothing.
+
+    That leaves their prepared statements in ``conn``'s statement cache.
+    The instrumented wrappers are skipped so warm-up stays out of metrics.
+    """
+    target = _SingleConnection(conn)
+    await fetch_request.__wrapped__(target, 0)
+    await fetch_usernames_page.__wrapped__(target, 0, 1)
+    await fetch_approved_requests_by_user.__wrapped__(target, 0)
+    await fetch_user_by_mc_username.__wrapped__(target, "")
+    await fetch_telegram_user_id.__wrapped__(target, "")
+
+
+async def warm_pool(pool: asyncpg.Pool, size: int) -> None:
+    """Hold ``size`` connections at once so each gets its statements prepared."""
+    connections = [await pool.acquire() for _ in range(size)]
+    try:
+        await asyncio.gather(*(prepare_hot_statements(conn) for conn in connections))
+    finally:
+        for conn in connections:
+            await pool.release(conn)
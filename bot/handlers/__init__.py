@@ -1,6 +1,6 @@
 from aiogram import Router
 
-from bot.handlers import comment, decision, skip_comment, start, username, whois, whitelist_sync, manual
+from bot.handlers import comment, decision, jobs, skip_comment, start, stats, username, whois, whitelist_sync, manual
 
 
 router = Router()
@@ -11,4 +11,6 @@ router.include_router(comment.router)
 router.include_router(skip_comment.router)
 router.include_router(decision.router)
 router.include_router(whitelist_sync.router)
+router.include_router(jobs.router)
+router.include_router(stats.router)
 router.include_router(manual.router)
@@ -1,12 +1,14 @@
+import asyncio
 import logging
+from typing import Any, Awaitable
 
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
 
 from bot.context import AppContext
 from bot.db import fetch_request, mark_request
-from bot.rcon import whitelist_player
-from bot.services.whitelist import cleanup_secondary_accounts
+from bot.rcon import remove_whitelist_player, whitelist_player
+from bot.services.whitelist import assign_uuids, cleanup_secondary_accounts
 from bot.utils import format_user
 
 logger = logging.getLogger(__name__)
@@ -28,7 +30,7 @@ async def handle_decision(callback: CallbackQuery, context: AppContext) -> None:
         await callback.answer(context.config.locale.t("not_allowed"), show_alert=True)
         return
 
-    record = await fetch_request(context.pool, request_id)
+    record = await fetch_request(context.pool, request_id, tenant=context.config.tenant)
     if not record:
         await callback.answer(context.config.locale.t("request_not_found"), show_alert=True)
         return
@@ -37,36 +39,74 @@ async def handle_decision(callback: CallbackQuery, context: AppContext) -> None:
         await callback.answer(context.config.locale.t("already_handled"), show_alert=True)
         return
 
+    subject = dict(
+        actor_id=callback.from_user.id,
+        username=record["username"],
+        user_id=record["user_id"],
+        request_id=request_id,
+    )
     if action == "approve":
         await cleanup_secondary_accounts(
             context,
             user_id=record["user_id"],
             keep_username=record["username"],
+            actor_id=callback.from_user.id,
         )
         try:
             whitelist_player(context.config.rcon, record["username"])
-        except Exception:
+        except Exception as exc:
+            context.audit.record(
+                context.config.tenant, "approve", "decision", outcome="rcon_failed", detail=str(exc), **subject
+            )
             await callback.answer(context.config.locale.t("rcon_failed"), show_alert=True)
             return
-        await mark_request(context.pool, request_id, "approved", callback.from_user.id)
+        if not await mark_request(context.pool, request_id, "approved", callback.from_user.id):
+            await _undo_whitelist(context, request_id, record["username"])
+            await callback.answer(context.config.locale.t("already_handled"), show_alert=True)
+            return
+        context.audit.record(context.config.tenant, "approve", "decision", **subject)
+        context.approved.add(request_id, record["user_id"], record["username"])
+        context.whois_cache.invalidate(record["user_id"], record["username"])
         await callback.answer("Approved", show_alert=False)
-        await context.bot.send_message(
-            chat_id=record["chat_id"],
-            text=context.config.locale.t("approved_user", request_id=request_id),
-        )
+        user_text = context.config.locale.t("approved_user", request_id=request_id)
         verdict_text = context.config.locale.t("admin_verdict_approved", admin=format_user(callback.from_user))
     else:
-        await mark_request(context.pool, request_id, "denied", callback.from_user.id)
+        if not await mark_request(context.pool, request_id, "denied", callback.from_user.id):
+            await callback.answer(context.config.locale.t("already_handled"), show_alert=True)
+            return
+        context.audit.record(context.config.tenant, "deny", "decision", **subject)
+        context.whois_cache.invalidate(record["user_id"], record["username"])
         await callback.answer("Denied", show_alert=False)
-        await context.bot.send_message(
-            chat_id=record["chat_id"],
-            text=context.config.locale.t("denied_user", request_id=request_id),
-        )
+        user_text = context.config.locale.t("denied_user", request_id=request_id)
         verdict_text = context.config.locale.t("admin_verdict_denied", admin=format_user(callback.from_user))
 
-    if callback.message:
-        new_text = f"{callback.message.text}\n\n{verdict_text}"
-        try:
-            await callback.message.edit_text(new_text, reply_markup=None)
-        except Exception:
-            logger.exception("Failed to edit admin request message")
+    # The admin already has their answer; the remaining side effects are independent round trips.
+    async with asyncio.TaskGroup() as group:
+        group.create_task(
+            _run_effect("notify user", context.bot.send_message(chat_id=record["chat_id"], text=user_text))
+        )
+        if callback.message:
+            new_text = f"{callback.message.text}\n\n{verdict_text}"
+            group.create_task(
+                _run_effect("edit admin request message", callback.message.edit_text(new_text, reply_markup=None))
+            )
+        if action == "approve" and context.uuids is not None:
+            group.create_task(_run_effect("resolve player uuid", assign_uuids(context, [record])))
+
+
+async def _undo_whitelist(context: AppContext, request_id: int, username: str) -> None:
+    """Take back an RCON add when another admin decided the request first, unless they approved it too."""
+    current = await fetch_request(context.pool, request_id, tenant=context.config.tenant)
+    if current is not None and current["status"] == "approved":
+        return
+    try:
+        remove_whitelist_player(context.config.rcon, username)
+    except Exception:
+        logger.exception("Failed to remove %s after request %s was decided elsewhere", username, request_id)
+
+
+async def _run_effect(name: str, effect: Awaitable[Any]) -> None:
+    try:
+        await effect
+    except Exception:
+        logger.exception("Decision side effect failed: %s", name)
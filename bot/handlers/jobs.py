@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from bot.context import AppContext
+from bot.db import fetch_job, fetch_recent_jobs
+
+RECENT_JOBS = 10
+
+router = Router()
+
+
+def _when(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M UTC") if value is not None else "-"
+
+
+def _summary(value: Any) -> str:
+    """``key: value`` pairs, with lists shown by their length."""
+    data = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(data, dict):
+        return str(data)
+    return ", ".join(f"{key}: {len(item) if isinstance(item, list) else item}" for key, item in data.items())
+
+
+@router.message(Command("jobs"))
+async def handle_jobs(message: Message, context: AppContext) -> None:
+    locale = context.config.locale
+    if message.from_user.id not in context.config.admin_ids:
+        await message.reply(locale.t("not_allowed"))
+        return
+
+    jobs = await fetch_recent_jobs(context.pool, RECENT_JOBS, tenant=context.config.tenant)
+    if not jobs:
+        await message.reply(locale.t("jobs_empty"))
+        return
+    lines = [locale.t("jobs_header")]
+    lines.extend(
+        locale.t("job_line", job_id=str(job["id"]), kind=job["kind"], status=job["status"]) for job in jobs
+    )
+    await message.reply("\n".join(lines))
+
+
+@router.message(Command("job"))
+async def handle_job(message: Message, command: CommandObject, context: AppContext) -> None:
+    locale = context.config.locale
+    if message.from_user.id not in context.config.admin_ids:
+        await message.reply(locale.t("not_allowed"))
+        return
+
+    try:
+        job_id = int((command.args or "").strip().lstrip("#"))
+    except ValueError:
+        await message.reply(locale.t("job_usage"))
+        return
+
+    job = await fetch_job(context.pool, job_id, tenant=context.config.tenant)
+    if job is None:
+        await message.reply(locale.t("job_not_found", job_id=str(job_id)))
+        return
+
+    lines = [
+        locale.t(
+            "job_details",
+            job_id=str(job["id"]),
+            kind=job["kind"],
+            status=job["status"],
+            created_at=_when(job["created_at"]),
+            started_at=_when(job["started_at"]),
+            finished_at=_when(job["finished_at"]),
+            attempts=str(job["attempts"]),
+        )
+    ]
+    progress = _summary(job["progress"])
+    if progress:
+        lines.append(locale.t("job_progress", progress=progress))
+    if job["result"] is not None:
+        lines.append(locale.t("job_result", result=_summary(job["result"])))
+    if job["error"]:
+        lines.append(locale.t("job_error", error=job["error"]))
+    await message.reply("\n".join(lines))
@@ -5,6 +5,7 @@ from aiogram.filters import CommandObject, Command
 
 from bot import db, rcon
 from bot.context import AppContext
+from bot.services.whitelist import assign_uuids
 from bot.utils import USERNAME_RE
 
 logger = logging.getLogger(__name__)
@@ -36,9 +37,24 @@ async def add_user(message: types.Message, command: CommandObject, context: AppC
         await message.answer(context.config.locale.t("invalid_username"))
         return
 
-    request_id = await db.create_request(context.pool, tg_id, message.chat.id, username, None)
+    request_id, _ = await db.create_request(
+        context.pool, tg_id, message.chat.id, username, None, tenant=context.config.tenant
+    )
     await db.mark_request(context.pool, request_id, "approved", tg_id)
-    rcon.whitelist_player(context.config.rcon, username)
+    context.approved.add(request_id, tg_id, username)
+    context.whois_cache.invalidate(tg_id, username)
+    subject = dict(actor_id=message.from_user.id, username=username, user_id=tg_id, request_id=request_id)
+    try:
+        rcon.whitelist_player(context.config.rcon, username)
+    except Exception as exc:
+        context.audit.record(context.config.tenant, "add", "add", outcome="rcon_failed", detail=str(exc), **subject)
+        raise
+    context.audit.record(context.config.tenant, "add", "add", **subject)
 
     await message.reply(context.config.locale.t("add_user_success", username=username, tg_id=str(tg_id)))
     logger.info("User %s (TG: %d) added by admin %d", username, tg_id, message.from_user.id)
+    if context.uuids is not None:
+        try:
+            await assign_uuids(context, [{"id": request_id, "username": username, "uuid": None}])
+        except Exception:
+            logger.exception("Failed to resolve the player uuid of %s", username)
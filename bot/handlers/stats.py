@@ -0,0 +1,64 @@
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.context import AppContext
+from bot.db import fetch_approval_latency, fetch_daily_counts, fetch_status_counts
+from bot.services.stats import LATENCY_BUCKETS, format_duration, group_latency
+
+RECENT_DAYS = 7
+TOP_ADMINS = 10
+
+router = Router()
+
+
+@router.message(Command("stats"))
+async def handle_stats(message: Message, context: AppContext) -> None:
+    locale = context.config.locale
+    if message.from_user.id not in context.config.admin_ids:
+        await message.reply(locale.t("not_allowed"))
+        return
+
+    tenant = context.config.tenant
+    totals = await fetch_status_counts(context.pool, tenant=tenant)
+    if not any(totals.values()):
+        await message.reply(locale.t("stats_empty"))
+        return
+    recent = await fetch_daily_counts(context.pool, RECENT_DAYS, tenant=tenant)
+    admins = group_latency(await fetch_approval_latency(context.pool, tenant=tenant))
+
+    lines = [
+        locale.t(
+            "stats_totals",
+            pending=str(totals.get("pending", 0)),
+            approved=str(totals.get("approved", 0)),
+            denied=str(totals.get("denied", 0)),
+            expired=str(totals.get("expired", 0)),
+        ),
+        locale.t(
+            "stats_recent",
+            days=str(RECENT_DAYS),
+            created=str(recent.get("created", 0)),
+            approved=str(recent.get("approved", 0)),
+            denied=str(recent.get("denied", 0)),
+            expired=str(recent.get("expired", 0)),
+        ),
+    ]
+    if admins:
+        lines.append(locale.t("stats_latency_header"))
+        for admin in admins[:TOP_ADMINS]:
+            bound = admin.median_bound()
+            if bound is not None:
+                median = f"≤ {format_duration(bound)}"
+            else:
+                median = f"> {format_duration(LATENCY_BUCKETS[-1])}"
+            lines.append(
+                locale.t(
+                    "stats_latency_line",
+                    admin=f'<a href="tg://user?id={admin.admin_id}">{admin.admin_id}</a>',
+                    count=str(admin.approvals),
+                    median=median,
+                    average=format_duration(admin.average_seconds),
+                )
+            )
+    await message.reply("\n".join(lines))
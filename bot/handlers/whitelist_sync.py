@@ -3,7 +3,8 @@ from aiogram.filters import Command
 from aiogram.types import Message
 
 from bot.context import AppContext
-from bot.services.whitelist import sync_whitelist
+from bot.services.jobs import enqueue_job
+from bot.services.whitelist import SYNC_JOB
 
 
 router = Router()
@@ -15,13 +16,10 @@ async def handle_whitelist_sync(message: Message, context: AppContext) -> None:
         await message.reply(context.config.locale.t("not_allowed"))
         return
 
-    await message.reply(context.config.locale.t("whitelist_cleanup_started"))
-    removed = await sync_whitelist(context)
-
-    if not removed:
-        await message.reply(context.config.locale.t("whitelist_cleanup_none"))
+    # The sync can take minutes on a big server, so it runs as a job and
+    # reports back to this chat when done.
+    job_id = await enqueue_job(context, SYNC_JOB, requested_by=message.from_user.id, chat_id=message.chat.id)
+    if job_id is None:
+        await message.reply(context.config.locale.t("whitelist_sync_busy"))
         return
-
-    await message.reply(context.config.locale.t("whitelist_cleanup_done", count=len(removed)))
-    if len(removed) <= 50:
-        await message.reply(context.config.locale.t("whitelist_cleanup_list", usernames=", ".join(removed)))
+    await message.reply(context.config.locale.t("whitelist_cleanup_queued", job_id=str(job_id)))
@@ -1,16 +1,57 @@
+import html
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
 
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.filters import Command
-from aiogram.types import Message, ReactionTypeEmoji, User
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message, ReactionTypeEmoji
 
 from bot.context import AppContext
-from bot.db import fetch_user_by_mc_username, fetch_usernames
+from bot.db import (
+    fetch_recent_usernames,
+    fetch_request,
+    fetch_user_by_mc_username,
+    fetch_usernames_page,
+    fetch_users_by_mc_usernames,
+    fetch_users_by_uuids,
+)
+from bot.keyboards import build_whois_keyboard
 from bot.utils import USERNAME_RE
 
 logger = logging.getLogger(__name__)
 
+NOT_FOUND_TEXT = "Игрок не имеет проходки или был добавлен не через меня, сорян"
+
+# History rows per /whois page, and per user when several are looked up at once.
+PAGE_SIZE = 10
+MAX_TARGETS = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+Cursor = Tuple[Optional[datetime], int]
+
+
+@dataclass(frozen=True)
+class WhoisReply:
+    text: str
+    markup: Optional[InlineKeyboardMarkup] = None
+
+
+@dataclass(frozen=True)
+class McTarget:
+    name: str
+
+
+@dataclass(frozen=True)
+class UserTarget:
+    user_id: Optional[int]
+    label: str = ""
+
+
+Target = Union[McTarget, UserTarget]
+
 
 router = Router()
 
@@ -20,25 +61,25 @@ async def handle_whois(message: Message, context: AppContext) -> None:
     if message.chat.type == "private":
         return
 
-    logger.debug(
-        "WHOIS request: chat_id=%s user_id=%s text=%s reply_to=%s",
-        message.chat.id,
-        message.from_user.id if message.from_user else None,
-        message.text,
-        bool(message.reply_to_message),
-    )
-    target_user: Optional[User] = None
-    mc_username: Optional[str] = None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "WHOIS request: chat_id=%s user_id=%s text=%s reply_to=%s",
+            message.chat.id,
+            message.from_user.id if message.from_user else None,
+            message.text,
+            bool(message.reply_to_message),
+        )
+    targets: List[Target] = []
     if message.reply_to_message and message.reply_to_message.from_user:
-        target_user = message.reply_to_message.from_user
-        logger.debug("WHOIS target via reply: user_id=%s", target_user.id)
-    if not target_user and message.entities:
+        targets.append(UserTarget(message.reply_to_message.from_user.id))
+        logger.debug("WHOIS target via reply: user_id=%s", targets[0].user_id)
+    if not targets and message.entities:
         for entity in message.entities:
             if entity.type == "text_mention" and entity.user:
-                target_user = entity.user
-                logger.debug("WHOIS target via text_mention: user_id=%s", target_user.id)
-                break
-    if not target_user:
+                targets.append(UserTarget(entity.user.id))
+                logger.debug("WHOIS target via text_mention: user_id=%s", entity.user.id)
+        targets = targets[:MAX_TARGETS]
+    if not targets:
         text = message.text or ""
         parts = text.split(maxsplit=1)
         arg_text = parts[1].strip() if len(parts) > 1 else ""
@@ -49,46 +90,192 @@ async def handle_whois(message: Message, context: AppContext) -> None:
                 [ReactionTypeEmoji(emoji="🤡")],
             )
             return
-        if arg_text:
-            token = arg_text.split()[0].lstrip("@")
-            if token:
-                if USERNAME_RE.match(token):
-                    mc_username = token
-                    logger.debug("WHOIS target via mc username: %s", mc_username)
-                else:
-                    try:
-                        chat = await context.bot.get_chat(f"@{token}")
-                    except Exception:
-                        chat = None
-                    if chat and chat.type == "private":
-                        target_user = chat
-                        logger.debug("WHOIS target via tg username: user_id=%s", target_user.id)
-
-    if mc_username:
-        user_id = await fetch_user_by_mc_username(context.pool, mc_username)
-        if not user_id:
-            logger.debug("WHOIS no user_id for mc username: %s", mc_username)
-            await message.reply("Игрок не имеет проходки или был добавлен не через меня, сорян")
-            return
-        logger.debug("WHOIS found user_id=%s for mc username=%s", user_id, mc_username)
-        await message.reply(f'<a href="tg://user?id={user_id}">Профиль</a>')
+        for raw in arg_text.split()[:MAX_TARGETS]:
+            token = raw.lstrip("@")
+            if not token:
+                continue
+            if USERNAME_RE.match(token):
+                targets.append(McTarget(token))
+                logger.debug("WHOIS target via mc username: %s", token)
+            else:
+                user_id = await _resolve_tg_username(context, token)
+                targets.append(UserTarget(user_id, label=f"@{token}"))
+                logger.debug("WHOIS target via tg username: user_id=%s", user_id)
+
+    if len(targets) > 1:
+        await message.reply(await _render_many(context, targets))
+        return
+
+    target = targets[0] if targets else UserTarget(None)
+    if isinstance(target, McTarget):
+        key = ("mc", target.name.lower())
+        reply = context.whois_cache.get(key)
+        if reply is None:
+            user_id, reply = await _render_mc_username(context, target.name)
+            context.whois_cache.put(key, reply, owner=user_id)
+        await message.reply(reply.text)
         return
 
-    if not target_user:
+    if not target.user_id:
         logger.debug("WHOIS no target resolved")
-        await message.reply("Игрок не имеет проходки или был добавлен не через меня, сорян")
+        await message.reply(NOT_FOUND_TEXT)
         return
 
-    records = await fetch_usernames(context.pool, target_user.id)
-    if not records:
-        logger.debug("WHOIS no usernames for user_id=%s", target_user.id)
-        await message.reply("Игрок не имеет проходки или был добавлен не через меня, сорян")
+    key = ("user", target.user_id)
+    reply = context.whois_cache.get(key)
+    if reply is None:
+        reply = await _render_user(context, target.user_id)
+        context.whois_cache.put(key, reply, owner=target.user_id)
+    await message.reply(reply.text, reply_markup=reply.markup)
+
+
+@router.callback_query(F.data.startswith("whois:"))
+async def handle_whois_page(callback: CallbackQuery, context: AppContext) -> None:
+    try:
+        newer, cursor = decode_page(callback.data)
+    except ValueError:
+        await callback.answer()
         return
+    # The cursor row says whose history this is, so no user id travels in the button.
+    record = await fetch_request(context.pool, cursor[1], tenant=context.config.tenant)
+    if record is None:
+        await callback.answer()
+        return
+    reply = await _render_user(context, record["user_id"], cursor=cursor, newer=newer)
+    if callback.message is not None:
+        await callback.message.edit_text(reply.text, reply_markup=reply.markup)
+    await callback.answer()
+
+
+def encode_page(newer: bool, cursor: Cursor) -> str:
+    decided_at, request_id = cursor
+    at = "-" if decided_at is None else str((decided_at - EPOCH) // timedelta(microseconds=1))
+    return f"whois:{'p' if newer else 'n'}:{at}:{request_id}"
+
+
+def decode_page(data: str) -> Tuple[bool, Cursor]:
+    _, direction, at_raw, id_raw = data.split(":")
+    if direction not in ("p", "n"):
+        raise ValueError(f"unknown direction {direction}")
+    decided_at = None if at_raw == "-" else EPOCH + timedelta(microseconds=int(at_raw))
+    return direction == "p", (decided_at, int(id_raw))
+
+
+def _history_line(record: Dict) -> str:
+    decided_at = record["decided_at"]
+    date_text = decided_at.strftime("%d.%m.%y") if decided_at else "??.??.??"
+    return f"{date_text} - {html.escape(record['username'])} - {record['status']}"
+
+
+def _profile_link(user_id: int, text: str = "Профиль") -> str:
+    return f'<a href="tg://user?id={user_id}">{text}</a>'
+
+
+async def _render_mc_username(context: AppContext, mc_username: str) -> Tuple[Optional[int], WhoisReply]:
+    if context.approved.loaded:
+        user_id = context.approved.user_for(mc_username)
+    else:
+        user_id = await fetch_user_by_mc_username(context.pool, mc_username, tenant=context.config.tenant)
+    if not user_id:
+        user_id = (await _owners_by_uuid(context, [mc_username])).get(mc_username)
+    if not user_id:
+        logger.debug("WHOIS no user_id for mc username: %s", mc_username)
+        return None, WhoisReply(NOT_FOUND_TEXT)
+    logger.debug("WHOIS found user_id=%s for mc username=%s", user_id, mc_username)
+    return user_id, WhoisReply(_profile_link(user_id))
+
+
+async def _render_user(
+    context: AppContext, user_id: int, cursor: Optional[Cursor] = None, newer: bool = False
+) -> WhoisReply:
+    # One extra row tells whether there is another page in that direction.
+    records = await fetch_usernames_page(
+        context.pool, user_id, PAGE_SIZE + 1, cursor=cursor, newer=newer, tenant=context.config.tenant
+    )
+    if not records:
+        logger.debug("WHOIS no usernames for user_id=%s", user_id)
+        return WhoisReply(NOT_FOUND_TEXT)
+
+    more = len(records) > PAGE_SIZE
+    if more:
+        records = records[1:] if newer else records[:PAGE_SIZE]
+    has_newer = cursor is not None and (more or not newer)
+    has_older = more if not newer else True
+    first, last = records[0], records[-1]
+    markup = build_whois_keyboard(
+        context.config.locale,
+        newer=encode_page(True, (first["decided_at"], first["id"])) if has_newer else None,
+        older=encode_page(False, (last["decided_at"], last["id"])) if has_older else None,
+    )
+    logger.debug("WHOIS result for user_id=%s: %d rows", user_id, len(records))
+    return WhoisReply("\n".join(_history_line(record) for record in records), markup)
+
+
+async def _render_many(context: AppContext, targets: List[Target]) -> str:
+    """One reply for several targets, with one query per kind of target."""
+    tenant = context.config.tenant
+    names = [target.name for target in targets if isinstance(target, McTarget)]
+    owners: Dict[str, int] = {}
+    if names and context.approved.loaded:
+        owners = {name: user_id for name in names if (user_id := context.approved.user_for(name))}
+    elif names:
+        owners = await fetch_users_by_mc_usernames(context.pool, names, tenant=tenant)
+    owners.update(await _owners_by_uuid(context, [name for name in names if name not in owners]))
+
+    user_ids = sorted({t.user_id for t in targets if isinstance(t, UserTarget) and t.user_id})
+    history: Dict[int, List] = {}
+    if user_ids:
+        for record in await fetch_recent_usernames(context.pool, user_ids, PAGE_SIZE, tenant=tenant):
+            history.setdefault(record["user_id"], []).append(record)
+
+    # Replies are sent as HTML and the labels echo whatever the sender typed.
+    locale = context.config.locale
+    sections = []
+    for target in targets:
+        if isinstance(target, McTarget):
+            owner = owners.get(target.name)
+            name = html.escape(target.name)
+            if owner is None:
+                sections.append(locale.t("whois_target_not_found", target=name))
+            else:
+                sections.append(f"{name}: {_profile_link(owner)}")
+            continue
+        label = html.escape(target.label or str(target.user_id))
+        records = history.get(target.user_id) if target.user_id else None
+        if not records:
+            sections.append(locale.t("whois_target_not_found", target=label))
+            continue
+        lines = [f"{_profile_link(target.user_id, label)}:"]
+        lines.extend(_history_line(record) for record in records)
+        hidden = int(records[0]["total"]) - len(records)
+        if hidden > 0:
+            lines.append(locale.t("whois_more", count=str(hidden)))
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+async def _owners_by_uuid(context: AppContext, names: List[str]) -> Dict[str, int]:
+    """Owners of ``names`` found through the player's UUID, for players approved under an older name."""
+    if context.uuids is None or not names:
+        return {}
+    profiles = await context.uuids.resolve(names)
+    uuids = {name: profile.uuid for name in names if (profile := profiles.get(name.lower())) is not None}
+    if not uuids:
+        return {}
+    owners = await fetch_users_by_uuids(context.pool, list(set(uuids.values())), tenant=context.config.tenant)
+    return {name: owners[uuid] for name, uuid in uuids.items() if uuid in owners}
+
 
-    lines = []
-    for record in records:
-        decided_at = record["decided_at"]
-        date_text = decided_at.strftime("%d.%m.%y") if decided_at else "??.??.??"
-        lines.append(f"{date_text} - {record['username']} - {record['status']}")
-    logger.debug("WHOIS result for user_id=%s: %s", target_user.id, lines)
-    await message.reply("\n".join(lines))
+async def _resolve_tg_username(context: AppContext, username: str) -> Optional[int]:
+    user_id = await context.usernames.resolve(username)
+    if user_id is not None or context.usernames.is_known_miss(username):
+        return user_id
+    try:
+        chat = await context.bot.get_chat(f"@{username}")
+    except Exception:
+        chat = None
+    if not chat or chat.type != "private":
+        context.usernames.remember_miss(username)
+        return None
+    context.usernames.observe(username, chat.id)
+    return chat.id
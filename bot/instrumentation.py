@@ -0,0 +1,50 @@
+import functools
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from bot.metrics import DB_ERRORS, DB_LATENCY, RCON_ERRORS, RCON_LATENCY
+from bot.tracing import span
+
+T = TypeVar("T")
+
+
+def instrument_db(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Record latency, failures and a trace span of a ``bot.db`` coroutine under its function name."""
+    name = func.__name__
+    span_name = f"db.{name}"
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        started = time.perf_counter()
+        try:
+            with span(span_name):
+                return await func(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(query=name)
+            raise
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - started, query=name)
+
+    return wrapper
+
+
+def instrument_rcon(command: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Record latency, failures and a trace span of a blocking RCON call under ``command``."""
+    span_name = f"rcon.{command}"
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.perf_counter()
+            try:
+                with span(span_name):
+                    return func(*args, **kwargs)
+            except Exception:
+                RCON_ERRORS.inc(command=command)
+                raise
+            finally:
+                RCON_LATENCY.observe(time.perf_counter() - started, command=command)
+
+        return wrapper
+
+    return decorator
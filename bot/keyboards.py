@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from bot.texts import Locale
@@ -13,3 +15,14 @@ def build_admin_keyboard(request_id: int, locale: Locale, user_id: int) -> Inlin
 def build_skip_keyboard(locale: Locale) -> InlineKeyboardMarkup:
     skip = InlineKeyboardButton(text=locale.t("skip_button"), callback_data="skip_comment")
     return InlineKeyboardMarkup(inline_keyboard=[[skip]])
+
+
+def build_whois_keyboard(
+    locale: Locale, newer: Optional[str] = None, older: Optional[str] = None
+) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if newer:
+        buttons.append(InlineKeyboardButton(text=locale.t("whois_prev_button"), callback_data=newer))
+    if older:
+        buttons.append(InlineKeyboardButton(text=locale.t("whois_next_button"), callback_data=older))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -0,0 +1,65 @@
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+from bot.config import LoggingConfig
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and traceback if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def parse_levels(value: str) -> Dict[str, int]:
+    """Parse ``"aiogram=WARNING,bot.db=DEBUG"`` into logger name -> level."""
+    levels: Dict[str, int] = {}
+    for raw in value.split(","):
+        name, _, level_name = raw.strip().partition("=")
+        if not name or not level_name:
+            continue
+        level = logging.getLevelName(level_name.strip().upper())
+        if not isinstance(level, int):
+            logging.warning("Skipped unknown log level for %s: %s", name, level_name)
+            continue
+        levels[name.strip()] = level
+    return levels
+
+
+def configure_logging(config: LoggingConfig) -> QueueListener:
+    """Route all records through a queue so handlers never block the event loop.
+
+    Returns the started listener; stop it on shutdown to flush pending records.
+    """
+    output = logging.StreamHandler(sys.stderr)
+    if config.json:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(records, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(config.level)
+    for name, level in parse_levels(config.levels).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener.start()
+    return listener
@@ -1,41 +1,405 @@
 import asyncio
 import logging
+import signal
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
 import asyncpg
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums.parse_mode import ParseMode
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
 from dotenv import load_dotenv
 
-from bot.config import load_config
+from bot import rcon
+from bot.config import AppConfig, WebhookConfig, load_config, load_tenant_configs
 from bot.context import AppContext
-from bot.db import apply_migrations
+from bot.db import PoolRouter, apply_migrations, set_sql_sample_rate, warm_pool
 from bot.handlers import router as handlers_router
+from bot.logging_config import configure_logging
+from bot.metrics import DB_POOL_CONNECTIONS, WHOIS_CACHE, start_metrics_server
+from bot.middlewares.directory import UsernameDirectoryMiddleware
+from bot.middlewares.idempotency import IdempotencyMiddleware
+from bot.middlewares.inflight import InFlightMiddleware
+from bot.middlewares.metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware
+from bot.middlewares.recording import UpdateRecorderMiddleware
+from bot.middlewares.tenant import TenantMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.middlewares.tracing import HandlerSpanMiddleware, TracingMiddleware, TracingRequestMiddleware
+from bot.recording import UpdateRecorder
+from bot.services.approved import ApprovedIndex
+from bot.services.audit import AuditLog
+from bot.services.directory import UsernameDirectory
+from bot.services.expiry import ExpiryScheduler
+from bot.services.inflight import InFlightTracker
+from bot.services.jobs import JobRunner
+from bot.services.leader import LeaderLease
+from bot.services.ratelimit import MemoryRateLimitStore, PostgresRateLimitStore, RateLimitStore
+from bot.services.uuids import MojangResolver, UuidCache
+from bot.services.watcher import WhitelistFileWatcher
+from bot.services.whitelist import reconcile_whitelist_changes
+from bot.tracing import TraceExporter
+from bot.watchdog import LoopWatchdog
 
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
+def build_dispatcher(
+    context: AppContext,
+    rate_limit_store: RateLimitStore,
+    trace_exporter: Optional[TraceExporter] = None,
+    with_metrics: bool = False,
+    update_recorder: Optional[UpdateRecorder] = None,
+    inflight: Optional[InFlightTracker] = None,
+    tenants: Optional[Dict[int, AppContext]] = None,
+    dedupe_updates: bool = False,
+) -> Dispatcher:
+    """Wire the middlewares and handlers around ``context``.
+
+    With ``tenants`` (bot id -> context) each update gets the context of the
+    bot that received it instead; ``context`` then only supplies the shared
+    throttle settings. ``dedupe_updates`` claims every update in Postgres
+    first, for replicas sharing one webhook.
+    """
+    bots = [tenant.bot for tenant in tenants.values()] if tenants else [context.bot]
+    dp = Dispatcher()
+    if inflight is not None:
+        dp.update.outer_middleware(InFlightMiddleware(inflight))
+    if tenants:
+        dp.update.outer_middleware(TenantMiddleware(tenants))
+    if dedupe_updates:
+        dp.update.outer_middleware(IdempotencyMiddleware())
+    if update_recorder is not None:
+        dp.update.outer_middleware(UpdateRecorderMiddleware(update_recorder))
+    if trace_exporter is not None:
+        dp.update.outer_middleware(TracingMiddleware(trace_exporter))
+        handler_spans = HandlerSpanMiddleware()
+        dp.message.middleware(handler_spans)
+        dp.callback_query.middleware(handler_spans)
+        for bot in bots:
+            bot.session.middleware(TracingRequestMiddleware())
+    dp.update.outer_middleware(UsernameDirectoryMiddleware())
+    throttling = ThrottlingMiddleware(rate_limit_store, context.config.throttle)
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    if with_metrics:
+        handler_metrics = HandlerMetricsMiddleware()
+        dp.message.middleware(handler_metrics)
+        dp.callback_query.middleware(handler_metrics)
+        for bot in bots:
+            bot.session.middleware(TelegramMetricsMiddleware())
+    dp.include_router(handlers_router)
+    return dp
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+async def _start_database(config: AppConfig, timings: Dict[str, float]) -> asyncpg.Pool:
+    with _timed(timings, "postgres"):
+        pool = await asyncpg.create_pool(
+            dsn=config.db_dsn,
+            min_size=config.db_pool_min_size,
+            max_size=config.db_pool_max_size,
+        )
+    with _timed(timings, "migrations"):
+        await apply_migrations(pool, config.migrations_dir)
+    with _timed(timings, "pool_warmup"):
+        await warm_pool(pool, config.db_pool_min_size)
+    return pool
+
+
+async def _start_replica(config: AppConfig, timings: Dict[str, float]) -> Optional[asyncpg.Pool]:
+    if not config.db_replica_dsn:
+        return None
+    with _timed(timings, "replica"):
+        replica = await asyncpg.create_pool(
+            dsn=config.db_replica_dsn,
+            min_size=config.db_pool_min_size,
+            max_size=config.db_pool_max_size,
+        )
+        await warm_pool(replica, config.db_pool_min_size)
+    return replica
+
+
+async def _check_telegram(bot: Bot, timings: Dict[str, float], label: str) -> None:
+    with _timed(timings, label):
+        me = await bot.get_me()
+    logger.info("Authorized as @%s", me.username)
+
+
+async def _probe_rcon(config: AppConfig, timings: Dict[str, float], label: str) -> None:
+    with _timed(timings, label):
+        try:
+            await asyncio.to_thread(rcon.probe, config.rcon)
+        except RuntimeError as exc:
+            # The server may just be restarting; keep taking requests and
+            # let approvals report the failure until it is back.
+            logger.error("%s; approvals will fail until it is reachable", exc)
+
+
+async def _serve_webhook(dp: Dispatcher, bots: List[Bot], webhook: WebhookConfig, **data: object) -> None:
+    """Take updates over HTTP until SIGINT/SIGTERM.
+
+    Every replica registers the same URL, so whichever sits behind the load
+    balancer gets the request; the webhook is left in place on exit for the
+    replicas still running.
+    """
+    app = web.Application()
+    for bot in bots:
+        handler = SimpleRequestHandler(dp, bot, secret_token=webhook.secret or None, **data)
+        # Not handler.register(): its shutdown hook closes the Bot session
+        # before in-flight handlers have sent their replies.
+        app.router.add_post(f"{webhook.path}/{bot.id}", handler.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, webhook.host, webhook.port).start()
+    allowed_updates = dp.resolve_used_update_types()
+    for bot in bots:
+        await bot.set_webhook(
+            f"{webhook.url}{webhook.path}/{bot.id}",
+            secret_token=webhook.secret or None,
+            allowed_updates=allowed_updates,
+        )
+    logger.info("Serving webhook on %s:%d%s", webhook.host, webhook.port, webhook.path)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    try:
+        await stopped.wait()
+    finally:
+        await runner.cleanup()
+
+
 async def main() -> None:
     load_dotenv()
     config = load_config()
+    log_listener = configure_logging(config.logging)
+    set_sql_sample_rate(config.logging.sql_sample_rate)
+
+    tenant_configs = load_tenant_configs(config)
+    multi_tenant = len(tenant_configs) > 1
+    bots = [
+        Bot(token=tenant.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        for tenant in tenant_configs
+    ]
+
+    def label(step: str, tenant: AppConfig) -> str:
+        return f"{step}:{tenant.tenant}" if multi_tenant else step
 
-    bot = Bot(
-        token=config.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    pool, replica, *_ = await asyncio.gather(
+        _start_database(config, timings),
+        _start_replica(config, timings),
+        *(_check_telegram(bot, timings, label("telegram", tenant)) for bot, tenant in zip(bots, tenant_configs)),
+        *(_probe_rcon(tenant, timings, label("rcon", tenant)) for tenant in tenant_configs),
     )
 
-    dp = Dispatcher()
-    pool = await asyncpg.create_pool(dsn=config.db_dsn)
+    watchdog = None
+    if config.loop_block_threshold_ms > 0:
+        watchdog = LoopWatchdog(threshold=config.loop_block_threshold_ms / 1000)
+        watchdog.start()
 
-    await apply_migrations(pool, config.migrations_dir)
-    logger.info("Migrations applied, starting bot")
+    router = None
+    if replica is not None:
+        router = PoolRouter(pool, replica, max_lag=config.db_replica_max_lag)
+        await router.start()
 
-    context = AppContext(bot=bot, pool=pool, config=config)
-    dp.include_router(handlers_router)
+    # Telegram usernames are global, so the directory is shared; everything
+    # keyed by Minecraft name or request stays per tenant.
+    usernames = UsernameDirectory()
+    audit = AuditLog()
+    uuids = None
+    if config.uuid_resolver_url:
+        # Player names and UUIDs are global, so one cache serves every community.
+        uuids = UuidCache(
+            router or pool, MojangResolver(config.uuid_resolver_url), ttl=config.uuid_cache_ttl_hours * 3600
+        )
+    contexts: List[AppContext] = [
+        AppContext(
+            bot=bot,
+            pool=router or pool,
+            config=tenant,
+            approved=ApprovedIndex(tenant.tenant),
+            usernames=usernames,
+            audit=audit,
+            uuids=uuids,
+        )
+        for bot, tenant in zip(bots, tenant_configs)
+    ]
+    context = contexts[0]
+    with _timed(timings, "approved_index"):
+        await context.approved.listen(config.db_dsn, peers=[tenant.approved for tenant in contexts[1:]])
+        await asyncio.gather(*(tenant.approved.load(pool) for tenant in contexts))
+    usernames.start(pool)
+    audit.start(pool)
+
+    # Expiry and the whitelist.json watchers must run on one replica only:
+    # whichever holds the lease reloads pending requests every minute, so
+    # ones created elsewhere are not missed.
+    watchers: List[WhitelistFileWatcher] = []
+
+    async def start_expiry() -> None:
+        for tenant in contexts:
+            if tenant.config.whitelist_file:
+                watchers.append(
+                    WhitelistFileWatcher(
+                        Path(tenant.config.whitelist_file), partial(reconcile_whitelist_changes, tenant)
+                    )
+                )
+        await asyncio.gather(*(watcher.start() for watcher in watchers))
+        if config.pending_ttl_hours <= 0:
+            return
+        for tenant in contexts:
+            tenant.expiry = ExpiryScheduler(
+                tenant.bot, pool, tenant.config, reload_interval=60, audit=audit, whois_cache=tenant.whois_cache
+            )
+        await asyncio.gather(*(tenant.expiry.start() for tenant in contexts))
+
+    async def stop_expiry(timeout: float = 0.0) -> None:
+        stopping = list(watchers)
+        watchers.clear()
+        await asyncio.gather(*(watcher.stop() for watcher in stopping))
+        schedulers = [tenant.expiry for tenant in contexts if tenant.expiry is not None]
+        for tenant in contexts:
+            tenant.expiry = None
+        await asyncio.gather(*(scheduler.stop(timeout=timeout) for scheduler in schedulers))
+
+    jobs = JobRunner(pool, {tenant.config.tenant: tenant for tenant in contexts}, concurrency=config.job_concurrency)
+    for tenant in contexts:
+        tenant.jobs = jobs
+    jobs.start()
+
+    lease = None
+    if config.pending_ttl_hours > 0 or any(tenant.whitelist_file for tenant in tenant_configs):
+        with _timed(timings, "expiry"):
+            lease = LeaderLease(config.db_dsn, "expiry", on_acquired=start_expiry, on_lost=stop_expiry)
+            await lease.start()
+    trace_exporter = None
+    if config.tracing.file:
+        trace_exporter = TraceExporter(
+            config.tracing.file,
+            slow_ms=config.tracing.slow_ms,
+            max_bytes=config.tracing.max_bytes,
+            backup_count=config.tracing.backup_count,
+        )
+    update_recorder = None
+    if config.recording.file:
+        update_recorder = UpdateRecorder(
+            config.recording.file,
+            admin_ids=config.admin_ids,
+            admin_chat_id=config.admin_chat_id,
+            salt=config.recording.salt,
+            max_bytes=config.recording.max_bytes,
+            backup_count=config.recording.backup_count,
+        )
+    if config.throttle.backend == "postgres":
+        rate_limit_store = PostgresRateLimitStore(pool)
+    else:
+        rate_limit_store = MemoryRateLimitStore(max_keys=config.throttle.max_keys)
+    inflight = InFlightTracker()
+    dp = build_dispatcher(
+        context,
+        rate_limit_store,
+        trace_exporter=trace_exporter,
+        with_metrics=bool(config.metrics_port),
+        update_recorder=update_recorder,
+        inflight=inflight,
+        tenants={tenant.bot.id: tenant for tenant in contexts} if multi_tenant else None,
+        dedupe_updates=bool(config.webhook.url),
+    )
+
+    metrics_runner = None
+    if config.metrics_port:
+        DB_POOL_CONNECTIONS.set_function(
+            lambda: {
+                ("in_use",): pool.get_size() - pool.get_idle_size(),
+                ("idle",): pool.get_idle_size(),
+            }
+        )
+        def whois_cache_stats() -> Dict[tuple, float]:
+            totals: Dict[tuple, float] = {}
+            for tenant in contexts:
+                for stat, value in tenant.whois_cache.stats().items():
+                    totals[(stat,)] = totals.get((stat,), 0) + value
+            return totals
+
+        WHOIS_CACHE.set_function(whois_cache_stats)
+        metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port)
+
+    logger.info(
+        "Started in %.0f ms (%s)",
+        (time.perf_counter() - started) * 1000,
+        ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()),
+    )
+
+    try:
+        if config.webhook.url:
+            await _serve_webhook(dp, bots, config.webhook, context=context)
+        else:
+            # aiogram stops polling on SIGINT/SIGTERM. The Bot session is closed
+            # below instead, so handlers still running can finish their replies.
+            # Telegram allows one poller per token, so polling means one replica.
+            await dp.start_polling(
+                *bots,
+                context=context,
+                allowed_updates=dp.resolve_used_update_types(),
+                close_bot_session=False,
+            )
+    finally:
+        deadline = time.monotonic() + config.shutdown_timeout
+
+        def remaining() -> float:
+            return max(deadline - time.monotonic(), 0.0)
 
-    await dp.start_polling(bot, context=context, allowed_updates=dp.resolve_used_update_types())
+        logger.info("Draining %d in-flight updates", inflight.count)
+        if not await inflight.wait_idle(remaining()):
+            logger.warning("Shutdown deadline reached with %d updates still in flight", inflight.count)
+        await jobs.stop(timeout=remaining())
+        await stop_expiry(timeout=remaining())
+        if lease is not None:
+            await lease.stop()
+        await usernames.stop()
+        # After jobs and expiry, so the events they recorded while stopping are kept.
+        await audit.stop()
+        if uuids is not None:
+            await uuids.close()
+        await context.approved.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await asyncio.gather(*(bot.session.close() for bot in bots))
+        if router is not None:
+            await router.stop()
+        for name, db_pool in (("Database", pool), ("Replica", replica)):
+            if db_pool is None:
+                continue
+            try:
+                await asyncio.wait_for(db_pool.close(), timeout=remaining())
+            except asyncio.TimeoutError:
+                logger.warning("%s pool did not close in time, terminating it", name)
+                db_pool.terminate()
+        if trace_exporter is not None:
+            trace_exporter.close()
+        if update_recorder is not None:
+            update_recorder.close()
+        if watchdog is not None:
+            await watchdog.stop()
+        logger.info("Shutdown complete")
+        log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+from bot.context import AppContext
+
+
+class UsernameDirectoryMiddleware(BaseMiddleware):
+    """Records every (username, user id) pair seen in incoming updates."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context: Optional[AppContext] = data.get("context")
+        if context is not None:
+            self._observe(context, data.get("event_from_user"))
+            if isinstance(event, Update) and event.message and event.message.reply_to_message:
+                self._observe(context, event.message.reply_to_message.from_user)
+        return await handler(event, data)
+
+    @staticmethod
+    def _observe(context: AppContext, user: Optional[User]) -> None:
+        if user and user.username and not user.is_bot:
+            context.usernames.observe(user.username, user.id)
@@ -0,0 +1,50 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.db import claim_update, delete_processed_updates
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """Lets exactly one replica handle each update.
+
+    Telegram redelivers a webhook update when the first delivery times out,
+    and the retry may land on another replica; the claim in
+    ``processed_updates`` decides which one runs it. Register as an outer
+    ``update`` middleware after the tenant middleware.
+    """
+
+    def __init__(self, max_age_seconds: int = 86400, cleanup_every: int = 1000) -> None:
+        self.max_age_seconds = max_age_seconds
+        self.cleanup_every = cleanup_every
+        self._claims = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        pool = data["context"].pool
+        bot_id = data["bot"].id
+        self._claims += 1
+        if self._claims % self.cleanup_every == 0:
+            try:
+                await delete_processed_updates(pool, self.max_age_seconds)
+            except Exception:
+                logger.exception("Failed to prune processed updates")
+        try:
+            claimed = await claim_update(pool, bot_id, event.update_id)
+        except Exception:
+            logger.exception("Update claim failed, handling update %s anyway", event.update_id)
+            claimed = True
+        if not claimed:
+            logger.info("Skipping update %s, another replica already took it", event.update_id)
+            return None
+        return await handler(event, data)
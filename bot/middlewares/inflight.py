@@ -0,0 +1,22 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.services.inflight import InFlightTracker
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Tracks every update while it is handled; register as the outermost ``update`` middleware."""
+
+    def __init__(self, tracker: InFlightTracker) -> None:
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with self.tracker.track():
+            return await handler(event, data)
@@ -0,0 +1,59 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, TYPE_CHECKING
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+
+from bot.metrics import HANDLER_ERRORS, HANDLER_LATENCY, TELEGRAM_ERRORS, TELEGRAM_LATENCY, TELEGRAM_RETRY_AFTER
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Times the matched handler; register as an inner middleware so ``handler`` is resolved."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, handler=name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Times every Bot API call made through the session."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            TELEGRAM_RETRY_AFTER.inc(method=name)
+            TELEGRAM_ERRORS.inc(method=name)
+            raise
+        except Exception:
+            TELEGRAM_ERRORS.inc(method=name)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method=name)
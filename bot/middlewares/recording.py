@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.recording import UpdateRecorder
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Records every incoming update on arrival; register as an outer middleware on ``update``."""
+
+    def __init__(self, recorder: UpdateRecorder) -> None:
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            self.recorder.record(event)
+        return await handler(event, data)
@@ -0,0 +1,34 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.context import AppContext
+
+logger = logging.getLogger(__name__)
+
+
+class TenantMiddleware(BaseMiddleware):
+    """Hands each update the context of the community whose bot received it.
+
+    Register as an outer ``update`` middleware ahead of anything that reads
+    ``context``.
+    """
+
+    def __init__(self, contexts: Dict[int, AppContext]) -> None:
+        self.contexts = contexts
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        bot = data["bot"]
+        context = self.contexts.get(bot.id)
+        if context is None:
+            logger.warning("Dropping update for bot %s, which belongs to no tenant", bot.id)
+            return None
+        data["context"] = context
+        return await handler(event, data)
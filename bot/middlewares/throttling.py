@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.config import ThrottleConfig
+from bot.context import AppContext
+from bot.services.ratelimit import RateLimitStore
+
+logger = logging.getLogger(__name__)
+
+
+def classify(event: TelegramObject) -> Optional[str]:
+    """Map an event to the limiter bucket it counts against, if any."""
+    if isinstance(event, Message):
+        if (event.text or "").startswith("/"):
+            return "command"
+        if event.chat.type == "private":
+            return "request"
+        return None
+    if isinstance(event, CallbackQuery) and event.data == "skip_comment":
+        return "request"
+    return None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drops updates from users who exceed their per-bucket rate limit.
+
+    Register as an outer middleware on ``message`` and ``callback_query`` so
+    over-limit updates never reach filters or handlers. Admins are exempt.
+    """
+
+    def __init__(self, store: RateLimitStore, config: ThrottleConfig) -> None:
+        self.store = store
+        self.limits = {
+            "request": (config.request_limit, config.request_window),
+            "command": (config.command_limit, config.command_window),
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        bucket = classify(event)
+        user = data.get("event_from_user")
+        context: Optional[AppContext] = data.get("context")
+        if bucket is None or user is None:
+            return await handler(event, data)
+        if context is not None and user.id in context.config.admin_ids:
+            return await handler(event, data)
+
+        limit, window = self.limits[bucket]
+        if limit <= 0:
+            return await handler(event, data)
+        if not await self.store.hit(f"{bucket}:{user.id}", limit, window):
+            logger.info("Dropped %s update from user %s: rate limit exceeded", bucket, user.id)
+            return None
+        return await handler(event, data)
@@ -0,0 +1,62 @@
+from typing import Any, Awaitable, Callable, Dict, TYPE_CHECKING
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject, Update
+
+from bot.tracing import TraceExporter, span, trace
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Opens one trace per update; register as an outer middleware on ``update``."""
+
+    def __init__(self, exporter: TraceExporter) -> None:
+        self.exporter = exporter
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        attributes: Dict[str, Any] = {}
+        if isinstance(event, Update):
+            attributes = {"update_id": event.update_id, "event_type": event.event_type}
+        try:
+            with trace("update", **attributes) as root:
+                return await handler(event, data)
+        finally:
+            # Exported once the trace is closed, so late spans from spawned tasks stay out of it.
+            self.exporter.export(root)
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    """Wraps the matched handler in a span; register as an inner middleware."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        with span(f"handler.{name}"):
+            return await handler(event, data)
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """Adds a span around every Bot API call made inside a trace."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with span(f"telegram.{type(method).__name__}"):
+            return await make_request(bot, method)
@@ -1,12 +1,64 @@
 import logging
+import socket
+import struct
+from typing import Tuple
 
 from mcrcon import MCRcon
 
 from bot.config import RconConfig
+from bot.instrumentation import instrument_rcon
 
 logger = logging.getLogger(__name__)
 
 
+# Source RCON packet types used by the login handshake.
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+
+
+def _packet(request_id: int, kind: int, payload: str) -> bytes:
+    body = struct.pack("<ii", request_id, kind) + payload.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(body)) + body
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed by server")
+        data += chunk
+    return data
+
+
+def _read_packet(sock: socket.socket) -> Tuple[int, int]:
+    (length,) = struct.unpack("<i", _recv_exactly(sock, 4))
+    request_id, kind = struct.unpack("<ii", _recv_exactly(sock, length)[:8])
+    return request_id, kind
+
+
+@instrument_rcon("probe")
+def probe(config: RconConfig, timeout: float = 5.0) -> None:
+    """Connect and authenticate, raising RuntimeError if the server refuses.
+
+    Speaks the login handshake over a plain socket rather than through
+    MCRcon, which installs a SIGALRM handler and so cannot be used off the
+    main thread, where startup runs this probe.
+    """
+    try:
+        with socket.create_connection((config.host, config.port), timeout=timeout) as sock:
+            sock.sendall(_packet(1, SERVERDATA_AUTH, config.password))
+            while True:
+                request_id, kind = _read_packet(sock)
+                if kind == SERVERDATA_AUTH_RESPONSE:
+                    break
+    except Exception as exc:  # noqa: BLE001
+        raise RuntimeError(f"RCON at {config.host}:{config.port} is unreachable: {exc}") from exc
+    if request_id == -1:
+        raise RuntimeError(f"RCON at {config.host}:{config.port} rejected the password")
+
+
+@instrument_rcon("whitelist add")
 def whitelist_player(config: RconConfig, username: str) -> str:
     try:
         with MCRcon(config.host, config.password, port=config.port) as client:
@@ -16,6 +68,7 @@ def whitelist_player(config: RconConfig, username: str) -> str:
         raise RuntimeError("Failed to whitelist player via RCON") from exc
 
 
+@instrument_rcon("whitelist remove")
 def remove_whitelist_player(config: RconConfig, username: str) -> str:
     try:
         with MCRcon(config.host, config.password, port=config.port) as client:
@@ -25,6 +78,7 @@ def remove_whitelist_player(config: RconConfig, username: str) -> str:
         raise RuntimeError("Failed to remove player from whitelist via RCON") from exc
 
 
+@instrument_rcon("whitelist list")
 def list_whitelisted_players(config: RconConfig) -> list[str]:
     try:
         with MCRcon(config.host, config.password, port=config.port) as client:
@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class Anonymizer:
+    """Keyed, stable pseudonyms for ids, usernames and free text.
+
+    The same input maps to the same pseudonym for one salt, so conversation
+    shapes (who talks to whom, repeated /whois targets) survive while the
+    real values do not. Without a salt a random one is drawn per process.
+    """
+
+    def __init__(self, salt: str = "") -> None:
+        self._key = salt.encode() if salt else os.urandom(16)
+
+    def _digest(self, value: str) -> bytes:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).digest()
+
+    def number(self, value: int) -> int:
+        pseudonym = int.from_bytes(self._digest(str(value))[:5], "big") + 1
+        return -pseudonym if value < 0 else pseudonym
+
+    def word(self, value: str) -> str:
+        if value.startswith("@"):
+            return "@" + self.word(value[1:])
+        if value.lstrip("-").isdigit():
+            return str(self.number(int(value)))
+        # Keep the length (within Minecraft's 3-16) so name validation behaves the same.
+        length = min(max(len(value), 3), 16)
+        return ("p" + self._digest(value.lower()).hex())[:length]
+
+    def text(self, value: str) -> str:
+        words = value.split()
+        if words and words[0].startswith("/"):
+            return " ".join([words[0]] + [self.word(word) for word in words[1:]])
+        return " ".join(self.word(word) for word in words)
+
+
+def anonymize_update(
+    update: Update,
+    anonymizer: Anonymizer,
+    admin_ids: List[int],
+    admin_chat_id: int,
+) -> Optional[Dict[str, Any]]:
+    """Reduce an update to the fields replay needs, with identities replaced.
+
+    Admins and the admin chat are flagged rather than pseudonymized so a
+    replay can map them onto its own admin. Returns None for update types
+    the bot does not handle.
+    """
+    if update.message is not None:
+        message = update.message
+        sender = message.from_user
+        record: Dict[str, Any] = {
+            "kind": "message",
+            "text": anonymizer.text(message.text) if message.text else None,
+        }
+        chat = message.chat
+        reply = message.reply_to_message
+        if reply is not None and reply.from_user is not None:
+            record["reply_to_user"] = anonymizer.number(reply.from_user.id)
+    elif update.callback_query is not None:
+        query = update.callback_query
+        sender = query.from_user
+        record = {"kind": "callback_query", "data": query.data}
+        chat = query.message.chat if query.message is not None else None
+    else:
+        return None
+
+    if chat is not None:
+        record["chat_type"] = chat.type
+        if chat.id == admin_chat_id:
+            record["admin_chat"] = True
+        else:
+            record["chat"] = anonymizer.number(chat.id)
+
+    if sender is not None:
+        if sender.id in admin_ids:
+            record["admin"] = True
+        else:
+            record["user"] = anonymizer.number(sender.id)
+        if sender.username:
+            record["username"] = anonymizer.word(sender.username)
+    return record
+
+
+class UpdateRecorder:
+    """Appends anonymized updates as JSON lines to a rotating file from a worker thread.
+
+    Each line carries ``t``, the seconds since the recorder started, so a
+    replay can reproduce the original pacing.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        admin_ids: List[int],
+        admin_chat_id: int,
+        salt: str = "",
+        max_bytes: int = 10_000_000,
+        backup_count: int = 5,
+    ) -> None:
+        self.admin_ids = admin_ids
+        self.admin_chat_id = admin_chat_id
+        self.anonymizer = Anonymizer(salt)
+        self._origin = time.monotonic()
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._work, name="update-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, update: Update) -> None:
+        try:
+            record = anonymize_update(update, self.anonymizer, self.admin_ids, self.admin_chat_id)
+        except Exception:
+            logger.exception("Failed to anonymize update %s", update.update_id)
+            return
+        if record is None:
+            return
+        self._queue.put({"t": round(time.monotonic() - self._origin, 3), **record})
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._handler.close()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                line = json.dumps(item, ensure_ascii=False)
+                self._handler.emit(logging.makeLogRecord({"msg": line}))
+            except Exception:
+                logger.exception("Failed to write recorded update")
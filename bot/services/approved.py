@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from bot.config import DEFAULT_TENANT
+from bot.db import fetch_approved_requests, primary_pool
+from bot.services.whois_cache import WhoisCache
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "whitelist_requests_changed"
+
+
+class ApprovedIndex:
+    """In-memory view of approved players, kept in sync via LISTEN/NOTIFY.
+
+    Lookups are only trusted while ``loaded`` is set; callers fall back to the
+    database otherwise (before startup finishes or after the listener drops).
+    Each index covers one tenant; one of them can listen on behalf of the rest.
+    Every request change is broadcast, so the index also drops the affected
+    replies from its tenant's ``whois_cache`` whichever replica made it.
+    A dropped listener reconnects, waiting ``retry_interval`` seconds and
+    doubling up to ``max_retry_interval``, then reloads every index it feeds.
+    """
+
+    def __init__(
+        self, tenant: str = DEFAULT_TENANT, retry_interval: float = 1.0, max_retry_interval: float = 60.0
+    ) -> None:
+        self.tenant = tenant
+        self.loaded = False
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.whois_cache: Optional[WhoisCache] = None
+        # Approved rows by request id, and per lowercased name the ids holding it
+        # (mapped to their user) in decision order, so the latest one owns the name.
+        self._rows: Dict[int, Tuple[int, str]] = {}
+        self._by_name: Dict[str, Dict[int, int]] = {}
+        self._by_user: Dict[int, Dict[int, str]] = {}
+        self._listener: Optional[asyncpg.Connection] = None
+        self._subscribers: List["ApprovedIndex"] = [self]
+        self._dsn = ""
+        self._pool: Optional[asyncpg.Pool] = None
+        # Changes that arrive while a snapshot is being fetched, replayed on top of it.
+        self._deferred: Optional[List[Dict[str, Any]]] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    async def load(self, pool: asyncpg.Pool) -> None:
+        self._pool = pool
+        self._deferred = []
+        try:
+            # NOTIFY comes from the primary, so the snapshot must too.
+            records = await fetch_approved_requests(primary_pool(pool), tenant=self.tenant)
+            self._rows.clear()
+            self._by_name.clear()
+            self._by_user.clear()
+            # Later decisions win the name -> user mapping, same as fetch_user_by_mc_username.
+            for record in sorted(records, key=lambda r: r["decided_at"] or r["created_at"]):
+                self.add(record["id"], record["user_id"], record["username"])
+            # The snapshot may already include some of these; add and remove are idempotent per row.
+            for change in self._deferred:
+                self._apply(change)
+        finally:
+            self._deferred = None
+        if self.whois_cache is not None:
+            # Changes missed while nothing was listening may have made any reply stale.
+            self.whois_cache.clear()
+        self.loaded = True
+        logger.info("Loaded %d approved usernames into the index", len(self._by_name))
+
+    def add(self, request_id: int, user_id: int, username: str) -> None:
+        """Count an approved row; adding the same row again only refreshes it."""
+        self.remove(request_id)
+        self._rows[request_id] = (user_id, username)
+        self._by_name.setdefault(username.lower(), {})[request_id] = user_id
+        self._by_user.setdefault(user_id, {})[request_id] = username
+
+    def remove(self, request_id: int) -> None:
+        row = self._rows.pop(request_id, None)
+        if row is None:
+            return
+        user_id, username = row
+        key = username.lower()
+        owners = self._by_name[key]
+        del owners[request_id]
+        if not owners:
+            del self._by_name[key]
+        names = self._by_user[user_id]
+        del names[request_id]
+        if not names:
+            del self._by_user[user_id]
+
+    def user_for(self, username: str) -> Optional[int]:
+        owners = self._by_name.get(username.lower())
+        return next(reversed(owners.values())) if owners else None
+
+    def usernames_for(self, user_id: int) -> List[str]:
+        names = {username.lower(): username for username in self._by_user.get(user_id, {}).values()}
+        return list(names.values())
+
+    def contains(self, username: str) -> bool:
+        return username.lower() in self._by_name
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    async def listen(self, dsn: str, peers: Iterable["ApprovedIndex"] = ()) -> None:
+        """Follow changes on a dedicated connection, also feeding ``peers``."""
+        self._dsn = dsn
+        self._subscribers = [self, *peers]
+        self._listener = await asyncpg.connect(dsn=dsn)
+        self._listener.add_termination_listener(self._on_terminated)
+        await self._listener.add_listener(NOTIFY_CHANNEL, self._on_notify)
+
+    async def close(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        await listener.close()
+
+    def apply_change(self, change: Dict[str, Any]) -> None:
+        if self.whois_cache is not None:
+            for row in (change.get("old"), change.get("new")):
+                if row and row.get("tenant", DEFAULT_TENANT) == self.tenant:
+                    self.whois_cache.invalidate(int(row["user_id"]), row["username"])
+        if self._deferred is not None:
+            self._deferred.append(change)
+            return
+        self._apply(change)
+
+    def _apply(self, change: Dict[str, Any]) -> None:
+        old = change.get("old")
+        new = change.get("new")
+        if old and old.get("tenant", DEFAULT_TENANT) != self.tenant:
+            old = None
+        if new and new.get("tenant", DEFAULT_TENANT) != self.tenant:
+            new = None
+        if old and old["status"] == "approved":
+            self.remove(int(old["id"]))
+        if new and new["status"] == "approved":
+            self.add(int(new["id"]), int(new["user_id"]), new["username"])
+
+    def _on_notify(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            change = json.loads(payload)
+            for index in self._subscribers:
+                index.apply_change(change)
+        except (ValueError, KeyError, TypeError):
+            logger.exception("Ignoring malformed %s payload: %s", channel, payload)
+
+    def _on_terminated(self, connection: asyncpg.Connection) -> None:
+        if connection is not self._listener:
+            # Closed on purpose, by close() or a failed reconnect.
+            return
+        logger.warning("Approved index listener disconnected, falling back to database lookups")
+        for index in self._subscribers:
+            index.loaded = False
+        self._listener = None
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.retry_interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.listen(self._dsn, self._subscribers[1:])
+                # Listening again first, so nothing decided during the reload is missed.
+                await asyncio.gather(
+                    *(index.load(index._pool) for index in self._subscribers if index._pool is not None)
+                )
+            except Exception:
+                logger.exception("Failed to restore the approved index, retrying in %.0fs", delay)
+                if self._listener is not None:
+                    listener, self._listener = self._listener, None
+                    listener.terminate()
+                delay = min(delay * 2, self.max_retry_interval)
+                continue
+            logger.info("Approved index listener reconnected")
+            return
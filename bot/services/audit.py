@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from dataclasses import astuple, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Set
+
+import asyncpg
+
+from bot.db import insert_audit_events
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class AuditEvent:
+    """One row of audit_events; field order matches ``bot.db.AUDIT_COLUMNS``."""
+
+    tenant: str
+    occurred_at: datetime = field(default_factory=_now)
+    actor_id: Optional[int] = None
+    action: str = ""
+    username: Optional[str] = None
+    user_id: Optional[int] = None
+    request_id: Optional[int] = None
+    source: str = ""
+    outcome: str = "ok"
+    detail: Optional[str] = None
+
+
+class AuditLog:
+    """Buffers audit events in memory and COPYs them to Postgres in batches.
+
+    ``record`` only appends to a list, so handlers pay nothing for auditing.
+    The buffer is flushed every ``flush_interval`` seconds, as soon as it
+    holds ``batch_size`` events, and on ``stop``. A failed flush keeps the
+    events for the next one; past ``max_pending`` the oldest are dropped.
+    """
+
+    def __init__(self, flush_interval: float = 2.0, batch_size: int = 500, max_pending: int = 50_000) -> None:
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: List[AuditEvent] = []
+        self._pool: Optional[asyncpg.Pool] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_flushes: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+
+    def start(self, pool: asyncpg.Pool) -> None:
+        self._pool = pool
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await asyncio.gather(*self._batch_flushes)
+        await self.flush()
+        if self._pending:
+            logger.error("Lost %d audit events at shutdown", len(self._pending))
+
+    def record(self, tenant: str, action: str, source: str, **fields: Any) -> None:
+        self._pending.append(AuditEvent(tenant=tenant, action=action, source=source, **fields))
+        self._trim()
+        if self._pool is not None and len(self._pending) >= self.batch_size and not self._flush_lock.locked():
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._batch_flushes.add(task)
+            task.add_done_callback(self._batch_flushes.discard)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending or self._pool is None:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await insert_audit_events(self._pool, [astuple(event) for event in batch])
+            except Exception:
+                logger.exception("Failed to store %d audit events", len(batch))
+                self._pending[:0] = batch
+                self._trim()
+
+    def _trim(self) -> None:
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+            logger.warning("Audit buffer full, dropped %d oldest events", overflow)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+import asyncpg
+
+from bot.db import fetch_telegram_user_id, upsert_telegram_usernames
+
+logger = logging.getLogger(__name__)
+
+
+class UsernameDirectory:
+    """Telegram @username -> user id map learned from incoming updates.
+
+    An LRU cache sits in front of the ``telegram_usernames`` table; new
+    sightings are buffered and written in batches. Names that could not be
+    resolved anywhere are remembered for ``miss_ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 10_000,
+        miss_ttl: float = 600.0,
+        flush_interval: float = 5.0,
+        batch_size: int = 200,
+    ) -> None:
+        self.cache_size = cache_size
+        self.miss_ttl = miss_ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._misses: Dict[str, float] = {}
+        self._pending: Dict[str, int] = {}
+        self._pool: Optional[asyncpg.Pool] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_flushes: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+
+    def start(self, pool: asyncpg.Pool) -> None:
+        self._pool = pool
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await asyncio.gather(*self._batch_flushes)
+        await self.flush()
+
+    def observe(self, username: str, user_id: int) -> None:
+        key = username.lower()
+        self._misses.pop(key, None)
+        if self._cache.get(key) == user_id:
+            self._cache.move_to_end(key)
+            return
+        self._remember(key, user_id)
+        if self._pool is None:
+            return
+        self._pending[key] = user_id
+        if len(self._pending) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._batch_flushes.add(task)
+            task.add_done_callback(self._batch_flushes.discard)
+
+    async def resolve(self, username: str) -> Optional[int]:
+        key = username.lower()
+        user_id = self._cache.get(key)
+        if user_id is not None:
+            self._cache.move_to_end(key)
+            return user_id
+        if self.is_known_miss(key) or self._pool is None:
+            return None
+        user_id = await fetch_telegram_user_id(self._pool, key)
+        if user_id is not None:
+            self._remember(key, user_id)
+        return user_id
+
+    def remember_miss(self, username: str) -> None:
+        self._misses[username.lower()] = time.monotonic() + self.miss_ttl
+        if len(self._misses) > self.cache_size:
+            now = time.monotonic()
+            self._misses = {key: until for key, until in self._misses.items() if until > now}
+
+    def is_known_miss(self, username: str) -> bool:
+        key = username.lower()
+        until = self._misses.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending or self._pool is None:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await upsert_telegram_usernames(self._pool, list(batch.keys()), list(batch.values()))
+            except Exception:
+                logger.exception("Failed to store %d telegram usernames", len(batch))
+                for key, user_id in batch.items():
+                    if len(self._pending) >= self.cache_size:
+                        break
+                    self._pending.setdefault(key, user_id)
+
+    def _remember(self, key: str, user_id: int) -> None:
+        self._cache[key] = user_id
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
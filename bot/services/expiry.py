@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import asyncpg
+from aiogram import Bot
+
+from bot.config import AppConfig
+from bot.db import expire_requests, fetch_pending_requests
+from bot.services.audit import AuditLog
+from bot.services.whois_cache import WhoisCache
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """Expires pending requests once they are older than the configured TTL.
+
+    One task sleeps until the earliest deadline in a heap, then expires every
+    due request in batches. The heap is seeded from the database on start and
+    reloaded periodically so requests created by other replicas are picked up.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        pool: asyncpg.Pool,
+        config: AppConfig,
+        batch_size: int = 100,
+        send_interval: float = 0.05,
+        reload_interval: float = 3600.0,
+        audit: Optional[AuditLog] = None,
+        whois_cache: Optional[WhoisCache] = None,
+    ) -> None:
+        self.bot = bot
+        self.pool = pool
+        self.config = config
+        self.ttl = config.pending_ttl_hours * 3600
+        self.batch_size = batch_size
+        self.send_interval = send_interval
+        self.reload_interval = reload_interval
+        self.audit = audit
+        self.whois_cache = whois_cache
+        self._heap: List[Tuple[float, int]] = []
+        self._scheduled: set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        await self.reload()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """Stop after the batch in progress, cancelling it if ``timeout`` runs out."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Expiry batch still running at shutdown, cancelling it")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def reload(self) -> None:
+        records = await fetch_pending_requests(self.pool, tenant=self.config.tenant)
+        for record in records:
+            self.schedule(record["id"], record["created_at"])
+        logger.info("Tracking %d pending requests for expiry", len(self._scheduled))
+
+    def schedule(self, request_id: int, created_at: datetime) -> None:
+        if request_id in self._scheduled:
+            return
+        deadline = created_at.timestamp() + self.ttl
+        self._scheduled.add(request_id)
+        heapq.heappush(self._heap, (deadline, request_id))
+        if self._heap[0][1] == request_id:
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def pop_due(self, now: float) -> List[int]:
+        due: List[int] = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            _, request_id = heapq.heappop(self._heap)
+            self._scheduled.discard(request_id)
+            due.append(request_id)
+        return due
+
+    async def _run(self) -> None:
+        next_reload = time.monotonic() + self.reload_interval
+        while not self._stopping:
+            if time.monotonic() >= next_reload:
+                await self._safely(self.reload())
+                next_reload = time.monotonic() + self.reload_interval
+
+            due = self.pop_due(time.time())
+            if due:
+                await self._safely(self.expire(due))
+                continue
+
+            delay = next_reload - time.monotonic()
+            if self._heap:
+                delay = min(delay, self._heap[0][0] - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def expire(self, request_ids: List[int]) -> None:
+        records = await expire_requests(self.pool, request_ids)
+        if records:
+            logger.info("Expired %d pending requests", len(records))
+        if self.whois_cache is not None:
+            for record in records:
+                self.whois_cache.invalidate(record["user_id"], record["username"])
+        if self.audit is not None:
+            for record in records:
+                self.audit.record(
+                    self.config.tenant,
+                    "expire",
+                    "expiry",
+                    username=record["username"],
+                    user_id=record["user_id"],
+                    request_id=record["id"],
+                )
+        await self._notify(records)
+
+    async def _notify(self, records: Iterable[asyncpg.Record]) -> None:
+        locale = self.config.locale
+        for record in records:
+            try:
+                await self.bot.send_message(
+                    chat_id=record["chat_id"],
+                    text=locale.t("expired_user", request_id=record["id"]),
+                )
+            except Exception:
+                logger.exception("Failed to notify user about expired request %s", record["id"])
+            if record["admin_message_id"]:
+                try:
+                    await self.bot.edit_message_reply_markup(
+                        chat_id=self.config.admin_chat_id,
+                        message_id=record["admin_message_id"],
+                        reply_markup=None,
+                    )
+                except Exception:
+                    logger.exception("Failed to strip keyboard from request %s", record["id"])
+            await asyncio.sleep(self.send_interval)
+
+    @staticmethod
+    async def _safely(coro) -> None:
+        try:
+            await coro
+        except Exception:
+            logger.exception("Expiry scheduler step failed")
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from bot.db import claim_job, create_job, finish_job, release_job, requeue_job, save_job_progress, touch_jobs
+
+if TYPE_CHECKING:
+    from bot.context import AppContext
+
+logger = logging.getLogger(__name__)
+
+
+def _json(value: Any) -> Dict[str, Any]:
+    if value is None:
+        return {}
+    return json.loads(value) if isinstance(value, str) else dict(value)
+
+
+@dataclass
+class Job:
+    id: int
+    tenant: str
+    kind: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    progress: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 1
+    requested_by: Optional[int] = None
+    chat_id: Optional[int] = None
+
+    @classmethod
+    def from_record(cls, record: Any) -> "Job":
+        return cls(
+            id=record["id"],
+            tenant=record["tenant"],
+            kind=record["kind"],
+            params=_json(record["params"]),
+            progress=_json(record["progress"]),
+            attempts=record["attempts"],
+            requested_by=record["requested_by"],
+            chat_id=record["chat_id"],
+        )
+
+
+class JobBusy(Exception):
+    """Raised by a job handler when an earlier claim on the job is still working on it.
+
+    The claim goes back to that worker instead of failing the job.
+    """
+
+
+class JobRun:
+    """What a job handler gets: the job and a way to checkpoint progress.
+
+    ``progress`` starts from the last checkpoint, so a job picked up again
+    after a restart can skip the work it already did.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, job: Job, checkpoint_interval: float = 5.0) -> None:
+        self.pool = pool
+        self.job = job
+        self.progress = dict(job.progress)
+        self.checkpoint_interval = checkpoint_interval
+        self._saved_at = time.monotonic()
+
+    async def checkpoint(self, force: bool = False, **progress: Any) -> None:
+        """Merge ``progress`` in and save it, at most once per ``checkpoint_interval``."""
+        self.progress.update(progress)
+        now = time.monotonic()
+        if force or now - self._saved_at >= self.checkpoint_interval:
+            self._saved_at = now
+            await save_job_progress(self.pool, self.job.id, self.job.attempts, self.progress)
+
+
+JobHandler = Callable[["AppContext", JobRun], Awaitable[Dict[str, Any]]]
+
+JOB_KINDS: Dict[str, JobHandler] = {}
+
+
+def job_kind(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register ``handler`` to run jobs of ``kind``; it returns the job's result."""
+
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_KINDS[kind] = handler
+        return handler
+
+    return register
+
+
+async def enqueue_job(
+    context: "AppContext",
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    requested_by: Optional[int] = None,
+    chat_id: Optional[int] = None,
+) -> Optional[int]:
+    """Queue a job for ``context``'s tenant; None if one of this kind is already queued or running."""
+    job_id = await create_job(context.pool, kind, params or {}, requested_by, chat_id, tenant=context.config.tenant)
+    if job_id is not None and context.jobs is not None:
+        context.jobs.wake()
+    return job_id
+
+
+class JobRunner:
+    """Runs queued jobs on up to ``concurrency`` asyncio workers.
+
+    Workers claim jobs with ``FOR UPDATE SKIP LOCKED``, so replicas share
+    one queue. Running jobs are heartbeated; one whose heartbeat is older
+    than ``stale_after`` seconds is claimed again and resumes from its last
+    checkpoint, until it has been tried ``max_attempts`` times. Each claim
+    only writes to the job while it is the latest one.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        contexts: Dict[str, "AppContext"],
+        concurrency: int = 2,
+        poll_interval: float = 5.0,
+        stale_after: float = 120.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.pool = pool
+        self.contexts = contexts
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._running: Dict[int, Job] = {}
+        self._stopping = False
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._heartbeat = asyncio.create_task(self._beat())
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """Let running jobs finish for up to ``timeout`` seconds, then requeue the rest."""
+        if not self._workers:
+            return
+        self._stopping = True
+        self.wake()
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        if pending:
+            logger.warning("Requeueing %d jobs still running at shutdown", len(self._running))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+
+    async def _work(self) -> None:
+        tenants = list(self.contexts)
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                record = await claim_job(self.pool, tenants, self.stale_after)
+            except Exception:
+                logger.exception("Failed to claim a job")
+                record = None
+            if record is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job = Job.from_record(record)
+            try:
+                await self._run(job)
+            except Exception:
+                # Usually the database going away mid-job; the heartbeat
+                # stops, so another worker picks the job up again later.
+                logger.exception("Lost track of job %s", job.id)
+
+    async def _run(self, job: Job) -> None:
+        context = self.contexts[job.tenant]
+        handler = JOB_KINDS.get(job.kind)
+        if handler is None:
+            await self._fail(context, job, f"unknown job kind {job.kind}")
+            return
+        if job.attempts > self.max_attempts:
+            await self._fail(context, job, f"gave up after {self.max_attempts} attempts")
+            return
+
+        logger.info("Running job %s (%s), attempt %d", job.id, job.kind, job.attempts)
+        self._running[job.id] = job
+        run = JobRun(self.pool, job)
+        try:
+            result = await handler(context, run)
+        except asyncio.CancelledError:
+            await requeue_job(self.pool, job.id, job.attempts)
+            raise
+        except JobBusy as exc:
+            logger.info("Job %s (%s) is still running elsewhere: %s", job.id, job.kind, exc)
+            await release_job(self.pool, job.id, job.attempts)
+            return
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            await self._fail(context, job, str(exc) or type(exc).__name__)
+            return
+        finally:
+            self._running.pop(job.id, None)
+        if not await finish_job(self.pool, job.id, job.attempts, "done", result=result):
+            logger.warning("Job %s (%s) was claimed again while running, dropping its result", job.id, job.kind)
+            return
+        logger.info("Job %s (%s) done", job.id, job.kind)
+
+    async def _fail(self, context: "AppContext", job: Job, error: str) -> None:
+        if not await finish_job(self.pool, job.id, job.attempts, "failed", error=error):
+            logger.warning("Job %s (%s) was claimed again, not marking it failed: %s", job.id, job.kind, error)
+            return
+        if job.chat_id is None:
+            return
+        try:
+            await context.bot.send_message(
+                job.chat_id,
+                context.config.locale.t("job_failed", job_id=job.id, kind=job.kind, error=error),
+            )
+        except Exception:
+            logger.exception("Failed to report job %s failure", job.id)
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.stale_after / 4)
+            if not self._running:
+                continue
+            try:
+                running = list(self._running.values())
+                await touch_jobs(self.pool, [job.id for job in running], [job.attempts for job in running])
+            except Exception:
+                logger.exception("Failed to heartbeat running jobs")
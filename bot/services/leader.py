@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+from bot.db import lock_key
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """Elects one replica to run work that must not run twice, such as expiry.
+
+    The lease is a session advisory lock held on a dedicated connection, so
+    Postgres releases it as soon as the holder exits or its connection
+    drops. Every ``retry_interval`` seconds a follower tries to take it and
+    the leader checks its connection is still alive; ``on_acquired`` and
+    ``on_lost`` start and stop the owned work.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        name: str,
+        on_acquired: Callable[[], Awaitable[None]],
+        on_lost: Callable[[], Awaitable[None]],
+        retry_interval: float = 10.0,
+    ) -> None:
+        self.dsn = dsn
+        self.name = name
+        self.key = lock_key(name)
+        self.on_acquired = on_acquired
+        self.on_lost = on_lost
+        self.retry_interval = retry_interval
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._leader = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    async def start(self) -> None:
+        """Make the first attempt right away, then keep retrying in the background."""
+        await self._attempt()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.retry_interval)
+            await self._attempt()
+
+    async def _attempt(self) -> None:
+        try:
+            await self._check()
+        except Exception:
+            logger.exception("Leader lease %s check failed", self.name)
+            await self._release()
+
+    async def _check(self) -> None:
+        if self._conn is None or self._conn.is_closed():
+            await self._release()
+            self._conn = await asyncpg.connect(dsn=self.dsn)
+        if self._leader:
+            await self._conn.fetchval("SELECT 1")
+            return
+        if await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key):
+            self._leader = True
+            logger.info("Took the %s lease", self.name)
+            await self.on_acquired()
+
+    async def _release(self) -> None:
+        if self._leader:
+            self._leader = False
+            logger.warning("Gave up the %s lease", self.name)
+            try:
+                await self.on_lost()
+            except Exception:
+                logger.exception("Failed to stop %s work after losing the lease", self.name)
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            # Closing the session is what releases the lock for the others.
+            try:
+                await asyncio.wait_for(conn.close(), timeout=5)
+            except Exception:
+                conn.terminate()
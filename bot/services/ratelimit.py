@@ -0,0 +1,77 @@
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Protocol, Tuple
+
+import asyncpg
+
+from bot.db import delete_expired_rate_limits, hit_rate_limit
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStore(Protocol):
+    async def hit(self, key: str, limit: int, window: int) -> bool:
+        """Record a hit for ``key``; return False when it is over ``limit`` per ``window`` seconds."""
+
+
+class MemoryRateLimitStore:
+    """Sliding-window limiter kept in process memory.
+
+    Keys are ordered by last activity so idle ones expire from the front and
+    the total number of tracked keys never exceeds ``max_keys``.
+    """
+
+    def __init__(self, max_keys: int = 10_000) -> None:
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[str, Tuple[float, Deque[float]]]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: int) -> bool:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._keys.pop(key, None)
+        hits: Deque[float] = entry[1] if entry else deque()
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        allowed = len(hits) < limit
+        if allowed:
+            hits.append(now)
+        self._keys[key] = (now + window, hits)
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+        return allowed
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _expire(self, now: float) -> None:
+        while self._keys:
+            expires_at, _ = next(iter(self._keys.values()))
+            if expires_at > now:
+                break
+            self._keys.popitem(last=False)
+
+
+class PostgresRateLimitStore:
+    """Fixed-window counters in an unlogged table, shared by every replica."""
+
+    def __init__(self, pool: asyncpg.Pool, cleanup_every: int = 1000) -> None:
+        self.pool = pool
+        self.cleanup_every = cleanup_every
+        self._max_window = 0
+        self._calls = 0
+
+    async def hit(self, key: str, limit: int, window: int) -> bool:
+        self._max_window = max(self._max_window, window)
+        self._calls += 1
+        if self._calls % self.cleanup_every == 0:
+            try:
+                await delete_expired_rate_limits(self.pool, self._max_window)
+            except Exception:
+                logger.exception("Failed to clean up expired rate limits")
+        try:
+            hits = await hit_rate_limit(self.pool, key, window)
+        except Exception:
+            logger.exception("Rate limit check failed, letting update through")
+            return True
+        return hits <= limit
@@ -1,10 +1,11 @@
+from datetime import datetime, timezone
 from typing import Optional
 
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from bot.context import AppContext
-from bot.db import create_request
+from bot.db import create_request, set_admin_message_id
 from bot.keyboards import build_admin_keyboard
 
 
@@ -29,7 +30,14 @@ async def finalize_request(
         await source_message.answer(context.config.locale.t("username_hint"))
         return
 
-    request_id = await create_request(context.pool, int(user_id), int(chat_id), username, comment)
+    request_id, created = await create_request(
+        context.pool, int(user_id), int(chat_id), username, comment, tenant=context.config.tenant
+    )
+    if not created:
+        await source_message.answer(context.config.locale.t("request_already_pending", request_id=request_id))
+        await state.clear()
+        return
+    context.whois_cache.invalidate(int(user_id), username)
 
     await source_message.answer(context.config.locale.t("request_sent", request_id=request_id))
 
@@ -42,9 +50,12 @@ async def finalize_request(
     )
     comment_for_admin = comment or context.config.locale.t("no_comment")
     admin_message = f"{admin_message}\n{context.config.locale.t('admin_comment', comment=comment_for_admin)}"
-    await context.bot.send_message(
+    sent = await context.bot.send_message(
         chat_id=context.config.admin_chat_id,
         text=admin_message,
         reply_markup=build_admin_keyboard(request_id, context.config.locale, int(user_id)),
     )
     await state.clear()
+    await set_admin_message_id(context.pool, request_id, sent.message_id)
+    if context.expiry is not None:
+        context.expiry.schedule(request_id, datetime.now(timezone.utc))
@@ -0,0 +1,51 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+# Upper bounds in seconds of the approval latency buckets; one more bucket
+# holds everything slower. Must match stats_latency_bucket in
+# schema/11-request-stats.sql.
+LATENCY_BUCKETS = (300, 1800, 3600, 21600, 86400, 259200)
+
+
+@dataclass
+class AdminLatency:
+    admin_id: int
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total_seconds: float = 0.0
+
+    @property
+    def approvals(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.approvals if self.approvals else 0.0
+
+    def median_bound(self) -> Optional[int]:
+        """Upper bound of the bucket holding the median approval; None past the last bound."""
+        half = self.approvals / 2
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= half:
+                return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else None
+        return None
+
+
+def group_latency(records: Iterable[Any]) -> List[AdminLatency]:
+    """Fold ``approval_latency_buckets`` rows into one entry per admin, busiest first."""
+    admins: Dict[int, AdminLatency] = {}
+    for record in records:
+        admin = admins.setdefault(record["decided_by"], AdminLatency(record["decided_by"]))
+        bucket = min(int(record["bucket"]), len(LATENCY_BUCKETS))
+        admin.counts[bucket] += int(record["count"])
+        admin.total_seconds += float(record["total_seconds"])
+    return sorted(admins.values(), key=lambda admin: admin.approvals, reverse=True)
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{max(round(seconds / 60), 1)} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} d"
@@ -0,0 +1,125 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Protocol
+from uuid import UUID
+
+import aiohttp
+import asyncpg
+
+from bot.db import fetch_player_profiles, store_player_profiles
+
+logger = logging.getLogger(__name__)
+
+MOJANG_PROFILES_URL = "https://api.mojang.com/profiles/minecraft"
+
+
+@dataclass(frozen=True)
+class Profile:
+    uuid: UUID
+    name: str
+
+
+class UuidResolver(Protocol):
+    batch_size: int
+
+    async def lookup(self, names: List[str]) -> Dict[str, Profile]:
+        """Current profile of each of up to ``batch_size`` names, keyed by lowercased name.
+
+        Names that belong to nobody are left out.
+        """
+
+    async def close(self) -> None:
+        """Release whatever the resolver holds open."""
+
+
+class MojangResolver:
+    """Bulk name lookups against a Mojang-compatible profiles endpoint.
+
+    The endpoint takes a JSON list of at most ``batch_size`` names and
+    answers with ``[{"id": "<hex uuid>", "name": "<current name>"}]``.
+    """
+
+    def __init__(self, url: str = MOJANG_PROFILES_URL, batch_size: int = 10, timeout: float = 10.0) -> None:
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def lookup(self, names: List[str]) -> Dict[str, Profile]:
+        if not names:
+            return {}
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.post(self.url, json=names) as response:
+            if response.status == 204:
+                return {}
+            response.raise_for_status()
+            payload = await response.json(content_type=None)
+        profiles: Dict[str, Profile] = {}
+        for entry in payload or []:
+            profile = Profile(UUID(hex=entry["id"]), entry["name"])
+            profiles[profile.name.lower()] = profile
+        return profiles
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class UuidCache:
+    """Name -> UUID lookups through the ``player_profiles`` table.
+
+    Names missing from the table or older than ``ttl`` seconds are sent to
+    ``resolver`` in batches of its ``batch_size``, and the answers (including
+    "no such player") are stored for the next caller.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, resolver: UuidResolver, ttl: float = 86400.0) -> None:
+        self.pool = pool
+        self.resolver = resolver
+        self.ttl = ttl
+
+    async def resolve(self, names: Iterable[str], ttl: Optional[float] = None) -> Dict[str, Optional[Profile]]:
+        """Profile of each name keyed by lowercased name, None if nobody owns it.
+
+        ``ttl`` overrides the cache age limit for this call; 0 always asks the
+        resolver. Names that could not be looked up right now are left out,
+        so callers can fall back to comparing names.
+        """
+        keys = list(dict.fromkeys(name.lower() for name in names))
+        if not keys:
+            return {}
+        resolved: Dict[str, Optional[Profile]] = {}
+        max_age = self.ttl if ttl is None else ttl
+        records = await fetch_player_profiles(self.pool, keys, max_age) if max_age > 0 else []
+        for record in records:
+            uuid = record["uuid"]
+            resolved[record["name_key"]] = Profile(uuid, record["name"]) if uuid is not None else None
+
+        missing = [key for key in keys if key not in resolved]
+        fresh: Dict[str, Optional[Profile]] = {}
+        for start in range(0, len(missing), self.resolver.batch_size):
+            batch = missing[start : start + self.resolver.batch_size]
+            try:
+                found = await self.resolver.lookup(batch)
+            except Exception:
+                logger.exception("Failed to resolve %d player names", len(batch))
+                continue
+            for key in batch:
+                fresh[key] = found.get(key)
+        if fresh:
+            try:
+                await store_player_profiles(
+                    self.pool,
+                    list(fresh),
+                    [profile.uuid if profile else None for profile in fresh.values()],
+                    [profile.name if profile else None for profile in fresh.values()],
+                )
+            except Exception:
+                logger.exception("Failed to cache %d player profiles", len(fresh))
+        resolved.update(fresh)
+        return resolved
+
+    async def close(self) -> None:
+        await self.resolver.close()
@@ -0,0 +1,186 @@
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+Entry = Tuple[str, Optional[UUID]]
+OnChange = Callable[[List[Entry], List[str]], Awaitable[None]]
+Signature = Tuple[int, int, int]
+
+
+class _Inotify:
+    """Bare inotify watch on a directory through libc; Linux only."""
+
+    def __init__(self, directory: Path) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self.fd = fd
+
+    def read_names(self) -> List[str]:
+        """Drain pending events and return the file names they are about."""
+        names: List[str] = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                start = offset + _EVENT.size
+                names.append(os.fsdecode(data[start : start + length].rstrip(b"\0")))
+                offset = start + length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _open_inotify(directory: Path) -> Optional[_Inotify]:
+    try:
+        return _Inotify(directory)
+    except (OSError, AttributeError) as exc:
+        logger.info("inotify unavailable for %s (%s), polling instead", directory, exc)
+        return None
+
+
+def read_whitelist_file(path: Path) -> Dict[str, Entry]:
+    """Entries of a server ``whitelist.json`` keyed by lowercased name."""
+    entries: Dict[str, Entry] = {}
+    for item in json.loads(path.read_text(encoding="utf-8")):
+        name = item["name"]
+        raw_uuid = item.get("uuid")
+        entries[name.lower()] = (name, UUID(raw_uuid) if raw_uuid else None)
+    return entries
+
+
+class WhitelistFileWatcher:
+    """Follows a server's ``whitelist.json`` and reports what changed in it.
+
+    The file is parsed only when its size, mtime or inode change, and
+    ``on_change`` gets the entries added and the names removed since the
+    previous parse. Changes are picked up through inotify where available,
+    with a rescan every ``rescan_interval`` seconds for mounts that do not
+    deliver events; without inotify the file is polled every
+    ``poll_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        on_change: OnChange,
+        poll_interval: float = 5.0,
+        rescan_interval: float = 60.0,
+        settle: float = 0.2,
+        use_inotify: bool = True,
+    ) -> None:
+        self.path = path
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.settle = settle
+        self.use_inotify = use_inotify
+        self._entries: Dict[str, Entry] = {}
+        self._signature: Optional[Signature] = None
+        self._inotify: Optional[_Inotify] = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # The first parse is the baseline; a full /whitelist sync covers drift from before it.
+        # If the file cannot be read yet, its first readable version counts as all added.
+        signature = self._stat()
+        if signature is not None:
+            try:
+                self._entries = await asyncio.to_thread(read_whitelist_file, self.path)
+                self._signature = signature
+            except (OSError, ValueError, KeyError, TypeError):
+                logger.warning("Could not parse %s, will retry", self.path, exc_info=True)
+        logger.info("Watching %s (%d entries)", self.path, len(self._entries))
+        if self.use_inotify:
+            self._inotify = _open_inotify(self.path.parent)
+        if self._inotify is not None:
+            asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_readable)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def check(self) -> bool:
+        """Parse the file if it changed and report the delta; True when it was parsed."""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            entries = await asyncio.to_thread(read_whitelist_file, self.path)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Most likely caught mid-write; the next event or poll retries.
+            logger.warning("Could not parse %s, will retry", self.path, exc_info=True)
+            return False
+        added = [entry for key, entry in entries.items() if key not in self._entries]
+        removed = [name for key, (name, _) in self._entries.items() if key not in entries]
+        if added or removed:
+            logger.info("%s changed: %d added, %d removed", self.path, len(added), len(removed))
+            # Only remembered once handled, so a failed reconcile is retried.
+            await self.on_change(added, removed)
+        self._entries, self._signature = entries, signature
+        return True
+
+    def _stat(self) -> Optional[Signature]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _on_readable(self) -> None:
+        if self._inotify is not None and self.path.name in self._inotify.read_names():
+            self._changed.set()
+
+    async def _run(self) -> None:
+        while True:
+            timeout = self.rescan_interval if self._inotify is not None else self.poll_interval
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                # Let a burst of writes finish before reading.
+                await asyncio.sleep(self.settle)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Failed to reconcile changes to %s", self.path)
@@ -1,17 +1,30 @@
 import logging
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
 
 from bot.context import AppContext
 from bot.db import (
+    advisory_lock,
     delete_request,
     fetch_approved_requests,
     fetch_approved_requests_by_user,
     fetch_approved_usernames,
+    fetch_requests_for_players,
+    primary_pool,
+    rename_request,
+    set_request_uuids,
 )
 from bot.rcon import list_whitelisted_players, remove_whitelist_player
+from bot.services.jobs import JobBusy, JobRun, job_kind
+from bot.services.uuids import Profile
+from bot.tracing import span
 
 logger = logging.getLogger(__name__)
 
+SYNC_JOB = "sync"
+
+OnRemoved = Callable[[str], Awaitable[None]]
+
 
 def _pick_primary(records: List[dict], keep_username: Optional[str]) -> Tuple[Optional[dict], List[dict]]:
     if not records:
@@ -33,53 +46,310 @@ async def cleanup_secondary_accounts(
     context: AppContext,
     user_id: Optional[int] = None,
     keep_username: Optional[str] = None,
+    on_removed: Optional[OnRemoved] = None,
+    actor_id: Optional[int] = None,
 ) -> List[str]:
     removed: List[str] = []
     if user_id is not None:
-        records = await fetch_approved_requests_by_user(context.pool, user_id)
+        # Runs right after an approval, so it must see that write.
+        records = await fetch_approved_requests_by_user(
+            primary_pool(context.pool), user_id, tenant=context.config.tenant
+        )
         _, secondary = _pick_primary(records, keep_username)
-        removed.extend(await _revoke_records(context, secondary))
+        removed.extend(await _revoke_records(context, secondary, on_removed, "approval", actor_id))
         return removed
 
-    records = await fetch_approved_requests(context.pool)
-    grouped: Dict[int, List[dict]] = {}
-    for record in records:
-        grouped.setdefault(record["user_id"], []).append(record)
-
-    for user_records in grouped.values():
-        _, secondary = _pick_primary(user_records, None)
-        removed.extend(await _revoke_records(context, secondary))
+    with span("sync.fetch"):
+        records = await fetch_approved_requests(primary_pool(context.pool), tenant=context.config.tenant)
+    with span("sync.diff"):
+        grouped: Dict[int, List[dict]] = {}
+        for record in records:
+            grouped.setdefault(record["user_id"], []).append(record)
+        secondary: List[dict] = []
+        for user_records in grouped.values():
+            secondary.extend(_pick_primary(user_records, None)[1])
 
+    with span("sync.revoke", count=len(secondary)):
+        removed.extend(await _revoke_records(context, secondary, on_removed, "sync", actor_id))
     return removed
 
 
-async def _revoke_records(context: AppContext, records: Iterable[dict]) -> List[str]:
+async def _revoke_records(
+    context: AppContext,
+    records: Iterable[dict],
+    on_removed: Optional[OnRemoved] = None,
+    source: str = "sync",
+    actor_id: Optional[int] = None,
+) -> List[str]:
     removed: List[str] = []
     for record in records:
         username = record["username"]
+        outcome, detail = "ok", None
+        # The row goes first: the whitelist file watcher, here or on another
+        # replica, must not see the name leave while it is still approved.
+        await delete_request(context.pool, record["id"])
         try:
             remove_whitelist_player(context.config.rcon, username)
-        except Exception:
+        except Exception as exc:
             logger.exception("Failed to remove username %s from whitelist", username)
-        await delete_request(context.pool, record["id"])
+            outcome, detail = "rcon_failed", str(exc)
+        context.audit.record(
+            context.config.tenant,
+            "revoke_secondary",
+            source,
+            actor_id=actor_id,
+            username=username,
+            user_id=record["user_id"],
+            request_id=record["id"],
+            outcome=outcome,
+            detail=detail,
+        )
+        context.approved.remove(record["id"])
+        context.whois_cache.invalidate(record["user_id"], username)
         removed.append(username)
+        if on_removed is not None:
+            await on_removed(username)
     return removed
 
 
-async def sync_whitelist(context: AppContext) -> List[str]:
-    removed_by_user = await cleanup_secondary_accounts(context)
+async def assign_uuids(context: AppContext, records: Iterable[Any]) -> Dict[int, Profile]:
+    """Look up and store the player UUID of each request in ``records`` that has none yet.
+
+    Only for requests being approved right now: a name is a reliable key for
+    its player only at that moment, so the lookup skips the profile cache.
+    """
+    if context.uuids is None:
+        return {}
+    missing = [record for record in records if record.get("uuid") is None]
+    if not missing:
+        return {}
+    profiles = await context.uuids.resolve((record["username"] for record in missing), ttl=0)
+    assigned: Dict[int, Profile] = {}
+    for record in missing:
+        profile = profiles.get(record["username"].lower())
+        if profile is not None:
+            assigned[record["id"]] = profile
+    if assigned:
+        await set_request_uuids(context.pool, list(assigned), [profile.uuid for profile in assigned.values()])
+    return assigned
 
-    approved_usernames = await fetch_approved_usernames(context.pool)
-    approved_lookup: Set[str] = {name.lower() for name in approved_usernames}
 
-    server_names = list_whitelisted_players(context.config.rcon)
-    removed_not_in_db: List[str] = []
+async def _match_by_uuid(
+    context: AppContext, server_names: List[str], by_name: Callable[[str], bool], actor_id: Optional[int]
+) -> Callable[[str], bool]:
+    """``is_approved`` keyed on player UUIDs instead of names.
+
+    A request whose player shows up on the server under a new name is
+    renamed to match. Requests approved before UUIDs were recorded keep
+    matching by name: their stored name may belong to someone else by now,
+    so it is never resolved into a UUID after the fact. Names the resolver
+    cannot place fall back to ``by_name``, so a resolver outage never
+    removes anyone a name match would keep.
+    """
+    records = await fetch_approved_requests(primary_pool(context.pool), tenant=context.config.tenant)
+    profiles = await context.uuids.resolve(server_names)
+
+    by_uuid: Dict[UUID, Any] = {}
+    legacy_names: Set[str] = set()
+    for record in records:
+        if record["uuid"] is None:
+            legacy_names.add(record["username"].lower())
+        else:
+            by_uuid.setdefault(record["uuid"], record)
+
     for name in server_names:
-        if name.lower() not in approved_lookup:
-            try:
-                remove_whitelist_player(context.config.rcon, name)
-                removed_not_in_db.append(name)
-            except Exception:
-                logger.exception("Failed to remove username %s from whitelist", name)
+        profile = profiles.get(name.lower())
+        record = by_uuid.get(profile.uuid) if profile is not None else None
+        if record is not None and record["username"].lower() != profile.name.lower():
+            await _rename(context, record, profile.name, actor_id)
+
+    def is_approved(name: str) -> bool:
+        profile = profiles.get(name.lower())
+        if profile is None:
+            return by_name(name)
+        return profile.uuid in by_uuid or name.lower() in legacy_names
+
+    return is_approved
+
+
+async def _rename(
+    context: AppContext, record: Any, username: str, actor_id: Optional[int], source: str = "sync"
+) -> None:
+    old = record["username"]
+    logger.info("Player %s was renamed to %s, updating request %s", old, username, record["id"])
+    await rename_request(context.pool, record["id"], username)
+    context.approved.add(record["id"], record["user_id"], username)
+    context.whois_cache.invalidate(record["user_id"], old)
+    context.whois_cache.invalidate(record["user_id"], username)
+    context.audit.record(
+        context.config.tenant,
+        "rename",
+        source,
+        actor_id=actor_id,
+        username=username,
+        user_id=record["user_id"],
+        request_id=record["id"],
+        detail=old,
+    )
+
+
+async def sync_whitelist(
+    context: AppContext, on_removed: Optional[OnRemoved] = None, actor_id: Optional[int] = None
+) -> List[str]:
+    """Revoke alt accounts, then drop server whitelist entries the database does not approve.
+
+    With a UUID resolver configured, server entries are matched to approved
+    requests by player UUID, so renamed players are kept.
+
+    Safe to run again after an interruption: whatever was already removed
+    is no longer approved or on the server. ``on_removed`` is awaited after
+    each removal; every removal is audited with ``actor_id`` as the actor.
+    """
+    removed_by_user = await cleanup_secondary_accounts(context, on_removed=on_removed, actor_id=actor_id)
+
+    if context.approved.loaded:
+        is_approved = context.approved.contains
+    else:
+        with span("sync.fetch"):
+            # Removing from the server on a stale view would drop fresh approvals.
+            approved_usernames = await fetch_approved_usernames(
+                primary_pool(context.pool), tenant=context.config.tenant
+            )
+            approved_lookup: Set[str] = {name.lower() for name in approved_usernames}
+
+        def is_approved(name: str) -> bool:
+            return name.lower() in approved_lookup
+
+    with span("sync.rcon_list"):
+        server_names = list_whitelisted_players(context.config.rcon)
+    if context.uuids is not None:
+        with span("sync.uuids"):
+            is_approved = await _match_by_uuid(context, server_names, is_approved, actor_id)
+    with span("sync.diff"):
+        unknown = [name for name in server_names if not is_approved(name)]
+
+    with span("sync.revoke", count=len(unknown)):
+        removed_not_in_db = await _remove_unknown(context, unknown, on_removed, "sync", actor_id)
 
     return removed_by_user + removed_not_in_db
+
+
+async def _remove_unknown(
+    context: AppContext,
+    names: Iterable[str],
+    on_removed: Optional[OnRemoved] = None,
+    source: str = "sync",
+    actor_id: Optional[int] = None,
+) -> List[str]:
+    removed: List[str] = []
+    for name in names:
+        try:
+            remove_whitelist_player(context.config.rcon, name)
+            removed.append(name)
+        except Exception as exc:
+            logger.exception("Failed to remove username %s from whitelist", name)
+            context.audit.record(
+                context.config.tenant,
+                "remove_unknown",
+                source,
+                actor_id=actor_id,
+                username=name,
+                outcome="rcon_failed",
+                detail=str(exc),
+            )
+            continue
+        context.audit.record(context.config.tenant, "remove_unknown", source, actor_id=actor_id, username=name)
+        if on_removed is not None:
+            await on_removed(name)
+    return removed
+
+
+async def reconcile_whitelist_changes(
+    context: AppContext, added: List[Tuple[str, Optional[UUID]]], removed: List[str]
+) -> List[str]:
+    """Act on entries that appeared on or vanished from the server whitelist outside the bot.
+
+    ``added`` holds (name, UUID) pairs as the server wrote them. Added
+    players without an approved request are removed again, unless a request
+    for them is pending (it may be mid-approval); approved players found
+    under a new name get their request renamed. Approved players someone
+    removed are reported to the admin chat. Returns the names removed.
+    """
+    tenant = context.config.tenant
+    names = [name for name, _ in added] + list(removed)
+    uuids = [uuid for _, uuid in added if uuid is not None]
+    # Straight from the primary: an approval that just landed must count.
+    records = await fetch_requests_for_players(primary_pool(context.pool), names, uuids, tenant=tenant)
+    by_name: Dict[str, Any] = {}
+    by_uuid: Dict[UUID, Any] = {}
+    # Approved rows last, so they win over a pending request for the same player.
+    for record in sorted(records, key=lambda record: record["status"] == "approved"):
+        by_name[record["username"].lower()] = record
+        if record["uuid"] is not None:
+            by_uuid[record["uuid"]] = record
+
+    unknown: List[str] = []
+    for name, uuid in added:
+        record = by_uuid.get(uuid) if uuid is not None else None
+        if record is None:
+            record = by_name.get(name.lower())
+        if record is None:
+            unknown.append(name)
+        elif record["status"] == "approved" and record["username"].lower() != name.lower():
+            await _rename(context, record, name, None, source="watcher")
+    dropped = [name for name in removed if (record := by_name.get(name.lower())) and record["status"] == "approved"]
+
+    removed_unknown = await _remove_unknown(context, unknown, source="watcher")
+    for name in dropped:
+        record = by_name[name.lower()]
+        context.audit.record(
+            tenant, "removed_outside", "watcher", username=name, user_id=record["user_id"], request_id=record["id"]
+        )
+
+    locale = context.config.locale
+    notices = []
+    if removed_unknown:
+        notices.append(locale.t("whitelist_drift_removed", usernames=", ".join(removed_unknown)))
+    if dropped:
+        notices.append(locale.t("whitelist_drift_missing", usernames=", ".join(dropped)))
+    if notices:
+        try:
+            await context.bot.send_message(context.config.admin_chat_id, "\n".join(notices))
+        except Exception:
+            logger.exception("Failed to report whitelist changes to the admin chat")
+    return removed_unknown
+
+
+@job_kind(SYNC_JOB)
+async def run_sync_job(context: AppContext, run: JobRun) -> Dict[str, Any]:
+    """``sync_whitelist`` as a background job, checkpointing every removal.
+
+    A run resumed after a restart starts with the names removed before it,
+    so the final report covers the whole sync.
+    """
+    removed: List[str] = list(run.progress.get("removed", []))
+
+    async def checkpoint(username: str) -> None:
+        removed.append(username)
+        await run.checkpoint(removed=removed)
+
+    # A stale heartbeat can hand the job to a second worker while the first
+    # is still going; the lock keeps them from revoking side by side.
+    async with advisory_lock(context.pool, f"sync:{context.config.tenant}") as acquired:
+        if not acquired:
+            raise JobBusy("another whitelist sync is still running")
+        await sync_whitelist(context, on_removed=checkpoint, actor_id=run.job.requested_by)
+    await run.checkpoint(force=True, removed=removed)
+
+    chat_id = run.job.chat_id
+    if chat_id is not None:
+        locale = context.config.locale
+        if not removed:
+            await context.bot.send_message(chat_id, locale.t("whitelist_cleanup_none"))
+        else:
+            await context.bot.send_message(chat_id, locale.t("whitelist_cleanup_done", count=len(removed)))
+            if len(removed) <= 50:
+                await context.bot.send_message(
+                    chat_id, locale.t("whitelist_cleanup_list", usernames=", ".join(removed))
+                )
+    return {"removed": len(removed)}
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+CacheKey = Tuple[str, Hashable]
+
+
+class WhoisCache:
+    """Bounded LRU cache of rendered /whois replies with a per-entry TTL.
+
+    Keys are ``("user", tg_id)`` or ``("mc", lowercased_name)``. Every entry
+    remembers the Telegram user it describes so a decision about that user
+    drops all of their cached replies at once.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any, Optional[int]]]" = OrderedDict()
+        self._by_owner: Dict[int, Set[CacheKey]] = {}
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: CacheKey, reply: Any, owner: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, reply, owner)
+        if owner is not None:
+            self._by_owner.setdefault(owner, set()).add(key)
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def invalidate(self, user_id: int, username: Optional[str] = None) -> None:
+        for key in self._by_owner.pop(user_id, set()):
+            self._entries.pop(key, None)
+        self._drop(("user", user_id))
+        if username:
+            self._drop(("mc", username.lower()))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_owner.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+        owned = self._by_owner.get(entry[2])
+        if owned is not None:
+            owned.discard(key)
+            if not owned:
+                del self._by_owner[entry[2]]
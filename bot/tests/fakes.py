@@ -1,5 +1,8 @@
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from bot.services.uuids import Profile
 
 
 @dataclass
@@ -26,15 +29,18 @@ class FakeMessage:
     replies: List[str] = field(default_factory=list)
     answers: List[str] = field(default_factory=list)
     edits: List[str] = field(default_factory=list)
+    markups: List[Any] = field(default_factory=list)
 
-    async def reply(self, text: str) -> None:
+    async def reply(self, text: str, reply_markup: Any = None) -> None:
         self.replies.append(text)
+        self.markups.append(reply_markup)
 
     async def answer(self, text: str, reply_markup: Any = None) -> None:
         self.answers.append(text)
 
     async def edit_text(self, text: str, reply_markup: Any = None) -> None:
         self.edits.append(text)
+        self.markups.append(reply_markup)
 
 
 @dataclass
@@ -72,7 +78,9 @@ class FakeConn:
     def __init__(self) -> None:
         self.fetchrow_result: Any = None
         self.fetch_result: List[Any] = []
+        self.fetchval_result: Any = None
         self.execute_calls: List[Any] = []
+        self.copied: List[Any] = []
         self.last_query: Optional[str] = None
         self.last_params: Optional[tuple] = None
 
@@ -86,11 +94,19 @@ class FakeConn:
         self.last_params = params
         return list(self.fetch_result)
 
+    async def fetchval(self, query: str, *params: Any) -> Any:
+        self.last_query = query
+        self.last_params = params
+        return self.fetchval_result
+
     async def execute(self, query: str, *params: Any) -> None:
         self.execute_calls.append((query, params))
         self.last_query = query
         self.last_params = params
 
+    async def copy_records_to_table(self, table: str, records: List[Any], columns: Any = None) -> None:
+        self.copied.append((table, list(records), columns))
+
     def transaction(self) -> "FakeConn":
         return self
 
@@ -114,9 +130,14 @@ class FakeBot:
         self.sent: List[Dict[str, Any]] = []
         self.chats: Dict[str, Any] = {}
         self.reactions: List[Dict[str, Any]] = []
+        self.edited_markups: List[Dict[str, Any]] = []
 
-    async def send_message(self, chat_id: int, text: str, reply_markup: Any = None) -> None:
+    async def send_message(self, chat_id: int, text: str, reply_markup: Any = None) -> FakeMessage:
         self.sent.append({"chat_id": chat_id, "text": text, "reply_markup": reply_markup})
+        return FakeMessage(chat=FakeChat(chat_id), from_user=FakeUser(0), text=text, message_id=len(self.sent))
+
+    async def edit_message_reply_markup(self, chat_id: int, message_id: int, reply_markup: Any = None) -> None:
+        self.edited_markups.append({"chat_id": chat_id, "message_id": message_id, "reply_markup": reply_markup})
 
     async def get_chat(self, username: str) -> Any:
         return self.chats.get(username)
@@ -136,3 +157,20 @@ class FakeBot:
                 "is_big": is_big,
             }
         )
+
+
+class FakeResolver:
+    """Profiles API stand-in that knows ``profiles`` (current name -> UUID)."""
+
+    def __init__(self, profiles: Dict[str, str], batch_size: int = 10) -> None:
+        self.profiles = {name.lower(): Profile(UUID(uuid), name) for name, uuid in profiles.items()}
+        self.batch_size = batch_size
+        self.calls: List[List[str]] = []
+
+    async def lookup(self, names: List[str]) -> Dict[str, Profile]:
+        assert len(names) <= self.batch_size
+        self.calls.append(list(names))
+        return {name.lower(): self.profiles[name.lower()] for name in names if name.lower() in self.profiles}
+
+    async def close(self) -> None:
+        return None
@@ -0,0 +1,43 @@
+import pytest
+
+from bot.benchmarks.dispatcher import BenchResult, compare_to_baseline, run_scenario
+from bot.benchmarks.standins import LatencySession
+from bot.benchmarks.sync import generate_rows, run_sync, seed_memory
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario", ["request_flow", "approvals", "whois_storm"])
+async def test_dispatcher_scenarios_run_clean(scenario: str) -> None:
+    result = await run_scenario(scenario, 20, concurrency=4)
+
+    assert result.updates == 20
+    assert result.errors == 0
+    assert result.unhandled == 0
+
+
+def test_compare_to_baseline_flags_regressions() -> None:
+    baseline = {"updates_per_sec": 1000.0, "p99_ms": 10.0}
+    ok = BenchResult("approvals", 100, 0, 0, updates_per_sec=900.0, p50_ms=1.0, p99_ms=11.0)
+    slow = BenchResult("approvals", 100, 0, 0, updates_per_sec=500.0, p50_ms=1.0, p99_ms=30.0)
+
+    assert compare_to_baseline(ok, baseline, tolerance=0.3) == []
+    assert len(compare_to_baseline(slow, baseline, tolerance=0.3)) == 2
+
+
+@pytest.mark.asyncio
+async def test_sync_benchmark_times_each_phase() -> None:
+    data = generate_rows(500, alt_rate=0.5, unknown_rate=0.1)
+    pool = seed_memory(data)
+
+    result = await run_sync(pool, list(data.server_whitelist), "memory", len(data.rows), data.approved)
+
+    assert result.removed == data.alts + data.unknown
+    assert {"fetch", "rcon_list", "diff", "revoke"} <= set(result.phases_ms)
+    assert result.peak_memory_mb is not None
+
+
+@pytest.mark.asyncio
+async def test_latency_session_streams_an_empty_body() -> None:
+    chunks = [chunk async for chunk in LatencySession().stream_content("https://example.invalid/file")]
+
+    assert b"".join(chunks) == b""
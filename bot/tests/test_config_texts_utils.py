@@ -1,8 +1,10 @@
+import json
 import logging
+from pathlib import Path
 
 import pytest
 
-from bot.config import parse_admin_ids
+from bot.config import AppConfig, RconConfig, load_tenant_configs, parse_admin_ids
 from bot.texts import Locale
 from bot.utils import USERNAME_RE, format_user
 
@@ -37,3 +39,39 @@ def test_format_user_username() -> None:
 def test_format_user_link() -> None:
     user = FakeUser(id=2, full_name="User Two", username=None)
     assert "tg://user?id=2" in format_user(user)
+
+
+def test_load_tenant_configs_overrides_per_community(tmp_path) -> None:
+    path = tmp_path / "tenants.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"key": "alpha", "bot_token": "1:a", "admin_chat_id": -1, "admin_ids": [10], "locale": "ru"},
+                {"key": "beta", "bot_token": "2:b", "admin_chat_id": -2, "rcon": {"host": "beta.mc", "port": 25576}},
+            ]
+        )
+    )
+    base = AppConfig("", 0, [], Path("."), RconConfig("shared", 25575, "secret"), "dsn", Locale("en"))
+    base.tenants_file = str(path)
+
+    alpha, beta = load_tenant_configs(base)
+
+    assert (alpha.tenant, alpha.admin_chat_id, alpha.admin_ids, alpha.locale.name) == ("alpha", -1, [10], "ru")
+    assert alpha.rcon == RconConfig("shared", 25575, "secret")
+    assert (beta.rcon.host, beta.rcon.port, beta.rcon.password) == ("beta.mc", 25576, "secret")
+    assert beta.db_dsn == "dsn"
+
+
+def test_load_tenant_configs_rejects_shared_tokens(tmp_path) -> None:
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps([{"key": k, "bot_token": "1:a", "admin_chat_id": -1} for k in ("a", "b")]))
+    base = AppConfig("", 0, [], Path("."), RconConfig("h", 1, ""), "dsn", Locale("en"), tenants_file=str(path))
+
+    with pytest.raises(RuntimeError, match="reuses"):
+        load_tenant_configs(base)
+
+
+def test_load_tenant_configs_defaults_to_single_tenant() -> None:
+    base = AppConfig("1:a", -1, [], Path("."), RconConfig("h", 1, ""), "dsn", Locale("en"))
+
+    assert load_tenant_configs(base) == [base]
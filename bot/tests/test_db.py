@@ -1,6 +1,7 @@
 import pytest
 
 from bot import db
+from bot.metrics import DB_LATENCY
 
 from .fakes import FakeConn, FakePool
 
@@ -8,14 +9,15 @@ from .fakes import FakeConn, FakePool
 @pytest.mark.asyncio
 async def test_create_request() -> None:
     conn = FakeConn()
-    conn.fetchrow_result = {"id": 42}
+    conn.fetchrow_result = {"id": 42, "created": True}
     pool = FakePool(conn)
 
-    request_id = await db.create_request(pool, 1, 2, "Steve", "hello")
+    request_id, created = await db.create_request(pool, 1, 2, "Steve", "hello")
 
-    assert request_id == 42
+    assert (request_id, created) == (42, True)
     assert "INSERT INTO whitelist_requests" in conn.last_query
-    assert conn.last_params == (1, 2, "Steve", "hello")
+    assert "ON CONFLICT (tenant, user_id, lower(username)) WHERE status = 'pending'" in conn.last_query
+    assert conn.last_params == (1, 2, "Steve", "hello", "default")
 
 
 @pytest.mark.asyncio
@@ -28,7 +30,7 @@ async def test_fetch_request() -> None:
 
     assert record == {"id": 7}
     assert "SELECT * FROM whitelist_requests" in conn.last_query
-    assert conn.last_params == (7,)
+    assert conn.last_params == (7, "default")
 
 
 @pytest.mark.asyncio
@@ -41,7 +43,7 @@ async def test_fetch_user_by_mc_username() -> None:
 
     assert user_id == 99
     assert "WHERE username = $1" in conn.last_query
-    assert conn.last_params == ("Steve",)
+    assert conn.last_params == ("Steve", "default")
 
 
 @pytest.mark.asyncio
@@ -67,6 +69,19 @@ async def test_fetch_approved_usernames() -> None:
     assert "status = 'approved'" in conn.last_query
 
 
+@pytest.mark.asyncio
+async def test_mark_request_only_decides_pending_requests() -> None:
+    conn = FakeConn()
+    pool = FakePool(conn)
+
+    assert not await db.mark_request(pool, 5, "approved", 10)
+    assert "status = 'pending'" in conn.last_query
+    assert conn.last_params == (5, "approved", 10)
+
+    conn.fetchval_result = 5
+    assert await db.mark_request(pool, 5, "approved", 10)
+
+
 @pytest.mark.asyncio
 async def test_mark_request_status() -> None:
     conn = FakeConn()
@@ -90,3 +105,65 @@ async def test_delete_request() -> None:
     query, params = conn.execute_calls[-1]
     assert "DELETE FROM whitelist_requests" in query
     assert params == (11,)
+
+
+@pytest.mark.asyncio
+async def test_prepare_hot_statements_runs_lookups_outside_metrics() -> None:
+    conn = FakeConn()
+    before = DB_LATENCY.count(query="fetch_request")
+
+    await db.prepare_hot_statements(conn)
+
+    assert conn.last_query == "SELECT user_id FROM telegram_usernames WHERE username = $1"
+    assert DB_LATENCY.count(query="fetch_request") == before
+
+
+@pytest.mark.asyncio
+async def test_pool_router_reads_from_a_fresh_replica() -> None:
+    primary_conn, replica_conn = FakeConn(), FakeConn()
+    replica_conn.fetchval_result = 0.5
+    replica_conn.fetch_result = [{"username": "Steve"}]
+    router = db.PoolRouter(FakePool(primary_conn), FakePool(replica_conn), max_lag=5.0)
+    await router.check()
+
+    assert await db.fetch_approved_usernames(router) == ["Steve"]
+    assert "status = 'approved'" in replica_conn.last_query
+    assert primary_conn.last_query is None
+
+
+@pytest.mark.asyncio
+async def test_pool_router_falls_back_to_primary() -> None:
+    primary_conn, replica_conn = FakeConn(), FakeConn()
+    router = db.PoolRouter(FakePool(primary_conn), FakePool(replica_conn), max_lag=5.0)
+
+    replica_conn.fetchval_result = 30.0
+    await router.check()
+    assert router.reader() is router.primary
+
+    replica_conn.fetchval_result = 0.0
+    await router.check()
+    assert router.reader() is router.replica
+
+    # A write sends reads to the primary until the replica has had time to catch up.
+    await db.delete_request(router, 7)
+    assert primary_conn.last_params == (7,)
+    assert router.reader() is router.primary
+    assert db.primary_pool(router) is router.primary
+
+
+@pytest.mark.asyncio
+async def test_apply_migrations_runs_each_file_once(tmp_path) -> None:
+    (tmp_path / "01-init.sql").write_text("SELECT 1")
+    (tmp_path / "02-next.sql").write_text("SELECT 2")
+    conn = FakeConn()
+    conn.fetch_result = [{"name": "01-init.sql"}]
+
+    await db.apply_migrations(FakePool(conn), tmp_path)
+
+    queries = [query for query, _ in conn.execute_calls]
+    assert queries[0] == "SELECT pg_advisory_lock($1)" and queries[-1] == "SELECT pg_advisory_unlock($1)"
+    assert conn.execute_calls[0][1] == conn.execute_calls[-1][1] == (db.lock_key("migrations"),)
+    assert conn.execute_calls[2:-1] == [
+        ("SELECT 2", ()),
+        ("INSERT INTO schema_migrations (name) VALUES ($1)", ("02-next.sql",)),
+    ]
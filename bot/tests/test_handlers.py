@@ -1,26 +1,32 @@
+from datetime import datetime, timezone
 from pathlib import Path
 
 import pytest
+from aiogram.filters import CommandObject
 from aiogram.types import ReactionTypeEmoji
 
 from bot.config import AppConfig, RconConfig
 from bot.context import AppContext
 from bot.handlers.comment import handle_comment
 from bot.handlers.decision import handle_decision
+from bot.handlers.jobs import handle_job
 from bot.handlers.skip_comment import skip_comment
 from bot.handlers.start import handle_start
 from bot.handlers.username import handle_username
 from bot.handlers.whitelist_sync import handle_whitelist_sync
-from bot.handlers.whois import handle_whois
+from bot.handlers.whois import PAGE_SIZE, decode_page, encode_page, handle_whois, handle_whois_page
+from bot.services.uuids import UuidCache
 from bot.texts import Locale
 
 from .fakes import (
     FakeBot,
     FakeCallbackQuery,
     FakeChat,
+    FakeConn,
     FakeFSMContext,
     FakeMessage,
     FakePool,
+    FakeResolver,
     FakeUser,
 )
 
@@ -123,13 +129,14 @@ async def test_decision_approve_flow(monkeypatch: pytest.MonkeyPatch) -> None:
     message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="req")
     callback = FakeCallbackQuery(data="approve:1", from_user=FakeUser(1), message=message)
 
-    async def fake_fetch(pool, request_id):
+    async def fake_fetch(pool, request_id, tenant):
         return {"id": 1, "user_id": 5, "username": "Steve", "status": "pending", "chat_id": 55}
 
     async def fake_mark(pool, request_id, status, decided_by):
         assert status == "approved"
+        return True
 
-    async def fake_cleanup(context, user_id=None, keep_username=None):
+    async def fake_cleanup(context, user_id=None, keep_username=None, actor_id=None):
         assert user_id == 5
         assert keep_username == "Steve"
         return []
@@ -147,6 +154,42 @@ async def test_decision_approve_flow(monkeypatch: pytest.MonkeyPatch) -> None:
     assert callback.answers
     assert callback.answers[-1]["text"] == "Approved"
     assert context.bot.sent
+    [event] = context.audit._pending
+    assert (event.action, event.source, event.actor_id, event.request_id) == ("approve", "decision", 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_decision_approve_loses_race_to_a_deny(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context(admin_ids=[1])
+    message = FakeMessage(chat=FakeChat(999), from_user=FakeUser(1), text="Request #1")
+    callback = FakeCallbackQuery(data="approve:1", from_user=FakeUser(1), message=message)
+    statuses = ["pending", "denied"]
+    removed = []
+
+    async def fake_fetch(pool, request_id, tenant):
+        return {"id": 1, "user_id": 5, "username": "Steve", "status": statuses.pop(0), "chat_id": 55}
+
+    async def fake_mark(pool, request_id, status, decided_by):
+        return False
+
+    async def fake_cleanup(context, user_id=None, keep_username=None, actor_id=None):
+        return []
+
+    monkeypatch.setattr("bot.handlers.decision.fetch_request", fake_fetch)
+    monkeypatch.setattr("bot.handlers.decision.mark_request", fake_mark)
+    monkeypatch.setattr("bot.handlers.decision.cleanup_secondary_accounts", fake_cleanup)
+    monkeypatch.setattr("bot.handlers.decision.whitelist_player", lambda config, username: None)
+    monkeypatch.setattr(
+        "bot.handlers.decision.remove_whitelist_player", lambda config, username: removed.append(username)
+    )
+
+    await handle_decision(callback, context)
+
+    assert callback.answers[-1]["text"] == context.config.locale.t("already_handled")
+    assert removed == ["Steve"]
+    assert not context.bot.sent
+    assert not context.approved.contains("steve")
+    assert not context.audit._pending
 
 
 @pytest.mark.asyncio
@@ -160,19 +203,56 @@ async def test_whitelist_sync_non_admin() -> None:
 
 
 @pytest.mark.asyncio
-async def test_whitelist_sync_admin(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_whitelist_sync_admin_queues_a_job() -> None:
     context = build_context(admin_ids=[1])
+    conn = FakeConn()
+    conn.fetchrow_result = {"id": 7}
+    context.pool = FakePool(conn)
     message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="/whitelist")
 
-    async def fake_sync(ctx):
-        return ["Ghost"]
+    await handle_whitelist_sync(message, context)
+
+    assert message.replies == [context.config.locale.t("whitelist_cleanup_queued", job_id="7")]
+    assert "INSERT INTO jobs" in conn.last_query
+    assert conn.last_params[0] == "sync"
+
 
-    monkeypatch.setattr("bot.handlers.whitelist_sync.sync_whitelist", fake_sync)
+@pytest.mark.asyncio
+async def test_whitelist_sync_already_queued() -> None:
+    context = build_context(admin_ids=[1])
+    conn = FakeConn()
+    context.pool = FakePool(conn)
+    message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="/whitelist")
 
     await handle_whitelist_sync(message, context)
 
-    assert context.config.locale.t("whitelist_cleanup_started") in message.replies[0]
-    assert context.config.locale.t("whitelist_cleanup_done", count=1) in message.replies[1]
+    assert message.replies == [context.config.locale.t("whitelist_sync_busy")]
+
+
+@pytest.mark.asyncio
+async def test_job_status_shows_progress() -> None:
+    context = build_context(admin_ids=[1])
+    conn = FakeConn()
+    conn.fetchrow_result = {
+        "id": 7,
+        "kind": "sync",
+        "status": "running",
+        "created_at": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+        "started_at": datetime(2024, 5, 1, 12, 1, tzinfo=timezone.utc),
+        "finished_at": None,
+        "attempts": 1,
+        "progress": '{"removed": ["Ghost", "Alt"]}',
+        "result": None,
+        "error": None,
+    }
+    context.pool = FakePool(conn)
+    message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="/job 7")
+
+    await handle_job(message, CommandObject(command="job", args="7"), context)
+
+    assert "#7 (sync): running" in message.replies[0]
+    assert "removed: 2" in message.replies[0]
+    assert conn.last_params == (7, "default")
 
 
 @pytest.mark.asyncio
@@ -180,7 +260,7 @@ async def test_whois_by_mc_username(monkeypatch: pytest.MonkeyPatch) -> None:
     context = build_context()
     message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois Steve")
 
-    async def fake_fetch(pool, username):
+    async def fake_fetch(pool, username, tenant):
         return 123
 
     monkeypatch.setattr("bot.handlers.whois.fetch_user_by_mc_username", fake_fetch)
@@ -196,7 +276,7 @@ async def test_whois_missing(monkeypatch: pytest.MonkeyPatch) -> None:
     context = build_context()
     message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois Steve")
 
-    async def fake_fetch(pool, username):
+    async def fake_fetch(pool, username, tenant):
         return None
 
     monkeypatch.setattr("bot.handlers.whois.fetch_user_by_mc_username", fake_fetch)
@@ -221,3 +301,202 @@ async def test_whois_no_args_reacts() -> None:
     assert isinstance(reaction, list)
     assert isinstance(reaction[0], ReactionTypeEmoji)
     assert reaction[0].emoji == "🤡"
+
+
+@pytest.mark.asyncio
+async def test_whois_uses_loaded_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    context.approved.add(1, 321, "Steve")
+    context.approved.loaded = True
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois steve")
+
+    async def fail_fetch(pool, username):
+        raise AssertionError("database should not be queried")
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_user_by_mc_username", fail_fetch)
+
+    await handle_whois(message, context)
+
+    assert "tg://user?id=321" in message.replies[0]
+
+
+@pytest.mark.asyncio
+async def test_whois_tg_username_uses_directory_before_get_chat(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    context.bot.chats["@long_telegram_username"] = FakeChat(555, "private")
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois @long_telegram_username")
+    looked_up = []
+
+    async def fake_fetch_usernames_page(pool, user_id, limit, cursor=None, newer=False, tenant=None):
+        looked_up.append(user_id)
+        return []
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_usernames_page", fake_fetch_usernames_page)
+
+    await handle_whois(message, context)
+    context.bot.chats.clear()
+    context.whois_cache.clear()
+    await handle_whois(message, context)
+
+    assert looked_up == [555, 555]
+
+
+@pytest.mark.asyncio
+async def test_whois_tg_username_caches_misses() -> None:
+    context = build_context()
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois @long_telegram_username")
+
+    await handle_whois(message, context)
+
+    assert context.usernames.is_known_miss("long_telegram_username")
+
+
+@pytest.mark.asyncio
+async def test_whois_replies_from_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    calls = []
+
+    async def fake_fetch(pool, username, tenant):
+        calls.append(username)
+        return 123
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_user_by_mc_username", fake_fetch)
+
+    for _ in range(2):
+        message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois Steve")
+        await handle_whois(message, context)
+        assert "tg://user?id=123" in message.replies[0]
+
+    assert calls == ["Steve"]
+    assert context.whois_cache.hits == 1
+
+
+DECIDED_AT = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def history_rows(count: int, first_id: int = 100) -> list:
+    return [
+        {"id": first_id - n, "username": f"Name{n}", "status": "approved", "decided_at": DECIDED_AT}
+        for n in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_whois_pages_history_with_buttons(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    calls = []
+
+    async def fake_fetch_page(pool, user_id, limit, cursor=None, newer=False, tenant=None):
+        calls.append((user_id, limit, cursor, newer))
+        return history_rows(limit if cursor is None else 3)
+
+    async def fake_fetch_request(pool, request_id, tenant):
+        return {"id": request_id, "user_id": 7}
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_usernames_page", fake_fetch_page)
+    monkeypatch.setattr("bot.handlers.whois.fetch_request", fake_fetch_request)
+    reply_to = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(7))
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois", reply_to_message=reply_to)
+
+    await handle_whois(message, context)
+
+    assert len(message.replies[0].splitlines()) == PAGE_SIZE
+    [[older]] = message.markups[0].inline_keyboard
+    assert older.text == context.config.locale.t("whois_next_button")
+
+    callback = FakeCallbackQuery(data=older.callback_data, from_user=FakeUser(1), message=message)
+    await handle_whois_page(callback, context)
+
+    assert calls[1] == (7, PAGE_SIZE + 1, (DECIDED_AT, 100 - PAGE_SIZE + 1), False)
+    assert len(message.edits[0].splitlines()) == 3
+    [[newer]] = message.markups[1].inline_keyboard
+    assert decode_page(newer.callback_data) == (True, (DECIDED_AT, 100))
+    assert all(":7:" not in button.callback_data for button in (older, newer))
+    assert callback.answers
+
+
+def test_whois_page_cursor_keeps_pending_rows() -> None:
+    assert decode_page(encode_page(False, (None, 3))) == (False, (None, 3))
+
+
+@pytest.mark.asyncio
+async def test_whois_several_targets_in_one_reply(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    lookups = []
+
+    async def fake_fetch_owners(pool, names, tenant):
+        lookups.append(names)
+        return {"Steve": 5}
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_users_by_mc_usernames", fake_fetch_owners)
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois Steve Alex")
+
+    await handle_whois(message, context)
+
+    assert lookups == [["Steve", "Alex"]]
+    [reply] = message.replies
+    assert "tg://user?id=5" in reply
+    assert context.config.locale.t("whois_target_not_found", target="Alex") in reply
+
+
+@pytest.mark.asyncio
+async def test_whois_escapes_targets_echoed_into_the_reply(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+
+    async def fake_fetch_owners(pool, names, tenant):
+        return {}
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_users_by_mc_usernames", fake_fetch_owners)
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois Steve <b>x</b>&amp")
+
+    await handle_whois(message, context)
+
+    [reply] = message.replies
+    assert "<b>" not in reply and "&amp;amp" in reply
+    assert context.config.locale.t("whois_target_not_found", target="@&lt;b&gt;x&lt;/b&gt;&amp;amp") in reply
+
+
+@pytest.mark.asyncio
+async def test_whois_finds_a_renamed_player_by_uuid(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    context.uuids = UuidCache(FakePool(FakeConn()), FakeResolver({"NewName": "8667ba71-b85a-4004-af54-457a9734eed7"}))
+
+    async def fake_fetch(pool, username, tenant):
+        return None
+
+    async def fake_fetch_by_uuids(pool, uuids, tenant):
+        return {uuid: 5 for uuid in uuids}
+
+    monkeypatch.setattr("bot.handlers.whois.fetch_user_by_mc_username", fake_fetch)
+    monkeypatch.setattr("bot.handlers.whois.fetch_users_by_uuids", fake_fetch_by_uuids)
+    message = FakeMessage(chat=FakeChat(1, "group"), from_user=FakeUser(1), text="/whois NewName")
+
+    await handle_whois(message, context)
+
+    assert "tg://user?id=5" in message.replies[0]
+
+
+@pytest.mark.asyncio
+async def test_decision_side_effects_fail_independently(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context(admin_ids=[1])
+    message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="req")
+    callback = FakeCallbackQuery(data="deny:1", from_user=FakeUser(1), message=message)
+
+    async def fake_fetch(pool, request_id, tenant):
+        return {"id": 1, "user_id": 5, "username": "Steve", "status": "pending", "chat_id": 55}
+
+    async def fake_mark(pool, request_id, status, decided_by):
+        assert status == "denied"
+        return True
+
+    async def failing_send(chat_id, text, reply_markup=None):
+        raise RuntimeError("blocked by user")
+
+    monkeypatch.setattr("bot.handlers.decision.fetch_request", fake_fetch)
+    monkeypatch.setattr("bot.handlers.decision.mark_request", fake_mark)
+    monkeypatch.setattr(context.bot, "send_message", failing_send)
+
+    await handle_decision(callback, context)
+
+    assert callback.answers[0]["text"] == "Denied"
+    assert message.edits and context.config.locale.t("admin_verdict_denied", admin="") in message.edits[0]
@@ -0,0 +1,42 @@
+import json
+import logging
+
+import pytest
+
+from bot import db
+from bot.logging_config import JsonFormatter, parse_levels
+
+from .fakes import FakeConn, FakePool
+
+
+def test_parse_levels_skips_invalid_entries() -> None:
+    assert parse_levels("aiogram=warning, bot.db=DEBUG,broken,asyncpg=LOUD") == {
+        "aiogram": logging.WARNING,
+        "bot.db": logging.DEBUG,
+    }
+
+
+def test_json_formatter_outputs_one_object() -> None:
+    record = logging.LogRecord("bot.test", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "bot.test"
+
+
+@pytest.mark.asyncio
+async def test_sql_tracing_respects_sample_rate(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.DEBUG, logger="bot.db")
+    pool = FakePool(FakeConn())
+    try:
+        db.set_sql_sample_rate(0)
+        await db.fetch_request(pool, 1)
+        assert not any("SQL fetch_request" in r.message for r in caplog.records)
+
+        db.set_sql_sample_rate(1)
+        await db.fetch_request(pool, 1)
+        assert any("SQL fetch_request" in r.message for r in caplog.records)
+    finally:
+        db.set_sql_sample_rate(0)
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from bot import db
+from bot.metrics import DB_LATENCY, HANDLER_ERRORS, HANDLER_LATENCY, Registry
+from bot.middlewares.metrics import HandlerMetricsMiddleware
+
+from .fakes import FakeConn, FakePool
+
+
+def test_registry_renders_counters_and_histograms() -> None:
+    registry = Registry()
+    counter = registry.counter("events_total", "Events.", ("kind",))
+    histogram = registry.histogram("latency_seconds", "Latency.", ("op",), buckets=(0.1, 1.0))
+    counter.inc(kind='a"b')
+    histogram.observe(0.05, op="x")
+    histogram.observe(0.5, op="x")
+    histogram.observe(5, op="x")
+
+    text = registry.render()
+
+    assert 'events_total{kind="a\\"b"} 1.0' in text
+    assert 'latency_seconds_bucket{op="x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{op="x",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{op="x",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{op="x"} 3' in text
+
+
+def test_function_backed_gauge() -> None:
+    registry = Registry()
+    gauge = registry.gauge("pool_connections", "Pool.", ("state",))
+    gauge.set_function(lambda: {("idle",): 3})
+
+    assert 'pool_connections{state="idle"} 3' in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_db_functions_are_timed() -> None:
+    before = DB_LATENCY.count(query="fetch_request")
+
+    await db.fetch_request(FakePool(FakeConn()), 1)
+
+    assert DB_LATENCY.count(query="fetch_request") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_handler_metrics_middleware_counts_errors() -> None:
+    async def handle_boom(event, data):
+        raise RuntimeError("boom")
+
+    middleware = HandlerMetricsMiddleware()
+    before_calls = HANDLER_LATENCY.count(handler="handle_boom")
+    before_errors = HANDLER_ERRORS.value(handler="handle_boom")
+
+    with pytest.raises(RuntimeError):
+        await middleware(handle_boom, object(), {"handler": SimpleNamespace(callback=handle_boom)})
+
+    assert HANDLER_LATENCY.count(handler="handle_boom") == before_calls + 1
+    assert HANDLER_ERRORS.value(handler="handle_boom") == before_errors + 1
@@ -1,8 +1,16 @@
-from typing import List
+import asyncio
+import logging
+import socket
+import socketserver
+import struct
+import threading
+from types import SimpleNamespace
+from typing import Iterator, List
 
 import pytest
 
 from bot import rcon
+from bot.main import _probe_rcon
 
 
 class FakeClient:
@@ -46,3 +54,58 @@ def test_list_whitelisted_players_empty(monkeypatch: pytest.MonkeyPatch) -> None
     names = rcon.list_whitelisted_players(rcon.RconConfig("host", 1, "pass"))
 
     assert names == []
+
+
+class FakeRconHandler(socketserver.BaseRequestHandler):
+    password = "secret"
+
+    def handle(self) -> None:
+        (length,) = struct.unpack("<i", self.request.recv(4))
+        body = self.request.recv(length)
+        request_id, kind = struct.unpack("<ii", body[:8])
+        assert kind == rcon.SERVERDATA_AUTH
+        accepted = body[8:-2].decode() == self.password
+        # Like vanilla servers: an empty response packet first, then the verdict.
+        self.request.sendall(rcon._packet(request_id, 0, ""))
+        self.request.sendall(rcon._packet(request_id if accepted else -1, rcon.SERVERDATA_AUTH_RESPONSE, ""))
+
+
+@pytest.fixture
+def rcon_server() -> Iterator[int]:
+    server = socketserver.TCPServer(("127.0.0.1", 0), FakeRconHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_startup_probe_authenticates_from_a_worker_thread(
+    rcon_server: int, caplog: pytest.LogCaptureFixture
+) -> None:
+    config = SimpleNamespace(rcon=rcon.RconConfig("127.0.0.1", rcon_server, "secret"))
+    timings = {}
+
+    with caplog.at_level(logging.ERROR):
+        await _probe_rcon(config, timings, "rcon")
+
+    assert caplog.records == []
+    assert "rcon" in timings
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_a_rejected_password(rcon_server: int) -> None:
+    with pytest.raises(RuntimeError, match="rejected the password"):
+        await asyncio.to_thread(rcon.probe, rcon.RconConfig("127.0.0.1", rcon_server, "wrong"))
+
+
+def test_probe_reports_unreachable_server() -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with pytest.raises(RuntimeError, match=f"127.0.0.1:{port} is unreachable"):
+        rcon.probe(rcon.RconConfig("127.0.0.1", port, "pass"))
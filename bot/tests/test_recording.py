@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from aiogram.types import Update
+
+from bot.benchmarks.replay import load_records, replay
+from bot.recording import Anonymizer, UpdateRecorder
+
+ADMIN_ID = 7
+ADMIN_CHAT_ID = -500
+
+
+def _message(update_id: int, user_id: int, chat_id: int, text: str, username: str = "") -> Update:
+    sender = {"id": user_id, "is_bot": False, "first_name": "Real Name"}
+    if username:
+        sender["username"] = username
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                "from": sender,
+                "text": text,
+            },
+        }
+    )
+
+
+def _decision(update_id: int, data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": ADMIN_ID, "is_bot": False, "first_name": "Admin"},
+                "chat_instance": "x",
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": 0,
+                    "chat": {"id": ADMIN_CHAT_ID, "type": "supergroup"},
+                    "text": "New whitelist request",
+                },
+            },
+        }
+    )
+
+
+def test_anonymizer_is_stable_and_keeps_shape() -> None:
+    anonymizer = Anonymizer("salt")
+
+    assert anonymizer.number(12345) == anonymizer.number(12345)
+    assert anonymizer.number(12345) != 12345
+    assert anonymizer.number(-100123) < 0
+    assert anonymizer.text("/whois @Steve") == f"/whois @{anonymizer.word('Steve')}"
+    assert len(anonymizer.word("Notch_1234")) == len("Notch_1234")
+    assert Anonymizer("other").word("Steve") != anonymizer.word("Steve")
+
+
+@pytest.mark.asyncio
+async def test_recorded_updates_replay_clean(tmp_path) -> None:
+    path = tmp_path / "updates.jsonl"
+    recorder = UpdateRecorder(str(path), admin_ids=[ADMIN_ID], admin_chat_id=ADMIN_CHAT_ID, salt="s")
+    recorder.record(_message(1, 555, 555, "SecretName", username="alice"))
+    recorder.record(_message(2, 555, 555, "my comment"))
+    recorder.record(_decision(3, "approve:17"))
+    recorder.record(_message(4, 556, -42, "/whois 555"))
+    recorder.close()
+
+    raw = path.read_text()
+    assert "555" not in raw and "SecretName" not in raw and "alice" not in raw
+    records = load_records(path)
+    decision = dict(records[2], t=0)
+    assert decision == {
+        "t": 0,
+        "kind": "callback_query",
+        "data": "approve:17",
+        "chat_type": "supergroup",
+        "admin_chat": True,
+        "admin": True,
+    }
+    assert json.loads(raw.splitlines()[3])["text"].split()[1] == str(records[0]["user"])
+
+    result = await replay(records, speed=0)
+
+    assert result.updates == 4
+    assert result.errors == 0
+    assert result.unhandled == 0
@@ -0,0 +1,318 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import asyncpg
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from bot.db import (
+    PoolRouter,
+    apply_migrations,
+    claim_job,
+    create_job,
+    create_request,
+    expire_requests,
+    fetch_approval_latency,
+    fetch_daily_counts,
+    fetch_job,
+    fetch_player_profiles,
+    fetch_status_counts,
+    fetch_users_by_uuids,
+    fetch_usernames_page,
+    finish_job,
+    mark_request,
+    release_job,
+    set_request_uuids,
+    store_player_profiles,
+)
+from bot.middlewares.idempotency import IdempotencyMiddleware
+from bot.services.audit import AuditLog
+from bot.services.leader import LeaderLease
+
+from .fakes import FakeConn, FakePool
+from .test_handlers import build_context
+from .test_tenant import FakeTenantBot
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "schema"
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+needs_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="set TEST_DATABASE_URL to run against Postgres")
+
+
+def make_update(update_id: int, bot: Optional[Bot] = None) -> Update:
+    payload = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": 10, "type": "private"},
+            "from": {"id": 10, "is_bot": False, "first_name": "Steve"},
+            "text": "hello",
+        },
+    }
+    return Update.model_validate(payload, context={"bot": bot} if bot else {})
+
+
+@pytest.mark.asyncio
+async def test_idempotency_middleware_skips_claimed_updates() -> None:
+    context = build_context()
+    conn = FakeConn()
+    context.pool = FakePool(conn)
+    middleware = IdempotencyMiddleware()
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.update_id)
+
+    data = {"bot": FakeTenantBot(7), "context": context}
+    conn.fetchrow_result = {"update_id": 1}
+    await middleware(handler, make_update(1), data)
+    conn.fetchrow_result = None
+    await middleware(handler, make_update(1), data)
+
+    assert handled == [1]
+    assert conn.last_params == (7, 1)
+
+
+@pytest.mark.asyncio
+async def test_idempotency_middleware_prunes_old_claims() -> None:
+    context = build_context()
+    conn = FakeConn()
+    conn.fetchrow_result = {"update_id": 1}
+    context.pool = FakePool(conn)
+    middleware = IdempotencyMiddleware(max_age_seconds=60, cleanup_every=2)
+
+    async def handler(event, data):
+        return None
+
+    for update_id in (1, 2, 3):
+        await middleware(handler, make_update(update_id), {"bot": FakeTenantBot(7), "context": context})
+
+    assert [params for query, params in conn.execute_calls if "processed_updates" in query] == [(60,)]
+
+
+class FakeLeaseConn:
+    def __init__(self, granted: bool) -> None:
+        self.granted = granted
+        self.closed = False
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def fetchval(self, query: str, *params) -> bool:
+        return self.granted if "pg_try_advisory_lock" in query else 1
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def terminate(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_leader_lease_hands_work_over_when_connection_drops(monkeypatch: pytest.MonkeyPatch) -> None:
+    connections = []
+
+    async def fake_connect(dsn):
+        connections.append(FakeLeaseConn(granted=True))
+        return connections[-1]
+
+    monkeypatch.setattr("bot.services.leader.asyncpg.connect", fake_connect)
+    events = []
+
+    async def on_acquired():
+        events.append("acquired")
+
+    async def on_lost():
+        events.append("lost")
+
+    lease = LeaderLease("dsn", "expiry", on_acquired, on_lost, retry_interval=3600)
+    await lease.start()
+    assert lease.is_leader
+
+    connections[0].closed = True
+    await lease._attempt()
+    await lease.stop()
+
+    assert events == ["acquired", "lost", "acquired", "lost"]
+    assert len(connections) == 2 and connections[1].closed
+
+
+@pytest.fixture
+async def pg_schema():
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=4, server_settings={"search_path": schema})
+    async with pool.acquire() as conn:
+        await conn.execute(f'CREATE SCHEMA "{schema}"')
+    await apply_migrations(pool, MIGRATIONS_DIR)
+    try:
+        yield pool
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        await pool.close()
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_replicas_starting_together_apply_migrations_once() -> None:
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    settings = {"search_path": schema}
+    pools = [
+        await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=2, server_settings=settings)
+        for _ in range(3)
+    ]
+    async with pools[0].acquire() as conn:
+        await conn.execute(f'CREATE SCHEMA "{schema}"')
+    try:
+        await asyncio.gather(*(apply_migrations(pool, MIGRATIONS_DIR) for pool in pools))
+        async with pools[0].acquire() as conn:
+            names = [row["name"] for row in await conn.fetch("SELECT name FROM schema_migrations ORDER BY name")]
+    finally:
+        async with pools[0].acquire() as conn:
+            await conn.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        for pool in pools:
+            await pool.close()
+
+    assert names == sorted(path.name for path in MIGRATIONS_DIR.glob("*.sql"))
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_two_replicas_handle_a_redelivered_update_once(pg_schema) -> None:
+    context = build_context()
+    context.pool = pg_schema
+    bot = Bot(token="42:TEST")
+    handled = []
+
+    def replica() -> Dispatcher:
+        router = Router()
+
+        @router.message()
+        async def record(message: Message) -> None:
+            handled.append(message.message_id)
+
+        dp = Dispatcher()
+        dp.update.outer_middleware(IdempotencyMiddleware())
+        dp.include_router(router)
+        return dp
+
+    first, second = replica(), replica()
+    update = make_update(1001, bot)
+    await asyncio.gather(
+        first.feed_update(bot, update, context=context),
+        second.feed_update(bot, update, context=context),
+    )
+    await second.feed_update(bot, make_update(1002, bot), context=context)
+    await bot.session.close()
+
+    assert sorted(handled) == [1001, 1002]
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_only_one_replica_holds_the_lease() -> None:
+    name = f"test-{uuid.uuid4().hex}"
+    leaders = []
+
+    def lease(label: str) -> LeaderLease:
+        async def on_acquired():
+            leaders.append(label)
+
+        async def on_lost():
+            leaders.remove(label)
+
+        return LeaderLease(TEST_DATABASE_URL, name, on_acquired, on_lost, retry_interval=3600)
+
+    first, second = lease("first"), lease("second")
+    await first.start()
+    await second.start()
+    assert leaders == ["first"]
+
+    await first.stop()
+    await second._attempt()
+    assert leaders == ["second"]
+    await second.stop()
+    assert leaders == []
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_pool_router_reads_back_writes(pg_schema) -> None:
+    # The same instance stands in for the replica; it reports no lag.
+    router = PoolRouter(pg_schema, pg_schema, max_lag=5.0)
+    await router.check()
+    assert router.lag == 0
+
+    request_id, _ = await create_request(router, 10, 10, "Steve", None)
+    await mark_request(router, request_id, "approved", 1)
+    records = await fetch_usernames_page(router, 10, 10)
+
+    assert [(record["username"], record["status"]) for record in records] == [("Steve", "approved")]
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_stats_aggregates_follow_status_changes(pg_schema) -> None:
+    approved, _ = await create_request(pg_schema, 10, 10, "Steve", None)
+    denied, _ = await create_request(pg_schema, 11, 11, "Alex", None)
+    expired, _ = await create_request(pg_schema, 12, 12, "Herobrine", None)
+    await mark_request(pg_schema, approved, "approved", 1)
+    await mark_request(pg_schema, denied, "denied", 1)
+    await expire_requests(pg_schema, [expired])
+    await apply_migrations(pg_schema, MIGRATIONS_DIR)
+
+    assert await fetch_status_counts(pg_schema) == {"pending": 0, "approved": 1, "denied": 1, "expired": 1}
+    assert await fetch_daily_counts(pg_schema, 1) == {"created": 3, "approved": 1, "denied": 1, "expired": 1}
+    latency = await fetch_approval_latency(pg_schema)
+    assert [(record["decided_by"], record["bucket"], record["count"]) for record in latency] == [(1, 0, 1)]
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_audit_log_copies_events_into_postgres(pg_schema) -> None:
+    audit = AuditLog()
+    audit.start(pg_schema)
+    audit.record("default", "approve", "decision", actor_id=1, username="Steve", user_id=10, request_id=1)
+    audit.record("default", "revoke_secondary", "sync", username="Alt", user_id=10, outcome="rcon_failed", detail="x")
+    await audit.stop()
+
+    async with pg_schema.acquire() as conn:
+        rows = await conn.fetch("SELECT action, username, outcome FROM audit_events ORDER BY id")
+    assert [tuple(row) for row in rows] == [("approve", "Steve", "ok"), ("revoke_secondary", "Alt", "rcon_failed")]
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_player_profiles_forget_names_a_player_left_behind(pg_schema) -> None:
+    steve = uuid.UUID("8667ba71-b85a-4004-af54-457a9734eed7")
+    await store_player_profiles(pg_schema, ["steve", "ghost"], [steve, None], ["Steve", None])
+    await store_player_profiles(pg_schema, ["newname"], [steve], ["NewName"])
+    request_id, _ = await create_request(pg_schema, 10, 10, "Steve", None)
+    await mark_request(pg_schema, request_id, "approved", 1)
+    await set_request_uuids(pg_schema, [request_id], [steve])
+
+    records = await fetch_player_profiles(pg_schema, ["steve", "ghost", "newname"], 3600)
+    assert sorted((record["name_key"], record["uuid"]) for record in records) == [("ghost", None), ("newname", steve)]
+    assert await fetch_users_by_uuids(pg_schema, [steve]) == {steve: 10}
+
+
+@needs_postgres
+@pytest.mark.asyncio
+async def test_only_the_latest_claim_finishes_a_job(pg_schema) -> None:
+    job_id = await create_job(pg_schema, "sync", {}, None, None)
+    first = await claim_job(pg_schema, ["default"], 60)
+    # A zero staleness window lets the second worker take over the running job.
+    second = await claim_job(pg_schema, ["default"], 0)
+    assert (first["attempts"], second["attempts"]) == (1, 2)
+
+    assert not await finish_job(pg_schema, job_id, 1, "done")
+    await release_job(pg_schema, job_id, 2)
+    assert await finish_job(pg_schema, job_id, 1, "done", result={"removed": 0})
+
+    job = await fetch_job(pg_schema, job_id)
+    assert (job["status"], job["attempts"]) == ("done", 1)
@@ -0,0 +1,175 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from bot.services.approved import ApprovedIndex
+from bot.services.whois_cache import WhoisCache
+
+from .fakes import FakeConn, FakePool
+
+
+def test_index_case_insensitive_lookup() -> None:
+    index = ApprovedIndex()
+    index.add(1, 10, "Steve")
+
+    assert index.user_for("steve") == 10
+    assert index.contains("STEVE")
+    assert index.usernames_for(10) == ["Steve"]
+
+
+def test_index_remove_falls_back_to_other_owner() -> None:
+    index = ApprovedIndex()
+    index.add(1, 1, "Steve")
+    index.add(2, 2, "steve")
+    assert index.user_for("Steve") == 2
+
+    index.remove(2)
+
+    assert index.user_for("Steve") == 1
+    assert index.usernames_for(2) == []
+
+
+def test_index_keeps_name_while_another_row_approves_it() -> None:
+    index = ApprovedIndex()
+    index.add(1, 10, "Steve")
+    index.add(2, 10, "Steve")
+    # The same row reported twice (local update, then NOTIFY) still counts once.
+    index.add(2, 10, "Steve")
+
+    index.remove(2)
+    assert index.user_for("steve") == 10
+    assert index.usernames_for(10) == ["Steve"]
+
+    index.remove(1)
+    assert not index.contains("steve")
+    assert index.usernames_for(10) == []
+
+
+@pytest.mark.asyncio
+async def test_index_load_prefers_latest_decision() -> None:
+    conn = FakeConn()
+    conn.fetch_result = [
+        {"id": 2, "user_id": 2, "username": "Steve", "decided_at": datetime(2024, 2, 1, tzinfo=timezone.utc),
+         "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+        {"id": 1, "user_id": 1, "username": "Steve", "decided_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+         "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+    ]
+    index = ApprovedIndex()
+
+    await index.load(FakePool(conn))
+
+    assert index.loaded
+    assert index.user_for("steve") == 2
+
+
+def test_index_applies_notifications() -> None:
+    index = ApprovedIndex()
+    approve = {"op": "UPDATE", "old": {"id": 1, "user_id": 5, "username": "Alex", "status": "pending"},
+               "new": {"id": 1, "user_id": 5, "username": "Alex", "status": "approved"}}
+    delete = {"op": "DELETE", "old": {"id": 1, "user_id": 5, "username": "Alex", "status": "approved"}, "new": None}
+
+    index._on_notify(None, 1, "whitelist_requests_changed", json.dumps(approve))
+    assert index.user_for("alex") == 5
+
+    index._on_notify(None, 1, "whitelist_requests_changed", json.dumps(delete))
+    assert index.user_for("alex") is None
+
+
+def test_listener_feeds_each_tenant_its_own_rows() -> None:
+    alpha = ApprovedIndex("alpha")
+    beta = ApprovedIndex("beta")
+    alpha._subscribers = [alpha, beta]
+    change = {"op": "INSERT", "old": None,
+              "new": {"id": 1, "user_id": 5, "username": "Alex", "status": "approved", "tenant": "beta"}}
+
+    alpha._on_notify(None, 1, "whitelist_requests_changed", json.dumps(change))
+
+    assert alpha.user_for("alex") is None
+    assert beta.user_for("alex") == 5
+
+
+@pytest.mark.asyncio
+async def test_index_load_keeps_changes_made_during_the_fetch(monkeypatch) -> None:
+    index = ApprovedIndex()
+    approve = {"op": "UPDATE", "old": {"id": 2, "user_id": 6, "username": "Alex", "status": "pending"},
+               "new": {"id": 2, "user_id": 6, "username": "Alex", "status": "approved"}}
+
+    async def fetch_approved_requests(pool, tenant):
+        # Decided after the snapshot was taken, but notified before it is applied.
+        index._on_notify(None, 1, "whitelist_requests_changed", json.dumps(approve))
+        return [{"id": 1, "user_id": 5, "username": "Steve", "decided_at": None,
+                 "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+
+    monkeypatch.setattr("bot.services.approved.fetch_approved_requests", fetch_approved_requests)
+
+    await index.load(FakePool(FakeConn()))
+
+    assert index.user_for("steve") == 5
+    assert index.user_for("alex") == 6
+
+
+class FakeListener:
+    def __init__(self) -> None:
+        self.termination_listeners = []
+
+    def add_termination_listener(self, callback) -> None:
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_index_reconnects_after_listener_drops(monkeypatch) -> None:
+    connects = []
+
+    async def connect(dsn):
+        if not connects:
+            connects.append(dsn)
+            raise OSError("connection refused")
+        listener = FakeListener()
+        connects.append(listener)
+        return listener
+
+    monkeypatch.setattr("bot.services.approved.asyncpg.connect", connect)
+    alpha = ApprovedIndex("alpha", retry_interval=0.01)
+    beta = ApprovedIndex("beta")
+    alpha._subscribers = [alpha, beta]
+    alpha._dsn = "postgresql://db"
+    for index in (alpha, beta):
+        await index.load(FakePool(FakeConn()))
+    alpha._listener = dropped = FakeListener()
+
+    alpha._on_terminated(dropped)
+    assert not alpha.loaded and not beta.loaded
+
+    await asyncio.wait_for(alpha._reconnect_task, timeout=1)
+
+    assert alpha.loaded and beta.loaded
+    assert alpha._listener is connects[-1]
+    assert alpha._subscribers == [alpha, beta]
+    await alpha.close()
+
+
+def test_index_drops_cached_whois_replies_for_any_change() -> None:
+    index = ApprovedIndex("alpha")
+    index.whois_cache = WhoisCache()
+    index.whois_cache.put(("user", 5), "pending", owner=5)
+    index.whois_cache.put(("mc", "alex"), "pending", owner=5)
+    index.whois_cache.put(("user", 6), "other tenant", owner=6)
+    deny = {"op": "UPDATE", "old": {"id": 1, "user_id": 5, "username": "Alex", "status": "pending", "tenant": "alpha"},
+            "new": {"id": 1, "user_id": 5, "username": "Alex", "status": "denied", "tenant": "alpha"}}
+    elsewhere = {"op": "INSERT", "old": None,
+                 "new": {"id": 2, "user_id": 6, "username": "Bob", "status": "pending", "tenant": "beta"}}
+
+    index._on_notify(None, 1, "whitelist_requests_changed", json.dumps(deny))
+    index._on_notify(None, 1, "whitelist_requests_changed", json.dumps(elsewhere))
+
+    assert index.whois_cache.get(("user", 5)) is None
+    assert index.whois_cache.get(("mc", "alex")) is None
+    assert index.whois_cache.get(("user", 6)) == "other tenant"
@@ -0,0 +1,56 @@
+import pytest
+
+from bot.db import AUDIT_COLUMNS
+from bot.services.audit import AuditLog
+
+from .fakes import FakeConn, FakePool
+
+
+class FailingConn(FakeConn):
+    async def copy_records_to_table(self, table, records, columns=None):
+        raise ConnectionError("database went away")
+
+
+@pytest.mark.asyncio
+async def test_audit_log_copies_buffered_events_in_one_batch() -> None:
+    conn = FakeConn()
+    audit = AuditLog()
+    audit._pool = FakePool(conn)
+    audit.record("default", "approve", "decision", actor_id=1, username="Steve", user_id=5, request_id=3)
+    audit.record("default", "expire", "expiry", username="Alex", user_id=6, request_id=4)
+
+    await audit.flush()
+
+    [(table, records, columns)] = conn.copied
+    assert table == "audit_events" and columns == AUDIT_COLUMNS
+    assert [dict(zip(columns, record))["action"] for record in records] == ["approve", "expire"]
+    assert dict(zip(columns, records[0]))["outcome"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_audit_log_keeps_events_when_a_flush_fails() -> None:
+    audit = AuditLog(max_pending=2)
+    audit._pool = FakePool(FailingConn())
+    for name in ("First", "Second", "Third"):
+        audit.record("default", "remove_unknown", "sync", username=name)
+
+    await audit.flush()
+
+    assert [event.username for event in audit._pending] == ["Second", "Third"]
+    assert audit.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_audit_log_stop_waits_for_batch_flushes() -> None:
+    conn = FakeConn()
+    audit = AuditLog(batch_size=2)
+    audit._pool = FakePool(conn)
+    audit.record("default", "add", "add", username="Steve")
+    audit.record("default", "add", "add", username="Alex")
+    assert len(audit._batch_flushes) == 1
+
+    await audit.stop()
+
+    assert not audit._batch_flushes
+    [(_, records, _)] = conn.copied
+    assert len(records) == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from bot.services.directory import UsernameDirectory
+
+from .fakes import FakeConn, FakePool
+
+
+@pytest.mark.asyncio
+async def test_directory_resolves_observed_names_from_cache() -> None:
+    directory = UsernameDirectory()
+    directory.observe("SomeUser", 42)
+
+    assert await directory.resolve("someuser") == 42
+
+
+@pytest.mark.asyncio
+async def test_directory_lru_evicts_oldest() -> None:
+    directory = UsernameDirectory(cache_size=2)
+    directory.observe("first_user", 1)
+    directory.observe("second_user", 2)
+    directory.observe("third_user", 3)
+
+    assert await directory.resolve("first_user") is None
+    assert await directory.resolve("third_user") == 3
+
+
+@pytest.mark.asyncio
+async def test_directory_batches_writes_and_reads_through() -> None:
+    conn = FakeConn()
+    conn.fetchrow_result = {"user_id": 77}
+    directory = UsernameDirectory()
+    directory._pool = FakePool(conn)
+    directory.observe("Writer", 5)
+    directory.observe("Writer", 5)
+
+    await directory.flush()
+
+    assert len(conn.execute_calls) == 1
+    _, params = conn.execute_calls[0]
+    assert params == (["writer"], [5])
+    assert await directory.resolve("reader") == 77
+
+
+@pytest.mark.asyncio
+async def test_directory_stop_waits_for_batch_flushes() -> None:
+    conn = FakeConn()
+    directory = UsernameDirectory(batch_size=2)
+    directory._pool = FakePool(conn)
+    directory.observe("first_user", 1)
+    directory.observe("second_user", 2)
+    assert len(directory._batch_flushes) == 1
+
+    await directory.stop()
+
+    assert not directory._batch_flushes
+    assert [params for _, params in conn.execute_calls] == [(["first_user", "second_user"], [1, 2])]
+
+
+def test_directory_negative_cache_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr("bot.services.directory.time.monotonic", lambda: now[0])
+    directory = UsernameDirectory(miss_ttl=10)
+
+    directory.remember_miss("Ghost")
+    assert directory.is_known_miss("ghost")
+
+    now[0] += 11
+    assert not directory.is_known_miss("ghost")
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from bot.services.expiry import ExpiryScheduler
+from bot.services.whois_cache import WhoisCache
+
+from .fakes import FakeBot, FakeConn, FakePool
+from .test_handlers import build_context
+
+
+def build_scheduler(conn: FakeConn, ttl_hours: float = 1) -> ExpiryScheduler:
+    context = build_context()
+    context.config.pending_ttl_hours = ttl_hours
+    return ExpiryScheduler(FakeBot(), FakePool(conn), context.config, batch_size=2, send_interval=0)
+
+
+def test_scheduler_pops_due_requests_in_deadline_order() -> None:
+    scheduler = build_scheduler(FakeConn())
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    scheduler.schedule(3, base.replace(minute=30))
+    scheduler.schedule(1, base)
+    scheduler.schedule(2, base.replace(minute=10))
+    scheduler.schedule(1, base)
+
+    now = base.timestamp() + 3600 + 20 * 60
+
+    assert scheduler.pop_due(now) == [1, 2]
+    assert scheduler.pop_due(now) == []
+    assert len(scheduler) == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_reload_uses_pending_rows() -> None:
+    conn = FakeConn()
+    conn.fetch_result = [{"id": 5, "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+    scheduler = build_scheduler(conn)
+
+    await scheduler.reload()
+
+    assert len(scheduler) == 1
+    assert "status = 'pending'" in conn.last_query
+
+
+@pytest.mark.asyncio
+async def test_scheduler_expire_notifies_and_strips_keyboards() -> None:
+    conn = FakeConn()
+    conn.fetch_result = [
+        {"id": 5, "user_id": 50, "chat_id": 50, "username": "Steve", "admin_message_id": 777},
+        {"id": 6, "user_id": 60, "chat_id": 60, "username": "Alex", "admin_message_id": None},
+    ]
+    scheduler = build_scheduler(conn)
+
+    await scheduler.expire([5, 6])
+
+    assert conn.last_params == ([5, 6],)
+    assert [sent["chat_id"] for sent in scheduler.bot.sent] == [50, 60]
+    assert scheduler.bot.edited_markups == [{"chat_id": 999, "message_id": 777, "reply_markup": None}]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_expire_drops_cached_whois_replies() -> None:
+    conn = FakeConn()
+    conn.fetch_result = [{"id": 5, "user_id": 50, "chat_id": 50, "username": "Steve", "admin_message_id": None}]
+    scheduler = build_scheduler(conn)
+    scheduler.whois_cache = WhoisCache()
+    scheduler.whois_cache.put(("user", 50), "pending", owner=50)
+    scheduler.whois_cache.put(("mc", "steve"), "pending", owner=50)
+
+    await scheduler.expire([5])
+
+    assert scheduler.whois_cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stop_finishes_the_running_batch() -> None:
+    conn = FakeConn()
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    conn.fetch_result = [
+        {"id": 5, "created_at": created, "user_id": 50, "chat_id": 50, "username": "Steve", "admin_message_id": None},
+        {"id": 6, "created_at": created, "user_id": 60, "chat_id": 60, "username": "Alex", "admin_message_id": None},
+    ]
+    scheduler = build_scheduler(conn)
+    scheduler.send_interval = 0.05
+
+    await scheduler.start()
+    await asyncio.sleep(0.01)
+    await scheduler.stop(timeout=1)
+
+    assert [sent["chat_id"] for sent in scheduler.bot.sent] == [50, 60]
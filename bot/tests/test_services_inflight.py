@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from bot.services.inflight import InFlightTracker
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_returns_once_tracked_work_finishes() -> None:
+    tracker = InFlightTracker()
+
+    async def work() -> None:
+        with tracker.track():
+            await asyncio.sleep(0.05)
+
+    task = asyncio.create_task(work())
+    await asyncio.sleep(0)
+
+    assert tracker.count == 1
+    assert await tracker.wait_idle(1) is True
+    assert tracker.count == 0
+    await task
+
+
+@pytest.mark.asyncio
+async def test_wait_idle_gives_up_at_the_deadline() -> None:
+    tracker = InFlightTracker()
+    release = asyncio.Event()
+
+    async def stuck() -> None:
+        with tracker.track():
+            await release.wait()
+
+    task = asyncio.create_task(stuck())
+    await asyncio.sleep(0)
+
+    assert await tracker.wait_idle(0.01) is False
+    release.set()
+    await task
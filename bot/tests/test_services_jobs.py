@@ -0,0 +1,101 @@
+import pytest
+
+from bot.services import jobs as jobs_service
+from bot.services import whitelist as whitelist_service
+from bot.services.jobs import Job, JobRun, JobRunner
+
+from .fakes import FakeConn, FakePool
+from .test_handlers import build_context
+
+
+@pytest.mark.asyncio
+async def test_sync_job_resumes_from_checkpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    conn = FakeConn()
+    conn.fetchval_result = True
+    context.pool = FakePool(conn)
+
+    async def fake_sync(ctx, on_removed=None, actor_id=None):
+        await on_removed("Ghost")
+        return ["Ghost"]
+
+    monkeypatch.setattr(whitelist_service, "sync_whitelist", fake_sync)
+    job = Job(id=3, tenant="default", kind="sync", progress={"removed": ["Alt"]}, attempts=2, chat_id=55)
+
+    result = await whitelist_service.run_sync_job(context, JobRun(context.pool, job))
+
+    assert result == {"removed": 2}
+    saved = [params for query, params in conn.execute_calls if "SET progress" in query]
+    assert saved[-1] == (3, 2, '{"removed": ["Alt", "Ghost"]}')
+    assert [sent["text"] for sent in context.bot.sent] == [
+        context.config.locale.t("whitelist_cleanup_done", count=2),
+        context.config.locale.t("whitelist_cleanup_list", usernames="Alt, Ghost"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_runner_marks_failed_jobs_and_tells_the_admin(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    conn = FakeConn()
+    conn.fetchval_result = 4
+    context.pool = FakePool(conn)
+
+    async def broken(ctx, run):
+        raise RuntimeError("RCON is down")
+
+    monkeypatch.setitem(jobs_service.JOB_KINDS, "broken", broken)
+    runner = JobRunner(context.pool, {"default": context})
+
+    await runner._run(Job(id=4, tenant="default", kind="broken", chat_id=55))
+
+    assert conn.last_params == (4, 1, "failed", None, "RCON is down")
+    assert context.bot.sent[0]["chat_id"] == 55
+    assert "RCON is down" in context.bot.sent[0]["text"]
+
+
+@pytest.mark.asyncio
+async def test_runner_gives_up_after_max_attempts() -> None:
+    context = build_context()
+    conn = FakeConn()
+    conn.fetchval_result = 5
+    context.pool = FakePool(conn)
+    runner = JobRunner(context.pool, {"default": context}, max_attempts=3)
+
+    await runner._run(Job(id=5, tenant="default", kind="sync", attempts=4))
+
+    assert conn.last_params == (5, 4, "failed", None, "gave up after 3 attempts")
+    assert context.bot.sent == []
+
+
+@pytest.mark.asyncio
+async def test_sync_job_hands_the_claim_back_while_another_run_holds_the_lock() -> None:
+    context = build_context()
+    conn = FakeConn()
+    conn.fetchval_result = False
+    context.pool = FakePool(conn)
+    runner = JobRunner(context.pool, {"default": context})
+
+    await runner._run(Job(id=6, tenant="default", kind="sync", attempts=2, chat_id=55))
+
+    [(query, params)] = conn.execute_calls
+    assert "attempts = attempts - 1" in query and params == (6, 2)
+    assert context.bot.sent == []
+
+
+@pytest.mark.asyncio
+async def test_runner_keeps_quiet_when_the_job_was_claimed_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    conn = FakeConn()
+    context.pool = FakePool(conn)
+
+    async def broken(ctx, run):
+        raise RuntimeError("RCON is down")
+
+    monkeypatch.setitem(jobs_service.JOB_KINDS, "broken", broken)
+    runner = JobRunner(context.pool, {"default": context})
+
+    # finish_job matches no row: a later claim owns the job now.
+    await runner._run(Job(id=7, tenant="default", kind="broken", attempts=1, chat_id=55))
+
+    assert conn.last_params == (7, 1, "failed", None, "RCON is down")
+    assert context.bot.sent == []
@@ -0,0 +1,55 @@
+import pytest
+
+from bot.services.requests import finalize_request
+
+from .fakes import FakeChat, FakeFSMContext, FakeMessage, FakeUser
+from .test_handlers import build_context
+
+
+def build_state() -> FakeFSMContext:
+    state = FakeFSMContext()
+    state.data.update(username="Steve", user_id=5, chat_id=5, full_name="Steve", mention="Steve")
+    return state
+
+
+@pytest.mark.asyncio
+async def test_finalize_request_notifies_admins(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    message = FakeMessage(chat=FakeChat(5), from_user=FakeUser(5))
+    state = build_state()
+
+    stored = {}
+
+    async def fake_create(pool, user_id, chat_id, username, comment, tenant):
+        return 11, True
+
+    async def fake_set_admin_message_id(pool, request_id, message_id):
+        stored[request_id] = message_id
+
+    monkeypatch.setattr("bot.services.requests.create_request", fake_create)
+    monkeypatch.setattr("bot.services.requests.set_admin_message_id", fake_set_admin_message_id)
+
+    await finalize_request(message, state, "hi", context)
+
+    assert message.answers == [context.config.locale.t("request_sent", request_id=11)]
+    assert context.bot.sent[0]["chat_id"] == context.config.admin_chat_id
+    assert stored == {11: 1}
+    assert state.cleared
+
+
+@pytest.mark.asyncio
+async def test_finalize_request_reports_existing_pending(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context()
+    message = FakeMessage(chat=FakeChat(5), from_user=FakeUser(5))
+    state = build_state()
+
+    async def fake_create(pool, user_id, chat_id, username, comment, tenant):
+        return 7, False
+
+    monkeypatch.setattr("bot.services.requests.create_request", fake_create)
+
+    await finalize_request(message, state, None, context)
+
+    assert message.answers == [context.config.locale.t("request_already_pending", request_id=7)]
+    assert context.bot.sent == []
+    assert state.cleared
@@ -0,0 +1,56 @@
+import pytest
+
+from bot.handlers.stats import handle_stats
+from bot.services.stats import LATENCY_BUCKETS, format_duration, group_latency
+
+from .fakes import FakeChat, FakeMessage, FakeUser
+from .test_handlers import build_context
+
+
+def test_group_latency_finds_the_median_bucket() -> None:
+    admins = group_latency(
+        [
+            {"decided_by": 1, "bucket": 0, "count": 1, "total_seconds": 60.0},
+            {"decided_by": 1, "bucket": 2, "count": 3, "total_seconds": 9000.0},
+            {"decided_by": 2, "bucket": 6, "count": 1, "total_seconds": 400000.0},
+        ]
+    )
+
+    assert [admin.admin_id for admin in admins] == [1, 2]
+    assert admins[0].approvals == 4
+    assert admins[0].median_bound() == 3600
+    assert admins[0].average_seconds == pytest.approx(2265.0)
+    assert admins[1].median_bound() is None
+
+
+def test_format_duration() -> None:
+    assert format_duration(30) == "1 min"
+    assert format_duration(LATENCY_BUCKETS[1]) == "30 min"
+    assert format_duration(5400) == "1.5 h"
+    assert format_duration(LATENCY_BUCKETS[-1]) == "3.0 d"
+
+
+@pytest.mark.asyncio
+async def test_stats_reply(monkeypatch: pytest.MonkeyPatch) -> None:
+    context = build_context(admin_ids=[1])
+    message = FakeMessage(chat=FakeChat(1), from_user=FakeUser(1), text="/stats")
+
+    async def fake_totals(pool, tenant):
+        return {"pending": 2, "approved": 10}
+
+    async def fake_recent(pool, days, tenant):
+        return {"created": 5, "approved": 3}
+
+    async def fake_latency(pool, tenant):
+        return [{"decided_by": 1, "bucket": 1, "count": 3, "total_seconds": 1800.0}]
+
+    monkeypatch.setattr("bot.handlers.stats.fetch_status_counts", fake_totals)
+    monkeypatch.setattr("bot.handlers.stats.fetch_daily_counts", fake_recent)
+    monkeypatch.setattr("bot.handlers.stats.fetch_approval_latency", fake_latency)
+
+    await handle_stats(message, context)
+
+    reply = message.replies[0]
+    assert "2 pending, 10 approved, 0 denied, 0 expired" in reply
+    assert "Last 7 days: 5 new, 3 approved" in reply
+    assert "3 approvals, median ≤ 30 min, average 10 min" in reply
@@ -0,0 +1,81 @@
+from uuid import UUID
+
+import pytest
+from aiohttp import web
+
+from bot.services.uuids import MojangResolver, Profile, UuidCache
+
+from .fakes import FakeConn, FakePool, FakeResolver
+
+STEVE = "8667ba71-b85a-4004-af54-457a9734eed7"
+ALEX = "ec561538-f3fd-461d-aff5-086b22154bce"
+
+
+@pytest.mark.asyncio
+async def test_uuid_cache_looks_up_misses_in_batches(monkeypatch: pytest.MonkeyPatch) -> None:
+    stored = []
+
+    async def fake_fetch(pool, name_keys, max_age_seconds):
+        return [{"name_key": "steve", "uuid": UUID(STEVE), "name": "Steve"}]
+
+    async def fake_store(pool, name_keys, uuids, names):
+        stored.append((name_keys, uuids, names))
+
+    monkeypatch.setattr("bot.services.uuids.fetch_player_profiles", fake_fetch)
+    monkeypatch.setattr("bot.services.uuids.store_player_profiles", fake_store)
+    resolver = FakeResolver({"Alex": ALEX}, batch_size=2)
+    cache = UuidCache(FakePool(FakeConn()), resolver)
+
+    profiles = await cache.resolve(["Steve", "alex", "Ghost", "Nobody", "ALEX"])
+
+    assert resolver.calls == [["alex", "ghost"], ["nobody"]]
+    assert profiles == {
+        "steve": Profile(UUID(STEVE), "Steve"),
+        "alex": Profile(UUID(ALEX), "Alex"),
+        "ghost": None,
+        "nobody": None,
+    }
+    assert stored == [(["alex", "ghost", "nobody"], [UUID(ALEX), None, None], ["Alex", None, None])]
+
+
+@pytest.mark.asyncio
+async def test_uuid_cache_leaves_out_names_it_could_not_look_up(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fake_fetch(pool, name_keys, max_age_seconds):
+        return []
+
+    class DownResolver(FakeResolver):
+        async def lookup(self, names):
+            raise ConnectionError("rate limited")
+
+    monkeypatch.setattr("bot.services.uuids.fetch_player_profiles", fake_fetch)
+    conn = FakeConn()
+    cache = UuidCache(FakePool(conn), DownResolver({}))
+
+    assert await cache.resolve(["Steve"]) == {}
+    assert conn.execute_calls == []
+
+
+@pytest.mark.asyncio
+async def test_mojang_resolver_posts_names_and_parses_profiles() -> None:
+    received = []
+
+    async def profiles(request: web.Request) -> web.Response:
+        received.append(await request.json())
+        return web.json_response([{"id": STEVE.replace("-", ""), "name": "Steve"}])
+
+    app = web.Application()
+    app.router.add_post("/profiles/minecraft", profiles)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    resolver = MojangResolver(f"http://127.0.0.1:{port}/profiles/minecraft")
+    try:
+        found = await resolver.lookup(["steve", "ghost"])
+    finally:
+        await resolver.close()
+        await runner.cleanup()
+
+    assert received == [["steve", "ghost"]]
+    assert found == {"steve": Profile(UUID(STEVE), "Steve")}
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from uuid import UUID
+
+import pytest
+
+from bot.services.watcher import WhitelistFileWatcher, _open_inotify
+
+STEVE = "8667ba71-b85a-4004-af54-457a9734eed7"
+ALEX = "ec561538-f3fd-461d-aff5-086b22154bce"
+
+
+def write_whitelist(path: Path, entries: dict) -> None:
+    path.write_text(json.dumps([{"uuid": uuid, "name": name} for name, uuid in entries.items()]), encoding="utf-8")
+    # Keep the change visible even where mtime has coarse resolution.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.mark.asyncio
+async def test_watcher_reports_only_what_changed(tmp_path: Path) -> None:
+    path = tmp_path / "whitelist.json"
+    write_whitelist(path, {"Steve": STEVE})
+    changes = []
+
+    async def on_change(added, removed):
+        changes.append((added, removed))
+
+    watcher = WhitelistFileWatcher(path, on_change, use_inotify=False, poll_interval=3600)
+    await watcher.start()
+    try:
+        assert not await watcher.check()
+        write_whitelist(path, {"Alex": ALEX})
+        assert await watcher.check()
+        assert not await watcher.check()
+    finally:
+        await watcher.stop()
+
+    assert changes == [([("Alex", UUID(ALEX))], ["Steve"])]
+
+
+@pytest.mark.asyncio
+async def test_watcher_retries_a_half_written_file(tmp_path: Path) -> None:
+    path = tmp_path / "whitelist.json"
+    write_whitelist(path, {})
+    changes = []
+
+    async def on_change(added, removed):
+        changes.append((added, removed))
+
+    watcher = WhitelistFileWatcher(path, on_change, use_inotify=False, poll_interval=3600)
+    await watcher.start()
+    try:
+        path.write_text('[{"uuid": "', encoding="utf-8")
+        assert not await watcher.check()
+        write_whitelist(path, {"Steve": STEVE})
+        assert await watcher.check()
+    finally:
+        await watcher.stop()
+
+    assert changes == [([("Steve", UUID(STEVE))], [])]
+
+
+@pytest.mark.asyncio
+async def test_watcher_wakes_up_on_inotify_events(tmp_path: Path) -> None:
+    probe = _open_inotify(tmp_path)
+    if probe is None:
+        pytest.skip("inotify is not available here")
+    probe.close()
+    path = tmp_path / "whitelist.json"
+    write_whitelist(path, {})
+    changed = asyncio.Event()
+    changes = []
+
+    async def on_change(added, removed):
+        changes.append((added, removed))
+        changed.set()
+
+    watcher = WhitelistFileWatcher(path, on_change, rescan_interval=3600, settle=0)
+    await watcher.start()
+    try:
+        (tmp_path / "server.log").write_text("noise", encoding="utf-8")
+        write_whitelist(path, {"Steve": STEVE})
+        await asyncio.wait_for(changed.wait(), timeout=5)
+    finally:
+        await watcher.stop()
+
+    assert changes == [([("Steve", UUID(STEVE))], [])]
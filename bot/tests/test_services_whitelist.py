@@ -1,13 +1,15 @@
 from pathlib import Path
+from uuid import UUID
 
 import pytest
 
 from bot.config import AppConfig, RconConfig
 from bot.context import AppContext
 from bot.services import whitelist as whitelist_service
+from bot.services.uuids import UuidCache
 from bot.texts import Locale
 
-from .fakes import FakeBot, FakePool
+from .fakes import FakeBot, FakeConn, FakePool, FakeResolver
 
 
 @pytest.mark.asyncio
@@ -18,7 +20,7 @@ async def test_cleanup_secondary_accounts_keeps_primary(monkeypatch: pytest.Monk
     ]
     removed: list[str] = []
 
-    async def fake_fetch(pool, user_id):
+    async def fake_fetch(pool, user_id, tenant):
         return records
 
     async def fake_delete(pool, request_id):
@@ -52,16 +54,18 @@ async def test_cleanup_secondary_accounts_keeps_primary(monkeypatch: pytest.Monk
     )
 
     assert removed_usernames == ["Alt"]
-    assert "Alt" in removed
-    assert 2 in removed
+    # The row is deleted before RCON drops the name, so the file watcher never sees it as hand-removed.
+    assert removed == [2, "Alt"]
+    [event] = context.audit._pending
+    assert (event.action, event.source, event.username, event.request_id) == ("revoke_secondary", "approval", "Alt", 2)
 
 
 @pytest.mark.asyncio
 async def test_sync_whitelist_removes_non_db(monkeypatch: pytest.MonkeyPatch) -> None:
-    async def fake_cleanup(context):
+    async def fake_cleanup(context, on_removed=None, actor_id=None):
         return ["Alt"]
 
-    async def fake_fetch_usernames(pool):
+    async def fake_fetch_usernames(pool, tenant):
         return ["Primary"]
 
     def fake_list(config):
@@ -95,3 +99,149 @@ async def test_sync_whitelist_removes_non_db(monkeypatch: pytest.MonkeyPatch) ->
 
     assert removed_usernames == ["Alt", "Ghost"]
     assert removed == ["Ghost"]
+
+
+@pytest.mark.asyncio
+async def test_sync_whitelist_matches_by_uuid_and_follows_renames(monkeypatch: pytest.MonkeyPatch) -> None:
+    steve, alex, griefer = (
+        "8667ba71-b85a-4004-af54-457a9734eed7",
+        "ec561538-f3fd-461d-aff5-086b22154bce",
+        "0f4a1c3e-5a84-4a35-8d6b-2c9a6cf4e0a1",
+    )
+    approved = [
+        {"id": 1, "user_id": 10, "username": "OldName", "uuid": UUID(steve)},
+        {"id": 2, "user_id": 11, "username": "Alex", "uuid": None},
+    ]
+    assigned, renamed, removed = [], [], []
+
+    async def fake_cleanup(context, on_removed=None, actor_id=None):
+        return []
+
+    async def fake_fetch_usernames(pool, tenant):
+        return [record["username"] for record in approved]
+
+    async def fake_fetch_approved(pool, tenant):
+        return approved
+
+    async def fake_set_uuids(pool, request_ids, uuids):
+        assigned.append((request_ids, uuids))
+
+    async def fake_rename(pool, request_id, username):
+        renamed.append((request_id, username))
+
+    monkeypatch.setattr(whitelist_service, "cleanup_secondary_accounts", fake_cleanup)
+    monkeypatch.setattr(whitelist_service, "fetch_approved_usernames", fake_fetch_usernames)
+    monkeypatch.setattr(whitelist_service, "fetch_approved_requests", fake_fetch_approved)
+    monkeypatch.setattr(whitelist_service, "set_request_uuids", fake_set_uuids)
+    monkeypatch.setattr(whitelist_service, "rename_request", fake_rename)
+    monkeypatch.setattr(whitelist_service, "list_whitelisted_players", lambda config: ["NewName", "Alex", "Griefer"])
+    monkeypatch.setattr(whitelist_service, "remove_whitelist_player", lambda config, name: removed.append(name))
+
+    context = AppContext(
+        bot=FakeBot(),
+        pool=FakePool(None),
+        config=AppConfig(
+            bot_token="token",
+            admin_chat_id=1,
+            admin_ids=[1],
+            migrations_dir=Path("."),
+            rcon=RconConfig("host", 1, "pass"),
+            db_dsn="dsn",
+            locale=Locale("en"),
+        ),
+    )
+    resolver = FakeResolver({"NewName": steve, "Alex": alex, "Griefer": griefer})
+    context.uuids = UuidCache(FakePool(FakeConn()), resolver)
+
+    assert await whitelist_service.sync_whitelist(context) == ["Griefer"]
+    assert removed == ["Griefer"]
+    assert renamed == [(1, "NewName")]
+    # Alex predates UUIDs: kept by name, and his stored name is never turned into a UUID.
+    assert assigned == []
+    assert len(resolver.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_assign_uuids_resolves_the_approved_name_afresh(monkeypatch: pytest.MonkeyPatch) -> None:
+    steve, previous_owner = "8667ba71-b85a-4004-af54-457a9734eed7", "0f4a1c3e-5a84-4a35-8d6b-2c9a6cf4e0a1"
+    assigned = []
+
+    async def fake_fetch_profiles(pool, name_keys, max_age_seconds):
+        # A day-old cache entry from before the name changed hands.
+        return [{"name_key": "steve", "uuid": UUID(previous_owner), "name": "Steve"}] if max_age_seconds else []
+
+    async def fake_set_uuids(pool, request_ids, uuids):
+        assigned.append((request_ids, uuids))
+
+    monkeypatch.setattr("bot.services.uuids.fetch_player_profiles", fake_fetch_profiles)
+    monkeypatch.setattr(whitelist_service, "set_request_uuids", fake_set_uuids)
+    context = AppContext(
+        bot=FakeBot(),
+        pool=FakePool(FakeConn()),
+        config=AppConfig(
+            bot_token="token",
+            admin_chat_id=1,
+            admin_ids=[1],
+            migrations_dir=Path("."),
+            rcon=RconConfig("host", 1, "pass"),
+            db_dsn="dsn",
+            locale=Locale("en"),
+        ),
+    )
+    context.uuids = UuidCache(FakePool(FakeConn()), FakeResolver({"Steve": steve}))
+
+    await whitelist_service.assign_uuids(context, [{"id": 7, "username": "Steve", "uuid": None}])
+
+    assert assigned == [([7], [UUID(steve)])]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_whitelist_changes_acts_on_the_delta_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    alex = UUID("ec561538-f3fd-461d-aff5-086b22154bce")
+    records = [
+        {"id": 1, "user_id": 10, "username": "Steve", "uuid": None, "status": "approved"},
+        {"id": 2, "user_id": 11, "username": "Alex", "uuid": alex, "status": "approved"},
+        {"id": 3, "user_id": 12, "username": "Fresh", "uuid": None, "status": "pending"},
+    ]
+    looked_up, renamed, removed = [], [], []
+
+    async def fake_fetch(pool, usernames, uuids, tenant):
+        looked_up.append((usernames, uuids))
+        return records
+
+    async def fake_rename(pool, request_id, username):
+        renamed.append((request_id, username))
+
+    def fake_list(config):
+        raise AssertionError("reconciling a delta must not list the server whitelist")
+
+    monkeypatch.setattr(whitelist_service, "fetch_requests_for_players", fake_fetch)
+    monkeypatch.setattr(whitelist_service, "rename_request", fake_rename)
+    monkeypatch.setattr(whitelist_service, "list_whitelisted_players", fake_list)
+    monkeypatch.setattr(whitelist_service, "remove_whitelist_player", lambda config, name: removed.append(name))
+
+    bot = FakeBot()
+    context = AppContext(
+        bot=bot,
+        pool=FakePool(None),
+        config=AppConfig(
+            bot_token="token",
+            admin_chat_id=1,
+            admin_ids=[1],
+            migrations_dir=Path("."),
+            rcon=RconConfig("host", 1, "pass"),
+            db_dsn="dsn",
+            locale=Locale("en"),
+        ),
+    )
+
+    result = await whitelist_service.reconcile_whitelist_changes(
+        context, [("Griefer", None), ("Fresh", None), ("NewAlex", alex)], ["Steve", "Ghost"]
+    )
+
+    assert result == removed == ["Griefer"]
+    assert looked_up == [(["Griefer", "Fresh", "NewAlex", "Steve", "Ghost"], [alex])]
+    assert renamed == [(2, "NewAlex")]
+    [notice] = bot.sent
+    assert notice["chat_id"] == 1
+    assert "Griefer" in notice["text"] and "Steve" in notice["text"] and "Ghost" not in notice["text"]
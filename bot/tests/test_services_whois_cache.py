@@ -0,0 +1,49 @@
+import pytest
+
+from bot.services.whois_cache import WhoisCache
+
+
+def test_whois_cache_counts_hits_and_misses() -> None:
+    cache = WhoisCache()
+
+    assert cache.get(("user", 1)) is None
+    cache.put(("user", 1), "reply", owner=1)
+
+    assert cache.get(("user", 1)) == "reply"
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_whois_cache_expires_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr("bot.services.whois_cache.time.monotonic", lambda: now[0])
+    cache = WhoisCache(ttl=5)
+    cache.put(("mc", "steve"), "reply", owner=1)
+
+    now[0] = 6.0
+
+    assert cache.get(("mc", "steve")) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_whois_cache_evicts_least_recently_used() -> None:
+    cache = WhoisCache(max_size=2)
+    cache.put(("user", 1), "one", owner=1)
+    cache.put(("user", 2), "two", owner=2)
+    cache.get(("user", 1))
+    cache.put(("user", 3), "three", owner=3)
+
+    assert cache.get(("user", 2)) is None
+    assert cache.get(("user", 1)) == "one"
+
+
+def test_whois_cache_invalidates_everything_about_a_user() -> None:
+    cache = WhoisCache()
+    cache.put(("user", 7), "history", owner=7)
+    cache.put(("mc", "steve"), "profile", owner=7)
+    cache.put(("mc", "alex"), "not found")
+
+    cache.invalidate(7, "Alex")
+
+    assert cache.get(("user", 7)) is None
+    assert cache.get(("mc", "steve")) is None
+    assert cache.get(("mc", "alex")) is None
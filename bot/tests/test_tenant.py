@@ -0,0 +1,27 @@
+import pytest
+
+from bot.middlewares.tenant import TenantMiddleware
+
+from .test_handlers import build_context
+
+
+class FakeTenantBot:
+    def __init__(self, bot_id: int) -> None:
+        self.id = bot_id
+
+
+@pytest.mark.asyncio
+async def test_tenant_middleware_swaps_in_the_bots_context() -> None:
+    alpha = build_context()
+    beta = build_context()
+    beta.config.tenant = "beta"
+    middleware = TenantMiddleware({1: alpha, 2: beta})
+    seen = []
+
+    async def handler(event, data):
+        seen.append(data["context"].config.tenant)
+
+    await middleware(handler, object(), {"bot": FakeTenantBot(2), "context": alpha})
+    await middleware(handler, object(), {"bot": FakeTenantBot(3), "context": alpha})
+
+    assert seen == ["beta"]
@@ -0,0 +1,70 @@
+import pytest
+
+from bot.config import ThrottleConfig
+from bot.middlewares.throttling import ThrottlingMiddleware, classify
+from bot.services.ratelimit import MemoryRateLimitStore
+
+from .fakes import FakeUser
+from .test_handlers import build_context
+
+
+@pytest.mark.asyncio
+async def test_memory_store_sliding_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr("bot.services.ratelimit.time.monotonic", lambda: now[0])
+    store = MemoryRateLimitStore()
+
+    assert await store.hit("k", 2, 10)
+    assert await store.hit("k", 2, 10)
+    assert not await store.hit("k", 2, 10)
+
+    now[0] = 10.5
+    assert await store.hit("k", 2, 10)
+
+
+@pytest.mark.asyncio
+async def test_memory_store_bounds_and_expires_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr("bot.services.ratelimit.time.monotonic", lambda: now[0])
+    store = MemoryRateLimitStore(max_keys=2)
+
+    for key in ("a", "b", "c"):
+        await store.hit(key, 1, 10)
+    assert len(store) == 2
+
+    now[0] = 20.0
+    await store.hit("d", 1, 10)
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_throttling_drops_over_limit_updates(monkeypatch: pytest.MonkeyPatch) -> None:
+    middleware = ThrottlingMiddleware(MemoryRateLimitStore(), ThrottleConfig(request_limit=1))
+    monkeypatch.setattr("bot.middlewares.throttling.classify", lambda event: "request")
+    data = {"event_from_user": FakeUser(5), "context": build_context(admin_ids=[1])}
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+        return "ok"
+
+    assert await middleware(handler, "first", data) == "ok"
+    assert await middleware(handler, "second", data) is None
+    assert handled == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_throttling_skips_admins(monkeypatch: pytest.MonkeyPatch) -> None:
+    middleware = ThrottlingMiddleware(MemoryRateLimitStore(), ThrottleConfig(request_limit=1))
+    monkeypatch.setattr("bot.middlewares.throttling.classify", lambda event: "request")
+    data = {"event_from_user": FakeUser(1), "context": build_context(admin_ids=[1])}
+
+    async def handler(event, data):
+        return "ok"
+
+    assert await middleware(handler, "first", data) == "ok"
+    assert await middleware(handler, "second", data) == "ok"
+
+
+def test_classify_ignores_non_telegram_events() -> None:
+    assert classify("not an update") is None
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+
+from bot import db
+from bot.middlewares.tracing import TracingMiddleware
+from bot.tracing import TraceExporter, span, trace
+
+from .fakes import FakeConn, FakePool
+
+
+def test_span_outside_trace_is_noop() -> None:
+    with span("orphan") as child:
+        assert child is None
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_under_current_trace() -> None:
+    with trace("update", update_id=1) as root:
+        with span("handler.test"):
+            await db.fetch_request(FakePool(FakeConn()), 1)
+
+    names = [child.name for child in root.spans]
+    assert names == ["handler.test", "db.fetch_request"]
+    assert root.spans[1].parent_id == root.spans[0].span_id
+    assert root.duration_ms >= root.spans[0].duration_ms
+
+
+def test_span_records_errors() -> None:
+    with trace("update") as root:
+        with pytest.raises(ValueError):
+            with span("boom"):
+                raise ValueError("bad")
+
+    assert root.spans[0].error == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_detached_task_does_not_touch_a_finished_trace() -> None:
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def background() -> None:
+        with span("flush.open"):
+            started.set()
+            await release.wait()
+        with span("flush.late") as late:
+            assert late is None
+
+    with trace("update") as root:
+        task = asyncio.create_task(background())
+        await started.wait()
+    release.set()
+    await task
+
+    assert [child.name for child in root.spans] == ["flush.open"]
+    assert root.spans[0].duration_ms == 0.0
+
+
+def test_exporter_writes_only_slow_traces(tmp_path) -> None:
+    path = tmp_path / "traces.jsonl"
+    exporter = TraceExporter(str(path), slow_ms=50)
+    with trace("fast") as fast:
+        pass
+    with trace("slow") as slow:
+        pass
+    fast.duration_ms = 1
+    slow.duration_ms = 100
+
+    exporter.export(fast)
+    exporter.export(slow)
+    exporter.close()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_exports_the_closed_trace() -> None:
+    exported = []
+
+    class RecordingExporter:
+        def export(self, root) -> None:
+            assert root.closed
+            exported.append(root)
+
+    async def handler(event, data):
+        with span("handler.test"):
+            return "done"
+
+    assert await TracingMiddleware(RecordingExporter())(handler, object(), {}) == "done"
+    [root] = exported
+    assert [child.name for child in root.spans] == ["handler.test"]
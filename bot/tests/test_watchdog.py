@@ -0,0 +1,29 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from bot.metrics import LOOP_BLOCKED
+from bot.watchdog import LoopWatchdog
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_reports_blocking_stack(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.WARNING, logger="bot.watchdog")
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+    before = LOOP_BLOCKED.value()
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.03)
+        block_the_loop(0.3)
+        await asyncio.sleep(0.03)
+    finally:
+        await watchdog.stop()
+
+    assert LOOP_BLOCKED.value() == before + 1
+    assert any("block_the_loop" in record.message for record in caplog.records)
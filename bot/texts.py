@@ -31,10 +31,39 @@ LOCALES: Dict[str, TextMap] = {
         "admin_verdict_approved": "Approved by {admin}",
         "admin_verdict_denied": "Denied by {admin}",
         "private_only": "This action is only available in a private chat.",
-        "whitelist_cleanup_started": "Syncing whitelist...",
+        "whitelist_cleanup_queued": "Whitelist sync queued as job #{job_id}. I'll post the result here; "
+        "/job {job_id} shows its progress.",
         "whitelist_cleanup_none": "Whitelist sync finished. Nothing to remove.",
         "whitelist_cleanup_done": "Whitelist sync finished. Removed {count} usernames.",
         "whitelist_cleanup_list": "Removed: {usernames}",
+        "whitelist_sync_busy": "A whitelist sync is already running. Try again when it finishes.",
+        "jobs_empty": "No jobs yet.",
+        "jobs_header": "Recent jobs:",
+        "job_line": "#{job_id} {kind}: {status}",
+        "job_usage": "Usage: /job 42",
+        "job_not_found": "Job #{job_id} not found.",
+        "job_details": "Job #{job_id} ({kind}): {status}\nQueued: {created_at}\nStarted: {started_at}\n"
+        "Finished: {finished_at}\nAttempts: {attempts}",
+        "job_progress": "Progress: {progress}",
+        "job_result": "Result: {result}",
+        "job_error": "Error: {error}",
+        "job_failed": "Job #{job_id} ({kind}) failed: {error}",
+        "stats_empty": "No requests yet.",
+        "stats_totals": "Requests now: {pending} pending, {approved} approved, {denied} denied, {expired} expired",
+        "stats_recent": "Last {days} days: {created} new, {approved} approved, {denied} denied, {expired} expired",
+        "stats_latency_header": "Time to approval:",
+        "stats_latency_line": "{admin}: {count} approvals, median {median}, average {average}",
+        "whois_prev_button": "« Newer",
+        "whois_next_button": "Older »",
+        "whois_more": "…and {count} more",
+        "whois_target_not_found": "{target}: not found",
+        "whitelist_drift_removed": "Added to the server whitelist outside the bot without approval, "
+        "removed again: {usernames}",
+        "whitelist_drift_missing": "Approved players removed from the server whitelist outside the bot: {usernames}",
+        "request_already_pending": "You already have a pending request #{request_id} for this username. "
+        "Please wait for the admins to review it.",
+        "expired_user": "Your whitelist request #{request_id} expired without a decision. "
+        "Send your username again if you still need access.",
     },
     "ru": {
         "start": "Привет! Я помогаю управлять вайтлистом этого сервера.\n{hint}",
@@ -61,10 +90,39 @@ LOCALES: Dict[str, TextMap] = {
         "admin_verdict_approved": "Одобрено: {admin}",
         "admin_verdict_denied": "Отклонено: {admin}",
         "private_only": "Это действие доступно только в личном чате.",
-        "whitelist_cleanup_started": "Синхронизирую вайтлист...",
+        "whitelist_cleanup_queued": "Синхронизация вайтлиста поставлена в очередь, задача #{job_id}. "
+        "Результат пришлю сюда, ход выполнения: /job {job_id}.",
         "whitelist_cleanup_none": "Синхронизация завершена. Удалять нечего.",
         "whitelist_cleanup_done": "Синхронизация завершена. Удалено {count} ников.",
         "whitelist_cleanup_list": "Удалены: {usernames}",
+        "whitelist_sync_busy": "Синхронизация вайтлиста уже идёт. Попробуй, когда она закончится.",
+        "jobs_empty": "Задач пока нет.",
+        "jobs_header": "Последние задачи:",
+        "job_line": "#{job_id} {kind}: {status}",
+        "job_usage": "Использование: /job 42",
+        "job_not_found": "Задача #{job_id} не найдена.",
+        "job_details": "Задача #{job_id} ({kind}): {status}\nВ очереди с: {created_at}\nНачата: {started_at}\n"
+        "Завершена: {finished_at}\nПопыток: {attempts}",
+        "job_progress": "Прогресс: {progress}",
+        "job_result": "Результат: {result}",
+        "job_error": "Ошибка: {error}",
+        "job_failed": "Задача #{job_id} ({kind}) завершилась с ошибкой: {error}",
+        "stats_empty": "Заявок пока нет.",
+        "stats_totals": "Заявки сейчас: ждут {pending}, одобрено {approved}, отклонено {denied}, истекло {expired}",
+        "stats_recent": "За {days} дн.: новых {created}, одобрено {approved}, отклонено {denied}, истекло {expired}",
+        "stats_latency_header": "Время до одобрения:",
+        "stats_latency_line": "{admin}: одобрений {count}, медиана {median}, в среднем {average}",
+        "whois_prev_button": "« Новее",
+        "whois_next_button": "Старше »",
+        "whois_more": "…и ещё {count}",
+        "whois_target_not_found": "{target}: не найден",
+        "whitelist_drift_removed": "Добавлены в вайтлист сервера в обход бота без одобрения, "
+        "удалены: {usernames}",
+        "whitelist_drift_missing": "Одобренные игроки удалены из вайтлиста сервера в обход бота: {usernames}",
+        "request_already_pending": "У тебя уже есть заявка #{request_id} на этот ник, она ждёт проверки. "
+        "Дождись решения админов.",
+        "expired_user": "Твоя заявка #{request_id} истекла без решения. "
+        "Если доступ всё ещё нужен, отправь ник ещё раз.",
         "add_user_usage": "Использование: /add 1234 Notch",
         "add_user_success": "Ну че, мимо кассы так мимо кассы.\nИгрок с майнкрафт юзернеймом {username} с тг айди {tg_id} был пропущен мимо кассы",
     },
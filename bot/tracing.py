@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    span_id: int
+    parent_id: Optional[int]
+    name: str
+    start_ms: float
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    name: str
+    started_at: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    spans: List[Span] = field(default_factory=list)
+    duration_ms: float = 0.0
+    # Set when the trace ends; it may be handed to the exporter thread after that.
+    closed: bool = False
+    _origin: float = field(default_factory=time.perf_counter, repr=False)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "spans": [asdict(span) for span in self.spans],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Open a trace for the enclosed block; spans opened inside attach to it."""
+    root = Trace(trace_id=os.urandom(8).hex(), name=name, started_at=time.time(), attributes=attributes)
+    trace_token = _current_trace.set(root)
+    span_token = _current_span.set(None)
+    try:
+        yield root
+    finally:
+        root.duration_ms = root.elapsed_ms()
+        root.closed = True
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a child span of the current trace; a no-op outside of a trace.
+
+    Tasks spawned during an update inherit its trace and may outlive it, so
+    a closed trace takes no new spans, and spans still open when it closed
+    are left unfinished rather than written to while being exported.
+    """
+    root = _current_trace.get()
+    if root is None or root.closed:
+        yield None
+        return
+    child = Span(
+        span_id=len(root.spans) + 1,
+        parent_id=_current_span.get(),
+        name=name,
+        start_ms=root.elapsed_ms(),
+        attributes=attributes,
+    )
+    root.spans.append(child)
+    token = _current_span.set(child.span_id)
+    try:
+        yield child
+    except BaseException as exc:
+        if not root.closed:
+            child.error = type(exc).__name__
+        raise
+    finally:
+        if not root.closed:
+            child.duration_ms = root.elapsed_ms() - child.start_ms
+        _current_span.reset(token)
+
+
+class TraceExporter:
+    """Writes finished traces as JSON lines to a rotating file from a worker thread.
+
+    With ``slow_ms`` set only traces at least that slow are written (and
+    logged as a warning); otherwise every trace is written.
+    """
+
+    def __init__(self, path: str, slow_ms: float = 0.0, max_bytes: int = 10_000_000, backup_count: int = 5) -> None:
+        self.slow_ms = slow_ms
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._work, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, finished: Trace) -> None:
+        if self.slow_ms:
+            if finished.duration_ms < self.slow_ms:
+                return
+            logger.warning(
+                "Slow trace %s %s: %.1f ms, %d spans",
+                finished.name,
+                finished.trace_id,
+                finished.duration_ms,
+                len(finished.spans),
+            )
+        self._queue.put(finished)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._handler.close()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                line = json.dumps(item.to_dict(), ensure_ascii=False, default=str)
+                self._handler.emit(logging.makeLogRecord({"msg": line}))
+            except Exception:
+                logger.exception("Failed to export trace %s", item.trace_id)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from bot.metrics import LOOP_BLOCKED, LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    """Measures event loop lag and reports what is blocking it.
+
+    A loop task heartbeats every ``interval`` seconds and records how late it
+    woke up. A helper thread watches the heartbeat; once it is older than
+    ``threshold`` the thread captures the loop thread's current stack, logs it
+    and counts the stall. Each stall is reported once.
+    """
+
+    def __init__(self, threshold: float = 0.5, interval: float = 0.1) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            LOOP_LAG.observe(max(now - expected, 0.0))
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stopped.wait(self.interval):
+            stalled_for = time.monotonic() - self._heartbeat
+            if stalled_for <= self.threshold + self.interval:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+            LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            logger.warning("Event loop blocked for %.0f ms, current stack:\n%s", stalled_for * 1000, stack)
@@ -0,0 +1,31 @@
+CREATE OR REPLACE FUNCTION notify_whitelist_requests_changed() RETURNS trigger AS $$
+DECLARE
+    old_row JSON;
+    new_row JSON;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_row := json_build_object('user_id', OLD.user_id, 'username', OLD.username, 'status', OLD.status);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_row := json_build_object('user_id', NEW.user_id, 'username', NEW.username, 'status', NEW.status);
+    END IF;
+
+    -- Only changes that touch an approved row matter to the approved-player index.
+    IF COALESCE(old_row->>'status', '') <> 'approved' AND COALESCE(new_row->>'status', '') <> 'approved' THEN
+        RETURN NULL;
+    END IF;
+    IF old_row::text = new_row::text THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify(
+        'whitelist_requests_changed',
+        json_build_object('op', TG_OP, 'old', old_row, 'new', new_row)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER whitelist_requests_notify
+AFTER INSERT OR UPDATE OR DELETE ON whitelist_requests
+FOR EACH ROW EXECUTE FUNCTION notify_whitelist_requests_changed();
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS telegram_usernames (
+    username TEXT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS telegram_usernames_user_id_idx ON telegram_usernames (user_id);
@@ -0,0 +1,6 @@
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+    key TEXT NOT NULL,
+    window_start TIMESTAMPTZ NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (key, window_start)
+);
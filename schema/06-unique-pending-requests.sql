@@ -0,0 +1,16 @@
+-- Older copies win; later duplicates of a pending request are retired before the index is built.
+UPDATE whitelist_requests AS r
+SET status = 'duplicate'
+WHERE r.status = 'pending'
+  AND EXISTS (
+      SELECT 1
+      FROM whitelist_requests AS older
+      WHERE older.status = 'pending'
+        AND older.user_id = r.user_id
+        AND lower(older.username) = lower(r.username)
+        AND older.id < r.id
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS whitelist_requests_pending_user_username_idx
+ON whitelist_requests (user_id, lower(username))
+WHERE status = 'pending';
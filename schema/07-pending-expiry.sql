@@ -0,0 +1,6 @@
+ALTER TABLE IF EXISTS whitelist_requests
+ADD COLUMN IF NOT EXISTS admin_message_id BIGINT;
+
+CREATE INDEX IF NOT EXISTS whitelist_requests_pending_created_idx
+ON whitelist_requests (created_at)
+WHERE status = 'pending';
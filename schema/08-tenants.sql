@@ -0,0 +1,17 @@
+-- Rows from before multi-tenant mode belong to the single-bot setup.
+ALTER TABLE IF EXISTS whitelist_requests
+ADD COLUMN IF NOT EXISTS tenant TEXT NOT NULL DEFAULT 'default';
+
+-- Pending requests are unique within a community, not across all of them.
+CREATE UNIQUE INDEX IF NOT EXISTS whitelist_requests_pending_tenant_user_username_idx
+ON whitelist_requests (tenant, user_id, lower(username))
+WHERE status = 'pending';
+
+DROP INDEX IF EXISTS whitelist_requests_pending_user_username_idx;
+
+-- Approved-name lookups, per-user history and the approved index load.
+CREATE INDEX IF NOT EXISTS whitelist_requests_tenant_status_username_idx
+ON whitelist_requests (tenant, status, username);
+
+CREATE INDEX IF NOT EXISTS whitelist_requests_tenant_user_idx
+ON whitelist_requests (tenant, user_id);
@@ -0,0 +1,10 @@
+-- One row per update a replica has started handling; the primary key makes
+-- the claim an insert-or-skip. Pruned once Telegram would no longer resend.
+CREATE TABLE IF NOT EXISTS processed_updates (
+    bot_id BIGINT NOT NULL,
+    update_id BIGINT NOT NULL,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (bot_id, update_id)
+);
+
+CREATE INDEX IF NOT EXISTS processed_updates_claimed_at_idx ON processed_updates (claimed_at);
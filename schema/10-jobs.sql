@@ -0,0 +1,25 @@
+-- Long-running admin operations, claimed by workers with FOR UPDATE SKIP LOCKED.
+-- progress is the job's checkpoint; a running job whose heartbeat goes stale
+-- (its replica died) is claimed again and resumes from it.
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    params JSONB NOT NULL DEFAULT '{}',
+    progress JSONB NOT NULL DEFAULT '{}',
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    requested_by BIGINT,
+    chat_id BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- At most one queued or running job of each kind per tenant.
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_kind_idx ON jobs (tenant, kind) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, id) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS jobs_tenant_id_idx ON jobs (tenant, id DESC);
@@ -0,0 +1,136 @@
+-- Aggregates behind /stats, kept current by a trigger so reading them costs
+-- the same however much history whitelist_requests holds.
+
+-- Requests in each status right now.
+CREATE TABLE IF NOT EXISTS request_status_counts (
+    tenant TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant, status)
+);
+
+-- Per UTC day: requests created ('created') and decisions reached (by status).
+CREATE TABLE IF NOT EXISTS request_daily_counts (
+    tenant TEXT NOT NULL,
+    day DATE NOT NULL,
+    event TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant, day, event)
+);
+
+-- Time from request to approval per admin, bucketed by stats_latency_bucket.
+CREATE TABLE IF NOT EXISTS approval_latency_buckets (
+    tenant TEXT NOT NULL,
+    decided_by BIGINT NOT NULL,
+    bucket SMALLINT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant, decided_by, bucket)
+);
+
+-- Upper bounds: 5 min, 30 min, 1 h, 6 h, 1 d, 3 d, then everything slower.
+-- bot/services/stats.py LATENCY_BUCKETS must list the same bounds.
+CREATE OR REPLACE FUNCTION stats_latency_bucket(seconds DOUBLE PRECISION) RETURNS SMALLINT AS $$
+    SELECT CASE
+        WHEN seconds <= 300 THEN 0
+        WHEN seconds <= 1800 THEN 1
+        WHEN seconds <= 3600 THEN 2
+        WHEN seconds <= 21600 THEN 3
+        WHEN seconds <= 86400 THEN 4
+        WHEN seconds <= 259200 THEN 5
+        ELSE 6
+    END::SMALLINT
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION stats_bump_status(p_tenant TEXT, p_status TEXT, p_delta BIGINT) RETURNS void AS $$
+    INSERT INTO request_status_counts (tenant, status, count)
+    VALUES (p_tenant, p_status, p_delta)
+    ON CONFLICT (tenant, status) DO UPDATE SET count = request_status_counts.count + EXCLUDED.count
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION stats_bump_day(p_tenant TEXT, p_at TIMESTAMPTZ, p_event TEXT) RETURNS void AS $$
+    INSERT INTO request_daily_counts (tenant, day, event, count)
+    VALUES (p_tenant, (p_at AT TIME ZONE 'UTC')::date, p_event, 1)
+    ON CONFLICT (tenant, day, event) DO UPDATE SET count = request_daily_counts.count + 1
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION stats_whitelist_requests_changed() RETURNS trigger AS $$
+DECLARE
+    latency DOUBLE PRECISION;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_bump_status(NEW.tenant, NEW.status, 1);
+        PERFORM stats_bump_day(NEW.tenant, NEW.created_at, 'created');
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        PERFORM stats_bump_status(OLD.tenant, OLD.status, -1);
+        RETURN NULL;
+    END IF;
+    IF NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM stats_bump_status(OLD.tenant, OLD.status, -1);
+    PERFORM stats_bump_status(NEW.tenant, NEW.status, 1);
+    IF NEW.status <> 'pending' THEN
+        PERFORM stats_bump_day(NEW.tenant, COALESCE(NEW.decided_at, NOW()), NEW.status);
+    END IF;
+    -- /add records the player as their own decider; that is not a review.
+    IF NEW.status = 'approved' AND NEW.decided_by IS NOT NULL AND NEW.decided_by <> NEW.user_id THEN
+        latency := GREATEST(EXTRACT(EPOCH FROM COALESCE(NEW.decided_at, NOW()) - NEW.created_at), 0);
+        INSERT INTO approval_latency_buckets (tenant, decided_by, bucket, count, total_seconds)
+        VALUES (NEW.tenant, NEW.decided_by, stats_latency_bucket(latency), 1, latency)
+        ON CONFLICT (tenant, decided_by, bucket) DO UPDATE
+        SET count = approval_latency_buckets.count + 1,
+            total_seconds = approval_latency_buckets.total_seconds + EXCLUDED.total_seconds;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- First run only: build the aggregates from existing rows, then let the
+-- trigger take over. The lock keeps other replicas from writing in between.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'whitelist_requests_stats' AND tgrelid = 'whitelist_requests'::regclass
+    ) THEN
+        RETURN;
+    END IF;
+
+    LOCK TABLE whitelist_requests IN SHARE ROW EXCLUSIVE MODE;
+    DELETE FROM request_status_counts;
+    DELETE FROM request_daily_counts;
+    DELETE FROM approval_latency_buckets;
+
+    INSERT INTO request_status_counts (tenant, status, count)
+    SELECT tenant, status, COUNT(*) FROM whitelist_requests GROUP BY tenant, status;
+
+    INSERT INTO request_daily_counts (tenant, day, event, count)
+    SELECT tenant, day, event, COUNT(*)
+    FROM (
+        SELECT tenant, (created_at AT TIME ZONE 'UTC')::date AS day, 'created' AS event
+        FROM whitelist_requests
+        UNION ALL
+        SELECT tenant, (decided_at AT TIME ZONE 'UTC')::date, status
+        FROM whitelist_requests
+        WHERE status <> 'pending' AND decided_at IS NOT NULL
+    ) AS events
+    GROUP BY tenant, day, event;
+
+    INSERT INTO approval_latency_buckets (tenant, decided_by, bucket, count, total_seconds)
+    SELECT tenant, decided_by, stats_latency_bucket(latency), COUNT(*), SUM(latency)
+    FROM (
+        SELECT tenant, decided_by, GREATEST(EXTRACT(EPOCH FROM decided_at - created_at), 0) AS latency
+        FROM whitelist_requests
+        WHERE status = 'approved' AND decided_by IS NOT NULL AND decided_by <> user_id AND decided_at IS NOT NULL
+    ) AS approvals
+    GROUP BY tenant, decided_by, stats_latency_bucket(latency);
+
+    CREATE TRIGGER whitelist_requests_stats
+    AFTER INSERT OR UPDATE OR DELETE ON whitelist_requests
+    FOR EACH ROW EXECUTE FUNCTION stats_whitelist_requests_changed();
+END;
+$$;
@@ -0,0 +1,4 @@
+-- /whois pages through a user's history newest decision first, keyed by
+-- (decided_at, id) with pending rows (no decision yet) last.
+CREATE INDEX IF NOT EXISTS whitelist_requests_tenant_user_decided_idx
+ON whitelist_requests (tenant, user_id, (COALESCE(decided_at, '-infinity'::timestamptz)) DESC, id DESC);
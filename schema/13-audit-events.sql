@@ -0,0 +1,20 @@
+-- Append-only record of every whitelist change: who did what to which name,
+-- from where, and whether it went through. Rows are only ever inserted, in
+-- batches, so requests that get deleted or overwritten stay accounted for.
+CREATE TABLE IF NOT EXISTS audit_events (
+    id BIGSERIAL PRIMARY KEY,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    actor_id BIGINT,
+    action TEXT NOT NULL,
+    username TEXT,
+    user_id BIGINT,
+    request_id INTEGER,
+    source TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    detail TEXT
+);
+
+CREATE INDEX IF NOT EXISTS audit_events_tenant_occurred_idx ON audit_events (tenant, occurred_at DESC);
+CREATE INDEX IF NOT EXISTS audit_events_username_idx ON audit_events (tenant, username);
+CREATE INDEX IF NOT EXISTS audit_events_user_id_idx ON audit_events (tenant, user_id);
@@ -0,0 +1,18 @@
+-- Requests remember the Mojang UUID behind the name, so a player who
+-- renames is still recognised. Recorded only when a request is approved.
+ALTER TABLE whitelist_requests ADD COLUMN IF NOT EXISTS uuid UUID;
+
+CREATE INDEX IF NOT EXISTS whitelist_requests_tenant_uuid_idx
+ON whitelist_requests (tenant, uuid) WHERE uuid IS NOT NULL;
+
+-- Name -> UUID answers from the profiles API, keyed by lowercased name.
+-- A NULL uuid records that no such player exists. Rows older than the
+-- configured TTL are looked up again.
+CREATE TABLE IF NOT EXISTS player_profiles (
+    name_key TEXT PRIMARY KEY,
+    uuid UUID,
+    name TEXT,
+    resolved_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS player_profiles_uuid_idx ON player_profiles (uuid) WHERE uuid IS NOT NULL;
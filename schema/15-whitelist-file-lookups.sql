@@ -0,0 +1,3 @@
+-- The whitelist.json watcher looks up live requests by name in any case.
+CREATE INDEX IF NOT EXISTS whitelist_requests_tenant_live_name_idx
+ON whitelist_requests (tenant, lower(username)) WHERE status IN ('approved', 'pending');